@@ -0,0 +1,5 @@
+"""
+pygmc benchmarks, run with: python -m benchmarks --help
+
+Results are written as JSON, compare them between releases to spot regressions.
+"""
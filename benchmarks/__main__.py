@@ -0,0 +1,75 @@
+"""
+Run the benchmarks, write the results as JSON.
+
+python -m benchmarks --quick --output results.json
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import platform
+import sys
+
+import pygmc
+from benchmarks import bench_device, bench_history
+
+suites = {"history": bench_history, "device": bench_device}
+
+
+def _metadata(args) -> dict:
+    try:
+        import numpy
+
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    return {
+        "pygmc": pygmc.__version__,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "numpy": numpy_version,
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "quick": args.quick,
+        "repeat": args.repeat,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__)
+    parser.add_argument("--quick", action="store_true", help="small sizes, fast rates")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per benchmark")
+    parser.add_argument(
+        "--only", choices=sorted(suites), action="append", help="suites to run"
+    )
+    parser.add_argument("--output", help="JSON file, by default stdout")
+    args = parser.parse_args(argv)
+
+    report = {"metadata": _metadata(args), "results": []}
+    for name in args.only or suites:
+        # keep stdout for the JSON, e.g. pygmc.connect() prints
+        with contextlib.redirect_stdout(sys.stderr):
+            for item in suites[name].run(quick=args.quick, repeat=args.repeat):
+                report["results"].append(item)
+                print(_summary(item), file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+def _summary(item) -> str:
+    params = " ".join("{}={}".format(k, v) for k, v in item["params"].items())
+    line = "{} {} min={:.6f}s".format(item["name"], params, item["seconds"]["min"])
+    if item["throughput"] is not None:
+        line += " {:,.0f} {}".format(item["throughput"], item["unit"])
+    return line
+
+
+if __name__ == "__main__":
+    sys.exit(main())
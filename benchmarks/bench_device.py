@@ -0,0 +1,127 @@
+"""
+Device benchmarks: history download, startup latency & heartbeat, over a simulated
+device on a pseudo-terminal (pygmc.simulator, Linux & macOS).
+"""
+import struct
+import termios
+
+import pygmc
+from benchmarks.common import measure, result
+from pygmc.connection import Connection
+from pygmc.devices import DeviceRFC1801, auto_get_device
+from pygmc.history import SyntheticHistory
+
+# baudrates the pseudo-terminal supports, e.g. no 14400 & 28800 on linux
+baudrates = [br for br in Connection()._baudrates if hasattr(termios, "B{}".format(br))]
+quick_baudrates = [115200, 57600]
+_page = 2**11
+
+
+def _simulator(**kwargs):
+    # imported here, the simulator needs a pseudo-terminal
+    from pygmc.simulator import Simulator
+
+    return Simulator(seed=0, **kwargs)
+
+
+def raw_history(quick=False, repeat=5):
+    """
+    get_raw_history() per baudrate, responses paced at the baudrate.
+
+    The history is ~1 second (quick) or ~10 seconds of data at the line rate, at
+    least one flash page, plus the empty page ending the read.
+    """
+    seconds_of_data = 1 if quick else 10
+    for baudrate in quick_baudrates if quick else baudrates:
+        line_rate = baudrate / 10  # bytes per second, start + 8 data + stop bits
+        pages = max(int(line_rate * seconds_of_data) // _page, 1)
+        size = pages * _page
+        flash = SyntheticHistory(size + _page, seed=0).data[:size]
+        # a page must arrive within the timeout
+        timeout = 2 * _page / line_rate + 1
+        with _simulator(baudrate=baudrate, flash=flash, latency=0.002) as sim:
+            connection = Connection(timeout=timeout)
+            connection.connect_exact(sim.port, baudrate)
+            try:
+                device = auto_get_device(connection)
+                runs = repeat if baudrate >= 57600 else 1
+                seconds = measure(device.get_raw_history, runs)
+            finally:
+                connection.close_connection()
+        # bytes on the wire, including the empty page
+        params = {"baudrate": baudrate, "size": size, "line_rate": line_rate}
+        yield result("get_raw_history", params, seconds, size + _page, "B")
+
+
+def startup(quick=False, repeat=5):
+    """
+    Time to a ready device: auto_get_device() on an open connection, and
+    pygmc.connect() with a known baudrate or probing for it.
+    """
+    for baudrate in [115200] if quick else [115200, 9600]:
+        with _simulator(baudrate=baudrate) as sim:
+            connection = Connection()
+            connection.connect_exact(sim.port, baudrate)
+            try:
+                seconds = measure(lambda c=connection: auto_get_device(c), repeat)
+            finally:
+                connection.close_connection()
+            yield result("auto_get_device", {"baudrate": baudrate}, seconds)
+
+            for known in (True, False):
+
+                def connect(b=baudrate if known else None, port=sim.port):
+                    device = pygmc.connect(port=port, baudrate=b)
+                    device.connection.close_connection()
+
+                seconds = measure(connect, repeat)
+                params = {"baudrate": baudrate, "probe": not known}
+                yield result("pygmc.connect", params, seconds)
+
+
+class _FrameSerial:
+    """In memory serial.Serial like port, a heartbeat frame is always available."""
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.timeout = 1
+        self.baudrate = 115200
+        self.port = "memory"
+
+    def write(self, data) -> int:
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def read_until(self, *args, size=None, **kwargs) -> bytes:
+        return self.frame
+
+    def reset_input_buffer(self) -> None:
+        pass
+
+    def reset_output_buffer(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def heartbeat(quick=False, repeat=5):
+    """
+    heartbeat_live() frames per second with frames always available, i.e. the
+    overhead per frame; a device sends one frame per second.
+    """
+    count = 10_000 if quick else 100_000
+    connection = Connection()
+    connection.connect_user_provided(_FrameSerial(struct.pack(">I", 7)))
+    device = DeviceRFC1801(connection)
+    seconds = measure(lambda: sum(device.heartbeat_live(count=count)), repeat)
+    yield result("heartbeat_live", {"count": count}, seconds, count, "frames")
+
+
+def run(quick=False, repeat=5):
+    """Yield the results of every device benchmark."""
+    yield from startup(quick, repeat)
+    yield from heartbeat(quick, repeat)
+    yield from raw_history(quick, repeat)
@@ -0,0 +1,46 @@
+"""
+HistoryParser benchmarks on synthetic history dumps.
+"""
+import os
+import tempfile
+
+from benchmarks.common import measure, result
+from pygmc.history import HistoryParser, SyntheticHistory
+
+try:
+    import numpy  # noqa: F401
+
+    _backends = ["python", "numpy"]
+except ImportError:
+    _backends = ["python"]
+
+sizes = [2**16, 2**20, 2**23, 2**26]  # 64 KiB - 64 MiB
+quick_sizes = [2**16, 2**20]
+
+
+def run(quick=False, repeat=5):
+    """Yield results: parse from bytes per backend, and from a file (mmap, read)."""
+    for size in quick_sizes if quick else sizes:
+        data = SyntheticHistory(size, seed=0).data
+        # big dumps take a while, fewer runs
+        runs = repeat if size <= 2**20 else max(repeat // 2, 1)
+        for backend in _backends:
+            seconds = measure(
+                lambda b=backend: HistoryParser(data, backend=b).get_table(), runs
+            )
+            params = {"size": size, "backend": backend, "source": "bytes"}
+            yield result("history_parser", params, seconds, size, "B")
+
+        fd, path = tempfile.mkstemp(suffix=".bin")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            for use_mmap in (True, False):
+                seconds = measure(
+                    lambda m=use_mmap: HistoryParser(path, use_mmap=m).get_table(), runs
+                )
+                params = {"size": size, "backend": "python", "source": "file"}
+                params["mmap"] = use_mmap
+                yield result("history_parser", params, seconds, size, "B")
+        finally:
+            os.remove(path)
@@ -0,0 +1,47 @@
+"""
+Shared benchmark helpers: timing and results.
+"""
+import statistics
+import time
+
+
+def measure(fn, repeat=5) -> list:
+    """Run fn() repeat times, seconds of each run."""
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - start)
+    return seconds
+
+
+def result(name, params, seconds, amount=None, unit=None) -> dict:
+    """
+    One benchmark result.
+
+    Parameters
+    ----------
+    name : str
+        Benchmark name e.g. 'history_parser'
+    params : dict
+        Benchmark parameters e.g. {'size': 65536, 'backend': 'python'}
+    seconds : list
+        Seconds of each run, from measure()
+    amount : float | None, optional
+        Work done per run e.g. bytes parsed, by default None i.e. no throughput
+    unit : str | None, optional
+        Unit of amount e.g. 'B', throughput is in unit per second.
+    """
+    best = min(seconds)
+    return {
+        "name": name,
+        "params": params,
+        "runs": len(seconds),
+        "seconds": {
+            "min": best,
+            "median": statistics.median(seconds),
+            "max": max(seconds),
+        },
+        "throughput": amount / best if amount is not None and best else None,
+        "unit": "{}/s".format(unit) if unit else None,
+    }
@@ -11,10 +11,12 @@ __author__ = "Thomaz"
 __license__ = "MIT"
 
 
+import asyncio
 import logging
 import time
 
-from pygmc.connection import Connection
+from pygmc import devices
+from pygmc.connection import AsyncConnection, Connection, ProfileCache
 from pygmc.devices import (
     GMC300,
     GMC300S,
@@ -22,13 +24,16 @@ from pygmc.devices import (
     GMC500,
     GMC600,
     GMC800,
+    BaseDevice,
     GMC300EPlus,
     GMC320Plus,
     GMC320PlusV5,
     GMC500Plus,
     GMC600Plus,
     auto_get_device,
+    auto_get_device_async,
 )
+from pygmc.fleet import Fleet
 from pygmc.history import HistoryParser
 
 logger = logging.getLogger(__name__)
@@ -41,6 +46,7 @@ def connect(
     pid=None,
     description=None,
     hardware_id="1A86:7523",
+    cache=None,
 ):
     """
     Connect to device.
@@ -69,12 +75,26 @@ def connect(
     hardware_id : str | None, optional
         Device hwid, by default '1A86:7523'
         e.g. hwid='USB VID:PID=1A86:7523 LOCATION=2-1'
+    cache : bool | str | None, optional
+        Connection profile cache, by default None i.e. not used.
+        True uses ProfileCache.default_path(), a str is the cache file path.
+        A cached device (port, baudrate, model, version by USB hwid) is connected
+        with a single <GETSERIAL>> validation. If it doesn't validate, the profile is
+        removed, the device is searched for as usual and the cache is updated.
 
     Raises
     ------
     ConnectionError
         Unable to connect to device.
     """
+    if cache:
+        profiles = ProfileCache(None if cache is True else cache)
+        device = _connect_profile(
+            profiles, port, baudrate, vid, pid, description, hardware_id
+        )
+        if device is not None:
+            return device
+
     connection = Connection()
     connection.connect(
         port=port,
@@ -94,4 +114,101 @@ def connect(
     print(msg)  # print for newbies w/o logger knowledge
     logger.info(msg)
 
+    if cache:
+        profiles.put(
+            {
+                "port": connection._con.port,
+                "hwid": connection.get_hwid() or connection._con.port,
+                "baudrate": connection._con.baudrate,
+                "serial": device.get_serial(),
+                "device": type(device).__name__,
+                "version": ver,
+            }
+        )
+
+    return device
+
+
+def _connect_profile(profiles, port, baudrate, vid, pid, description, hardware_id):
+    """Connect to a cached device, None if no cached device validates."""
+    cached = profiles.load()
+    if not cached:
+        return None
+    connection = Connection()
+    if port:
+        candidates = {port: connection._port_hwids().get(port, port)}
+    else:
+        candidates = connection._port_hwids(vid, pid, description, hardware_id)
+
+    for port_, hwid in candidates.items():
+        profile = cached.get(hwid)
+        if profile is None or (baudrate and baudrate != profile["baudrate"]):
+            continue
+        device_class = getattr(devices, profile["device"], None)
+        if not (isinstance(device_class, type) and issubclass(device_class, BaseDevice)):
+            continue
+        if connection.connect_profile(port_, profile["baudrate"], profile["serial"]):
+            device = device_class(connection)
+            msg = f"Connected device={profile['version']} (cached profile)"
+            print(msg)  # print for newbies w/o logger knowledge
+            logger.info(msg)
+            return device
+        # stale e.g. another device at the same USB location
+        profiles.remove(hwid)
+    return None
+
+
+async def connect_async(
+    port=None,
+    baudrate=None,
+    vid=None,
+    pid=None,
+    description=None,
+    hardware_id="1A86:7523",
+):
+    """
+    Connect to device with an asyncio connection, same search as connect().
+
+    Parameters
+    ----------
+    port : str | None, optional
+        Exact port (device dev path / com port) e.g. '/dev/ttyUSB0'
+    baudrate: int | None
+        Device baudrate. Leave None to auto-detect baudrate.
+    vid : str | None, optional
+        Device vendor ID as hex, by default None
+    pid : str | None, optional
+        Device product ID as hex, by default None
+    description : str | None, optional
+        Device description, by default None
+    hardware_id : str | None, optional
+        Device hwid, by default '1A86:7523'
+
+    Returns
+    -------
+    pygmc.devices.AsyncDeviceRFC1201 | pygmc.devices.AsyncDeviceRFC1801
+        e.g. ``cpm = await device.get_cpm()``
+
+    Raises
+    ------
+    ConnectionError
+        Unable to connect to device.
+    """
+    connection = AsyncConnection()
+    await connection.connect(
+        port=port,
+        baudrate=baudrate,
+        vid=vid,
+        pid=pid,
+        description=description,
+        hardware_id=hardware_id,
+    )
+
+    device = await auto_get_device_async(connection)
+
+    # The GMC300S is main reason for sleep/delay...
+    await asyncio.sleep(0.2)
+    ver = await device.get_version()
+    logger.info(f"Connected device={ver}")
+
     return device
@@ -1 +1,5 @@
+from .async_connection import AsyncConnection
 from .connection import Connection
+from .metrics import CommandEvent, ConnectionMetrics, LatencyHistogram
+from .profile_cache import ProfileCache
+from .replay import RecordingSerial, ReplaySerial, read_capture, record
@@ -0,0 +1,398 @@
+"""
+Represent an asyncio USB connection to a GMC.
+
+Same commands as Connection but waiting on the device doesn't block a thread.
+"""
+import asyncio
+import functools
+import logging
+
+# pypi
+import serial
+
+from .connection import Connection
+
+logger = logging.getLogger("pygmc.connection.async")
+
+
+def _set_done(future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class AsyncConnection:
+    """
+    Represent an asyncio connection to a GMC device.
+
+    The serial port is non-blocking. Reads wait for the port file descriptor on the
+    event loop, i.e. many devices can be polled from one thread.
+    """
+
+    # poll interval when the port has no file descriptor or the event loop can't
+    # watch it (e.g. Windows proactor event loop), seconds
+    _poll_interval = 0.005
+    # read_until_idle() gap, same as Connection
+    _idle_gap_chars = Connection._idle_gap_chars
+    _idle_gap_min = Connection._idle_gap_min
+    _idle_gap_factor = Connection._idle_gap_factor
+    _idle_gap_alpha = Connection._idle_gap_alpha
+    _idle_polls = Connection._idle_polls
+
+    def __init__(self, timeout=5):
+        """
+        Represent an asyncio connection to a GMC device.
+
+        Parameters
+        ----------
+        timeout : int, optional
+            read timeout, seconds, by default 5
+        """
+        logger.debug(f"AsyncConnection timeout={timeout}")
+        self._timeout = timeout  # seconds
+        self._con = None
+        # bytes read from the port but not returned yet
+        self._buffer = bytearray()
+        # user set read_until_idle() gap, None: from baudrate & learned
+        self._idle_gap = None
+        self._idle_delay_ewma = None
+
+    async def connect(
+        self,
+        port=None,
+        baudrate=None,
+        vid=None,
+        pid=None,
+        description=None,
+        hardware_id="1A86:7523",
+    ) -> None:
+        """
+        Connect to device, same search as Connection.connect()
+
+        Port and baudrate probing is blocking, it runs in the default executor.
+
+        Parameters
+        ----------
+        port : str | None, optional
+            Exact port (device dev path / com port) e.g. '/dev/ttyUSB0'
+        baudrate: int | None
+            Device baudrate. Leave None to auto-detect baudrate.
+        vid : str | None, optional
+            Device vendor ID as hex, by default None
+        pid : str | None, optional
+            Device product ID as hex, by default None
+        description : str | None, optional
+            Device description, by default None
+        hardware_id : str | None, optional
+            Device hwid, by default "1A86:7523"
+
+        Raises
+        ------
+        ConnectionError
+            Unable to connect to device.
+        """
+        connection = Connection(timeout=self._timeout)
+        connect = functools.partial(
+            connection.connect,
+            port=port,
+            baudrate=baudrate,
+            vid=vid,
+            pid=pid,
+            description=description,
+            hardware_id=hardware_id,
+        )
+        await asyncio.get_running_loop().run_in_executor(None, connect)
+        self.connect_user_provided(connection._con)
+
+    def connect_exact(self, port, baudrate) -> None:
+        """
+        Connect with exact user provided parameters.
+
+        Parameters
+        ----------
+        port : str
+            Port. e.g. linux /dev/ttyUSB0 or windows COM3
+        baudrate : int
+            Baudrate e.g. 115200
+        """
+        logger.debug(f"Exact connect attempt: port={port} baudrate={baudrate}")
+        con = serial.Serial(port=port, baudrate=baudrate, timeout=0, write_timeout=0)
+        self.connect_user_provided(con)
+
+    def connect_user_provided(self, connection) -> None:
+        """
+        User provides a serial.Serial like class, it is made non-blocking.
+
+        Parameters
+        ----------
+        connection : serial.Serial
+            A serial.Serial like class (pyserial)
+        """
+        connection.timeout = 0
+        connection.write_timeout = 0
+        self._con = connection
+        self._buffer.clear()
+        logger.info(f"Connected: {self._con}")
+
+    def close_connection(self) -> None:
+        """Close connection."""
+        if self._con is not None:
+            logger.info(f"Close connection: {self._con}")
+            self._con.close()
+
+    def reset_buffers(self) -> None:
+        """
+        Reset input & output buffers on pyserial connection.
+
+        Doesn't block, discards all data not read yet.
+        """
+        logger.debug("reset_input_buffer")
+        self._con.reset_input_buffer()
+        self._buffer.clear()
+        logger.debug("reset_output_buffer")
+        self._con.reset_output_buffer()
+
+    async def _wait(self, event, timeout) -> None:
+        """Wait up to timeout seconds for the port to be readable/writable."""
+        loop = asyncio.get_running_loop()
+        try:
+            fd = self._con.fileno()
+            add, remove = {
+                "read": (loop.add_reader, loop.remove_reader),
+                "write": (loop.add_writer, loop.remove_writer),
+            }[event]
+            future = loop.create_future()
+            add(fd, _set_done, future)
+        except (AttributeError, NotImplementedError, OSError, ValueError):
+            # no file descriptor or the event loop can't watch it
+            await asyncio.sleep(min(self._poll_interval, timeout))
+            return
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            remove(fd)
+
+    async def _fill(self, timeout) -> None:
+        """Wait up to timeout seconds for data, then buffer all available data."""
+        if not self._con.in_waiting:
+            await self._wait("read", timeout)
+        waiting = self._con.in_waiting
+        if waiting:
+            self._buffer += self._con.read(waiting)
+
+    async def write(self, cmd: bytes) -> None:
+        """
+        Write command to device.
+
+        Parameters
+        ----------
+        cmd : bytes
+            Write command e.g. <GETVER>>
+        """
+        logger.debug(f"write='{cmd}'")
+        data = memoryview(cmd)
+        while len(data):
+            n = self._con.write(data) or 0
+            data = data[n:]
+            if len(data):
+                await self._wait("write", self._timeout)
+
+    async def read(self, wait_sleep=0.3) -> bytes:
+        """
+        Read all available data after waiting wait_sleep seconds.
+
+        Parameters
+        ----------
+        wait_sleep : float, optional
+            Time to give device time to write, by default 0.3
+
+        Returns
+        -------
+        bytes
+            Device response
+        """
+        await asyncio.sleep(wait_sleep)
+        await self._fill(0)
+        result = bytes(self._buffer)
+        self._buffer.clear()
+        logger.debug(f"response={result}")
+        return result
+
+    async def read_until(self, expected=b"", size=None) -> bytes:
+        """
+        Read device data until expected is reached or expected result size is reached.
+
+        Same as Connection.read_until(), returns what was read so far on timeout.
+
+        Parameters
+        ----------
+        expected : bytes, optional
+            Expected end bytes, by default b''
+        size : None | int, optional
+            Length of expected bytes, by default None
+
+        Returns
+        -------
+        bytes
+            Device response
+        """
+        logger.debug(f"read_until(expected={expected}, size={size})")
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self._timeout
+        while True:
+            end = None
+            if expected:
+                i = self._buffer.find(expected)
+                if i != -1:
+                    end = i + len(expected)
+            if size is not None and len(self._buffer) >= size:
+                end = size if end is None else min(end, size)
+            if end is not None:
+                break
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                logger.debug("read_until timeout")
+                end = len(self._buffer)
+                break
+            await self._fill(remaining)
+
+        result = bytes(self._buffer[:end])
+        del self._buffer[:end]
+        logger.debug(f"response={result}")
+        return result
+
+    @property
+    def idle_gap(self) -> float:
+        """Idle time ending a read_until_idle() response, seconds, see Connection."""
+        if self._idle_gap is not None:
+            return self._idle_gap
+        baudrate = getattr(self._con, "baudrate", None) or 115200
+        # 10 bits per character: start, 8 data, stop
+        gap = max(self._idle_gap_min, self._idle_gap_chars * 10 / baudrate)
+        if self._idle_delay_ewma is not None:
+            gap = max(gap, self._idle_gap_factor * self._idle_delay_ewma)
+        return gap
+
+    @idle_gap.setter
+    def idle_gap(self, value) -> None:
+        self._idle_gap = value
+
+    async def read_until_idle(self, min_size=1, gap=None) -> bytes:
+        """
+        Read a response of unknown size, same as Connection.read_until_idle()
+
+        Waits up to the connection timeout for min_size bytes, then reads until no
+        byte arrived for gap seconds, polled _idle_polls times.
+
+        Parameters
+        ----------
+        min_size : int, optional
+            Bytes the response has at least, by default 1
+        gap : float | None, optional
+            Idle time ending the response, seconds, by default None i.e. idle_gap
+
+        Returns
+        -------
+        bytes
+            Device response, shorter than min_size on timeout.
+        """
+        gap = self.idle_gap if gap is None else gap
+        logger.debug(f"read_until_idle(min_size={min_size}, gap={gap:.3f})")
+        result = bytearray(await self.read_until(expected=b"", size=min_size))
+        if len(result) < min_size:
+            logger.debug("read_until_idle timeout")
+            return bytes(result)
+
+        # bytes read past min_size by read_until()
+        result += self._buffer
+        self._buffer.clear()
+        loop = asyncio.get_running_loop()
+        poll = gap / self._idle_polls
+        empty = 0
+        last = loop.time()
+        max_delay = 0
+        while empty < self._idle_polls:
+            waiting = self._con.in_waiting
+            if waiting:
+                result += self._con.read(waiting)
+                now = loop.time()
+                max_delay = max(max_delay, now - last)
+                last = now
+                empty = 0
+            else:
+                empty += 1
+                await asyncio.sleep(poll)
+
+        if self._idle_delay_ewma is None:
+            self._idle_delay_ewma = max_delay
+        else:
+            a = self._idle_gap_alpha
+            self._idle_delay_ewma = a * max_delay + (1 - a) * self._idle_delay_ewma
+        result = bytes(result)
+        logger.debug(f"response={result}")
+        return result
+
+    async def get(self, cmd, wait_sleep=0.3) -> bytes:
+        """
+        Write command to device and get response after wait_sleep seconds.
+
+        Parameters
+        ----------
+        cmd : bytes
+            Write command e.g. <GETVER>>
+        wait_sleep : float, optional
+            Time to give device time to write, by default 0.3
+
+        Returns
+        -------
+        bytes
+            Device response
+        """
+        logger.debug(f"get(cmd={cmd}, wait_sleep={wait_sleep})")
+        await self.write(cmd)
+        return await self.read(wait_sleep=wait_sleep)
+
+    async def get_exact(self, cmd, expected=b"", size=None) -> bytes:
+        """
+        Write command to device and read until expected, size or timeout is reached.
+
+        Parameters
+        ----------
+        cmd : bytes
+            Write command e.g. <GETVER>>
+        expected : bytes, optional
+            Expected end bytes, by default b''
+        size : int | None, optional
+            Expected response size, by default None
+
+        Returns
+        -------
+        bytes
+            Device response
+        """
+        logger.debug(f"get_exact(cmd={cmd}, expected={expected}, size={size})")
+        await self.write(cmd)
+        return await self.read_until(expected=expected, size=size)
+
+    async def get_until_idle(self, cmd, min_size=1, gap=None) -> bytes:
+        """
+        Write command to device and read its response of unknown size.
+
+        Parameters
+        ----------
+        cmd : bytes
+            Write command e.g. <GETVER>>
+        min_size : int, optional
+            Bytes the response has at least, by default 1
+        gap : float | None, optional
+            Idle time ending the response, seconds, by default None i.e. idle_gap
+
+        Returns
+        -------
+        bytes
+            Device response
+        """
+        logger.debug(f"get_until_idle(cmd={cmd}, min_size={min_size}, gap={gap})")
+        await self.write(cmd)
+        return await self.read_until_idle(min_size=min_size, gap=gap)
@@ -5,12 +5,16 @@ This is the communication class.
 """
 import inspect
 import logging
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 
 # pypi
 import serial
 from serial.tools import list_ports as serial_list_ports
 
+from .metrics import CommandEvent, ConnectionMetrics, command_name
+
 logger = logging.getLogger("pygmc.connection")
 
 
@@ -22,6 +26,22 @@ class Connection:
     Effectively a wrapper for pyserial for GMC specific tasks.
     """
 
+    # serial timeout when probing a port baudrate, seconds
+    _probe_timeout = 1
+    # ports probed concurrently
+    _probe_workers = 8
+    # read_until_idle() gap: at least this many character times, seconds floor for
+    # USB serial adapters forwarding bytes in packets
+    _idle_gap_chars = 32
+    _idle_gap_min = 0.02
+    # learned gap: factor * EWMA of the largest inter-byte delay per response
+    _idle_gap_factor = 2
+    _idle_gap_alpha = 0.2
+    # in_waiting polls per gap
+    _idle_polls = 8
+    # fixed size commands written back-to-back, bounds the device input buffering
+    _pipeline_depth = 8
+
     def __init__(self, timeout=5):
         """
         Represent a connection to a GMC device.
@@ -54,6 +74,17 @@ class Connection:
         self._timeout = timeout  # seconds
         self._baudrate = 115200  # default
         self._con = None
+        # user set read_until_idle() gap, None: from baudrate & learned
+        self._idle_gap = None
+        self._idle_delay_ewma = None
+        # submit() I/O worker, started on first use
+        self._worker = None
+        self._worker_ident = None
+        self._worker_lock = threading.Lock()
+        # byte counters & per command latency, see stats()
+        self.metrics = ConnectionMetrics()
+        # time.monotonic_ns() of the last read returning data
+        self._last_read_ns = None
 
         # pyserial has a breaking change from 3.4 to 3.5
         # TypeError:
@@ -121,37 +152,157 @@ class Connection:
         logger.debug(f"Baudrate check returned unexpected result: {result}")
         return False
 
-    def _find_correct_baudrate(self, port: str) -> bool:
+    def _probe_baudrate(self, port: str, stop=None):
         """
-        Given a successful port, attempt/confirm a baudrate works.
+        Find a baudrate the device on port responds to.
 
         Parameters
         ----------
         port : str
             Device port
+        stop : threading.Event | None, optional
+            Stop probing (before the next baudrate) once set, by default None
 
         Returns
         -------
-        bool
-            True: successful connection
-            False: some error
+        int | None
+            Working baudrate, None if no baudrate works or stopped.
         """
         for br in self._baudrates:
+            if stop is not None and stop.is_set():
+                logger.debug(f"Stop probing port={port}")
+                return None
             logger.debug(f"Checking baudrate={br} for port={port}")
             try:
                 # A successful connection doesn't mean the baudrate can read/write.
-                con = serial.Serial(port, baudrate=br, timeout=1)
-                if self._check_baudrate(con):
+                con = serial.Serial(port, baudrate=br, timeout=self._probe_timeout)
+                try:
+                    if self._check_baudrate(con):
+                        logger.debug(f"Baudrate={br} wrote and read data.")
+                        return br
+                finally:
                     con.close()
-                    self._baudrate = br
-                    logger.debug(f"Baudrate={br} wrote and read data.")
-                    return True
-                con.close()
             except (OSError, serial.SerialException) as e:
                 # SerialException
                 # In case the device can not be found or can not be configured.
                 logger.warning(f"{e}", exc_info=True)
-        return False
+        return None
+
+    def _find_correct_baudrate(self, port: str) -> bool:
+        """
+        Given a successful port, attempt/confirm a baudrate works.
+
+        Parameters
+        ----------
+        port : str
+            Device port
+
+        Returns
+        -------
+        bool
+            True: successful connection
+            False: some error
+        """
+        br = self._probe_baudrate(port)
+        if br is None:
+            return False
+        self._baudrate = br
+        return True
+
+    def _probe_ports(self, ports, first=False) -> list:
+        """
+        Probe ports concurrently in a thread pool.
+
+        Parameters
+        ----------
+        ports : list
+            Port names e.g. ['/dev/ttyUSB0', '/dev/ttyUSB1']
+        first : bool, optional
+            Only find the first port in list order that works, by default False.
+            Probes of later ports stop once a port works.
+
+        Returns
+        -------
+        list
+            [(port, baudrate), ...] of working ports, in order of ports.
+            Only the first working port if first=True.
+        """
+        if not ports:
+            return []
+        # a match only stops the probes of later ports
+        stops = [threading.Event() for _ in ports]
+        found = {}
+        workers = min(self._probe_workers, len(ports))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(self._probe_baudrate, port, stop)
+                for port, stop in zip(ports, stops)
+            ]
+            pending = dict(zip(futures, range(len(ports))))
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i = pending.pop(future)
+                    br = None if future.cancelled() else future.result()
+                    if br is not None:
+                        found[i] = br
+                if first and found:
+                    best = min(found)
+                    # later probes stop before their next baudrate
+                    for i in range(best + 1, len(ports)):
+                        stops[i].set()
+                        futures[i].cancel()
+                    # the first port in list order that works, once earlier ones failed
+                    if not any(future in pending for future in futures[:best]):
+                        break
+        if first and found:
+            best = min(found)
+            return [(ports[best], found[best])]
+        return [(ports[i], found[i]) for i in sorted(found)]
+
+    def _port_hwids(self, vid=None, pid=None, description=None, hardware_id=None):
+        """{port: hwid} of USB ports matching ANY of the given parameters."""
+        inputs = [vid, pid, description, hardware_id]
+        if not any(v is not None for v in inputs):
+            # no user info to go on... let's see what we can do...
+            ports = self._get_available_usb_devices()
+        else:
+            regexp = "|".join([x for x in inputs if x])
+            logger.debug(f"serial.tools.list_ports.grep({regexp})")
+            ports = self._get_available_usb_devices(regexp=regexp)
+        # e.g. {'/dev/ttyUSBO': 'USB VID:PID=1A86:7523 LOCATION=2-1'}
+        return {port.device: port.hwid for port in ports}
+
+    def _find_ports(self, vid=None, pid=None, description=None, hardware_id=None):
+        """USB port names matching ANY of the given parameters, all if none given."""
+        return list(self._port_hwids(vid, pid, description, hardware_id))
+
+    def discover(
+        self, vid=None, pid=None, description=None, hardware_id="1A86:7523", exclude=()
+    ) -> list:
+        """
+        Find every connected GMC device, ports are probed concurrently.
+
+        Parameters
+        ----------
+        vid : str | None, optional
+            Device vendor ID as hex, by default None
+        pid : str | None, optional
+            Device product ID as hex, by default None
+        description : str | None, optional
+            Device description, by default None
+        hardware_id : str | None, optional
+            Device hwid, by default "1A86:7523"
+        exclude : iterable, optional
+            Ports not probed e.g. ports already in use, by default ()
+
+        Returns
+        -------
+        list
+            [(port, baudrate), ...] e.g. [('/dev/ttyUSB0', 115200)]
+        """
+        ports = self._find_ports(vid, pid, description, hardware_id)
+        return self._probe_ports([port for port in ports if port not in exclude])
 
     @staticmethod
     def _get_available_usb_devices(regexp=None, include_links=True) -> list:
@@ -215,6 +366,7 @@ class Connection:
         connect to all available ports.
         If ANY parameter is given; it refines the search, any matches are considered.
         Parameters are used as an OR search.
+        Ports are probed concurrently, the first port found to be a GMC device is used.
 
         Parameters
         ----------
@@ -253,29 +405,15 @@ class Connection:
                 raise ConnectionError(f"Unable to connect to: {port}")
 
         else:
-            # ANY match, first match, becomes the device
-            inputs = [vid, pid, description, hardware_id]
-            if not any(v is not None for v in inputs):
-                # no user info to go on... let's see what we can do...
-                ports = self._get_available_usb_devices()
-            else:
-                regexp = "|".join([x for x in inputs if x])
-                logger.debug(f"serial.tools.list_ports.grep({regexp})")
-                ports = self._get_available_usb_devices(regexp=regexp)
-
-            works = False
-            for avail_port in ports:
-                port = avail_port.device  # e.g. /dev/ttyUSBO
-                logger.debug(port)
-                works = self._find_correct_baudrate(port=port)
-                if works:
-                    self._con = serial.Serial(
-                        port=port, baudrate=self._baudrate, timeout=self._timeout
-                    )
-                    logger.info(f"Connected to {self._con.port}")
-                    break
-            if not works:
+            # ANY match, first found, becomes the device
+            ports = self._find_ports(vid, pid, description, hardware_id)
+            found = self._probe_ports(ports, first=True)
+            if not found:
                 raise ConnectionError()
+            port, self._baudrate = found[0]
+            self._con = serial.Serial(
+                port=port, baudrate=self._baudrate, timeout=self._timeout
+            )
             logger.info(f"Connected: {self._con}")
 
     def connect_exact(self, port, baudrate) -> None:
@@ -311,14 +449,197 @@ class Connection:
         self._con = connection  # good luck
         logger.info(f"Connected: {self._con}")
 
+    def connect_profile(self, port, baudrate, serial_number) -> bool:
+        """
+        Connect with a known port and baudrate, validated with one <GETSERIAL>>.
+
+        Parameters
+        ----------
+        port : str
+            Port. e.g. linux /dev/ttyUSB0 or windows COM3
+        baudrate : int
+            Baudrate e.g. 115200
+        serial_number : str
+            Expected device serial as hex e.g. from device.get_serial()
+
+        Returns
+        -------
+        bool
+            True: connected to the expected device. False: not connected.
+        """
+        logger.debug(f"Profile connect attempt: port={port} baudrate={baudrate}")
+        try:
+            con = serial.Serial(port=port, baudrate=baudrate, timeout=self._probe_timeout)
+        except (OSError, serial.SerialException) as e:
+            logger.debug(f"Profile connect failed: {e}")
+            return False
+        self._con = con
+        self._baudrate = baudrate
+        try:
+            # a device left in heartbeat mode doesn't validate, full connect fixes it
+            self.reset_buffers()
+            result = self.get_exact(b"<GETSERIAL>>", size=7)
+        except (OSError, serial.SerialException) as e:
+            logger.debug(f"Profile connect failed: {e}")
+            result = b""
+        if result.hex() != serial_number:
+            logger.info(f"Profile serial mismatch: {result.hex()} != {serial_number}")
+            con.close()
+            self._con = None
+            return False
+        con.timeout = self._timeout
+        logger.info(f"Connected: {self._con}")
+        return True
+
+    def get_hwid(self):
+        """USB hardware ID of the connected port, None if unknown."""
+        return self._port_hwids().get(self._con.port)
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """
+        Run fn(*args, **kwargs) on the connection I/O worker thread.
+
+        The single worker runs calls one at a time in submit order, so a call doing
+        several connection steps (e.g. a device method: reset buffers, write, read)
+        is a transaction calls from other threads can't interleave with. Every thread
+        sharing the connection must go through submit(), e.g. BaseDevice.submit().
+
+        A call submitted from the worker itself runs at once, no deadlock.
+
+        Parameters
+        ----------
+        fn : callable
+            Function using the connection.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            fn return value or exception.
+        """
+        if threading.get_ident() == self._worker_ident:
+            future = Future()
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = ThreadPoolExecutor(
+                    max_workers=1,
+                    thread_name_prefix="pygmc-io",
+                    initializer=self._init_worker,
+                )
+            return self._worker.submit(fn, *args, **kwargs)
+
+    def _init_worker(self) -> None:
+        self._worker_ident = threading.get_ident()
+        logger.debug("I/O worker started")
+
     def close_connection(self) -> None:
-        """Close connection."""
+        """Close connection, after the calls already submitted are done."""
+        with self._worker_lock:
+            worker, self._worker = self._worker, None
+        if worker is not None:
+            worker.shutdown(wait=threading.get_ident() != self._worker_ident)
+            self._worker_ident = None
         if self._con is None:
             pass
         else:
             logger.info(f"Close connection: {self._con}")
             self._con.close()
 
+    def stats(self) -> dict:
+        """
+        Snapshot of the connection metrics: bytes, short reads, timeouts and latency
+        per command, see ConnectionMetrics.stats()
+
+        Returns
+        -------
+        dict
+            e.g. {'bytes_out': 18, 'bytes_in': 8, 'short_reads': 0, 'timeouts': 0,
+            'commands': {'GETCPM': {'count': 2, ..., 'latency_ms': {'p50': 1.2, ...}}}}
+        """
+        stats = self.metrics.stats()
+        stats["port"] = getattr(self._con, "port", None)
+        stats["baudrate"] = getattr(self._con, "baudrate", None)
+        return stats
+
+    def add_hook(self, hook) -> None:
+        """
+        Call hook(event) after every command round trip, e.g. get_exact().
+
+        Parameters
+        ----------
+        hook : callable
+            hook(pygmc.connection.CommandEvent) called from the thread doing the I/O,
+            exceptions are logged and ignored.
+        """
+        self.metrics.add_hook(hook)
+
+    def remove_hook(self, hook) -> None:
+        """Stop calling a hook added with add_hook()."""
+        self.metrics.remove_hook(hook)
+
+    def record_command(self, cmd, start_ns, result, expected, end_ns=None) -> None:
+        """
+        Record a command round trip, from writing cmd to its last response byte.
+
+        Done by the Connection methods, call it for command I/O done directly on the
+        port e.g. DeviceLoop, HeartbeatStream. Response bytes are counted separately
+        with record_received().
+
+        Parameters
+        ----------
+        cmd : bytes
+            Command written e.g. <GETCPM>>
+        start_ns : int
+            time.monotonic_ns() when cmd was written
+        result : bytes
+            Device response
+        expected : int | None
+            Expected response size, fewer bytes is a short read or timeout.
+        end_ns : int | None, optional
+            time.monotonic_ns() of the last response byte, by default None i.e. the
+            last record_received()
+        """
+        if end_ns is None:
+            end_ns = time.monotonic_ns()
+            if (
+                result
+                and self._last_read_ns is not None
+                and self._last_read_ns > start_ns
+            ):
+                end_ns = self._last_read_ns
+        event = CommandEvent(
+            command_name(cmd),
+            cmd,
+            start_ns,
+            end_ns - start_ns,
+            len(cmd),
+            len(result),
+            expected,
+        )
+        self.metrics.command(event)
+
+    def record_received(self, result, expected=None) -> None:
+        """
+        Count bytes read.
+
+        Done by the Connection methods, call it for bytes read directly from the port
+        e.g. DeviceLoop, HeartbeatStream.
+
+        Parameters
+        ----------
+        result : bytes
+            Bytes read
+        expected : int | None, optional
+            Expected size, fewer bytes is a short read or timeout, by default None
+        """
+        if result:
+            self._last_read_ns = time.monotonic_ns()
+        self.metrics.read(len(result), expected)
+
     def reset_buffers(self) -> None:
         """
         Reset input & output buffers on pyserial connection.
@@ -347,6 +668,7 @@ class Connection:
         logger.debug(f"write='{cmd}'")
         self._con.write(cmd)
         self._con.flush()
+        self.metrics.written(len(cmd))
 
     def read(self, wait_sleep=0.3) -> bytes:
         """
@@ -381,6 +703,7 @@ class Connection:
             logger.debug("read(in_waiting)")
             result = self._con.read(self._con.in_waiting)
 
+        self.record_received(result)
         logger.debug(f"response={result}")
         return result
 
@@ -408,9 +731,176 @@ class Connection:
         # This is to resolve pyserial breaking change. See __init__ above.
         params = {self._read_until_param_name: expected, "size": size}
         result = self._con.read_until(**params)
+        self.record_received(result, size)
+        logger.debug(f"response={result}")
+        return result
+
+    @property
+    def idle_gap(self) -> float:
+        """
+        Idle time ending a read_until_idle() response, seconds.
+
+        By default the time of _idle_gap_chars characters at the connection baudrate
+        (at least _idle_gap_min), raised to _idle_gap_factor times the inter-byte
+        delays learned from this device's responses. Set a float to fix it, None to
+        go back to the adaptive gap.
+        """
+        if self._idle_gap is not None:
+            return self._idle_gap
+        baudrate = getattr(self._con, "baudrate", None) or self._baudrate
+        # 10 bits per character: start, 8 data, stop
+        gap = max(self._idle_gap_min, self._idle_gap_chars * 10 / baudrate)
+        if self._idle_delay_ewma is not None:
+            gap = max(gap, self._idle_gap_factor * self._idle_delay_ewma)
+        return gap
+
+    @idle_gap.setter
+    def idle_gap(self, value) -> None:
+        self._idle_gap = value
+
+    def read_until_idle(self, min_size=1, gap=None) -> bytes:
+        """
+        Read a response of unknown size.
+
+        Waits up to the connection timeout for min_size bytes, then reads until no
+        byte arrived for gap seconds, polled _idle_polls times.
+
+        Parameters
+        ----------
+        min_size : int, optional
+            Bytes the response has at least, by default 1
+        gap : float | None, optional
+            Idle time ending the response, seconds, by default None i.e. idle_gap
+
+        Returns
+        -------
+        bytes
+            Device response, shorter than min_size on timeout.
+        """
+        gap = self.idle_gap if gap is None else gap
+        logger.debug(f"read_until_idle(min_size={min_size}, gap={gap:.3f})")
+        result = bytearray(self.read_until(expected=b"", size=min_size))
+        if len(result) < min_size:
+            logger.debug("read_until_idle timeout")
+            return bytes(result)
+
+        # poll in_waiting, setting the serial timeout to gap would reconfigure the
+        # port (termios) twice per call. Idle is counted in empty polls, not time, so
+        # a recorded session (connection.replay) replays the same calls.
+        poll = gap / self._idle_polls
+        # a replayed port (ReplaySerial) scales the waits by its speed
+        sleep = getattr(self._con, "idle_sleep", time.sleep)
+        empty = 0
+        last = time.monotonic()
+        max_delay = 0
+        while empty < self._idle_polls:
+            waiting = self._con.in_waiting
+            if waiting:
+                chunk = self._con.read(waiting)
+                self.record_received(chunk)
+                result += chunk
+                now = time.monotonic()
+                max_delay = max(max_delay, now - last)
+                last = now
+                empty = 0
+            else:
+                empty += 1
+                sleep(poll)
+
+        if self._idle_delay_ewma is None:
+            self._idle_delay_ewma = max_delay
+        else:
+            a = self._idle_gap_alpha
+            self._idle_delay_ewma = a * max_delay + (1 - a) * self._idle_delay_ewma
+        result = bytes(result)
         logger.debug(f"response={result}")
         return result
 
+    def get_until_idle(self, cmd, min_size=1, gap=None) -> bytes:
+        """
+        Write command to device and read its response of unknown size.
+
+        Parameters
+        ----------
+        cmd : bytes
+            Write command e.g. <GETVER>>
+        min_size : int, optional
+            Bytes the response has at least, by default 1
+        gap : float | None, optional
+            Idle time ending the response, seconds, by default None i.e. idle_gap
+
+        Returns
+        -------
+        bytes
+            Device response
+        """
+        logger.debug(f"get_until_idle(cmd={cmd}, min_size={min_size}, gap={gap})")
+        start_ns = time.monotonic_ns()
+        self.write(cmd)
+        result = self.read_until_idle(min_size=min_size, gap=gap)
+        self.record_command(cmd, start_ns, result, min_size)
+        return result
+
+    def get_pipelined(self, commands) -> list:
+        """
+        Write commands back-to-back, then split the concatenated responses.
+
+        Commands with a fixed response size are written in batches of up to
+        _pipeline_depth, so a batch costs one USB round trip instead of one per
+        command. A command with an unknown response size runs alone with
+        get_until_idle() once the responses before it are read.
+
+        Parameters
+        ----------
+        commands : list
+            [(cmd, size), ...] or [(cmd, size, min_size), ...] e.g.
+            [(b"<GETCPM>>", 4), (b"<GETVER>>", None, 7)]. min_size is the
+            get_until_idle() min_size of a command with size None, by default 1
+
+        Returns
+        -------
+        list
+            Device response of every command, in order. Shorter than size on timeout.
+        """
+        logger.debug(f"get_pipelined(commands={commands})")
+        results = []
+        batch = []
+        for cmd, size, *min_size in commands:
+            if size is None:
+                results.extend(self._get_batch(batch))
+                batch = []
+                results.append(self.get_until_idle(cmd, *min_size))
+                continue
+            batch.append((cmd, size))
+            if len(batch) == self._pipeline_depth:
+                results.extend(self._get_batch(batch))
+                batch = []
+        results.extend(self._get_batch(batch))
+        return results
+
+    def _get_batch(self, batch) -> list:
+        """Write fixed response size commands at once, split the responses."""
+        if not batch:
+            return []
+        start_ns = time.monotonic_ns()
+        self.write(b"".join(cmd for cmd, _ in batch))
+        # read response by response, for the latency of each command
+        responses = []
+        timed_out = False
+        for cmd, size in batch:
+            # after a timeout, don't wait again for every later response
+            response = b"" if timed_out else self.read_until(expected=b"", size=size)
+            timed_out = timed_out or len(response) < size
+            self.record_command(cmd, start_ns, response, size)
+            responses.append(response)
+        received = sum(len(response) for response in responses)
+        expected = sum(size for _, size in batch)
+        if received != expected:
+            # a late response would shift every later response
+            logger.warning(f"Pipelined read got {received} of {expected} bytes")
+            self.reset_buffers()
+        return responses
+
     def get(self, cmd, wait_sleep=0.3) -> bytes:
         """
         Write command to device and get response.
@@ -431,8 +921,10 @@ class Connection:
             Device response
         """
         logger.debug(f"get(cmd={cmd}, wait_sleep={wait_sleep})")
+        start_ns = time.monotonic_ns()
         self.write(cmd)
         result = self.read(wait_sleep=wait_sleep)
+        self.record_command(cmd, start_ns, result, None)
         logger.debug(f"response={result}")
         return result
 
@@ -459,6 +951,8 @@ class Connection:
             Device response
         """
         logger.debug(f"get_exact(cmd={cmd}, expected={expected}, size={size})")
+        start_ns = time.monotonic_ns()
         self.write(cmd)
         result = self.read_until(expected=expected, size=size)
+        self.record_command(cmd, start_ns, result, size)
         return result
@@ -0,0 +1,320 @@
+"""
+Connection instrumentation: per command latency histograms, byte and timeout counters.
+"""
+import logging
+import math
+import re
+import threading
+
+logger = logging.getLogger("pygmc.connection.metrics")
+
+# command name, digits only when they end the command e.g. KEY0 but not SPIR + binary
+_command_re = re.compile(rb"<([A-Z]+)(\d*>>)?")
+
+
+def command_name(cmd) -> str:
+    """
+    Name of a command e.g. b'<GETCPM>>' -> 'GETCPM', b'<SPIR...binary...>>' -> 'SPIR'
+
+    Parameters
+    ----------
+    cmd : bytes
+        Command written to the device.
+    """
+    match = _command_re.match(bytes(cmd))
+    if match is None:
+        return "UNKNOWN"
+    name = match.group(1)
+    if match.group(2):
+        name += match.group(2)[:-2]
+    return name.decode("ascii")
+
+
+class LatencyHistogram:
+    """
+    HDR style histogram of latencies, nanoseconds.
+
+    Buckets are linear within each power of two, 2**sub_bucket_bits per power of two,
+    i.e. a value is recorded with a relative error below 2**-sub_bucket_bits
+    (default 7: < 0.8%) from nanoseconds to hours, in a few thousand buckets at most.
+    """
+
+    def __init__(self, sub_bucket_bits=7):
+        """
+        Represent an empty histogram.
+
+        Parameters
+        ----------
+        sub_bucket_bits : int, optional
+            Precision, buckets per power of two is 2**sub_bucket_bits, by default 7
+        """
+        self._bits = sub_bucket_bits
+        # {bucket index: count}
+        self._buckets = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def _index(self, value) -> int:
+        shift = value.bit_length() - self._bits - 1
+        if shift <= 0:
+            return value
+        return ((shift + 1) << self._bits) + (value >> shift) - (1 << self._bits)
+
+    def _lowest(self, index) -> int:
+        """Lowest value of a bucket."""
+        shift = (index >> self._bits) - 1
+        if shift <= 0:
+            return index
+        return ((index & ((1 << self._bits) - 1)) + (1 << self._bits)) << shift
+
+    def record(self, value) -> None:
+        """Record a latency, nanoseconds."""
+        value = max(int(value), 0)
+        index = self._index(value)
+        self._buckets[index] = self._buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other) -> None:
+        """Add the values of another histogram with the same sub_bucket_bits."""
+        if other._bits != self._bits:
+            raise ValueError("histograms must have the same sub_bucket_bits")
+        for index, count in other._buckets.items():
+            self._buckets[index] = self._buckets.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+    @property
+    def mean(self):
+        """Mean latency, nanoseconds, None if empty."""
+        return self.total / self.count if self.count else None
+
+    def percentile(self, percent):
+        """
+        Latency at a percentile, nanoseconds, None if empty.
+
+        Parameters
+        ----------
+        percent : float
+            Percentile e.g. 99.9
+
+        Returns
+        -------
+        int | None
+            Highest value of the bucket the percentile falls in, at most max.
+        """
+        if not self.count:
+            return None
+        # values at or below the percentile, tolerate float error e.g. 99.9%
+        rank = max(math.ceil(percent * self.count / 100 - 1e-9), 1)
+        seen = 0
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if seen >= rank:
+                return min(self._lowest(index + 1) - 1, self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        """count, min, mean, p50, p90, p99, p99.9 & max in milliseconds."""
+        ms = 1e6
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "min": self.min / ms,
+            "mean": self.mean / ms,
+            "p50": self.percentile(50) / ms,
+            "p90": self.percentile(90) / ms,
+            "p99": self.percentile(99) / ms,
+            "p99.9": self.percentile(99.9) / ms,
+            "max": self.max / ms,
+        }
+
+
+class CommandEvent:
+    """A command round trip, passed to Connection hooks."""
+
+    __slots__ = (
+        "name",
+        "cmd",
+        "start_ns",
+        "latency_ns",
+        "bytes_out",
+        "bytes_in",
+        "expected",
+        "short",
+        "timeout",
+    )
+
+    def __init__(self, name, cmd, start_ns, latency_ns, bytes_out, bytes_in, expected):
+        """
+        Represent a command round trip.
+
+        Parameters
+        ----------
+        name : str
+            Command name e.g. 'GETCPM'
+        cmd : bytes
+            Command written.
+        start_ns : int
+            time.monotonic_ns() when the command was written.
+        latency_ns : int
+            Nanoseconds from writing the command to its last response byte.
+        bytes_out : int
+            Bytes written.
+        bytes_in : int
+            Response bytes.
+        expected : int | None
+            Expected response size, None if unknown.
+        """
+        self.name = name
+        self.cmd = cmd
+        self.start_ns = start_ns
+        self.latency_ns = latency_ns
+        self.bytes_out = bytes_out
+        self.bytes_in = bytes_in
+        self.expected = expected
+        # fewer bytes than expected, timeout: no response at all
+        self.timeout = expected is not None and expected > 0 and bytes_in == 0
+        self.short = expected is not None and 0 < bytes_in < expected
+
+    def __repr__(self):
+        return "CommandEvent(name={}, latency={:.3f}ms, in={}, out={})".format(
+            self.name, self.latency_ns / 1e6, self.bytes_in, self.bytes_out
+        )
+
+
+class _CommandMetrics:
+    """Counters & latency histogram of one command name."""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.short_reads = 0
+        self.timeouts = 0
+
+
+class ConnectionMetrics:
+    """
+    Instrumentation of a Connection.
+
+    Totals count every byte written and read, commands only the round trips (write a
+    command, read its response) e.g. Connection.get_exact(). Hooks are called with a
+    CommandEvent after every round trip, from the thread doing the I/O.
+    """
+
+    def __init__(self):
+        """Represent empty metrics."""
+        self._lock = threading.Lock()
+        self._hooks = []
+        self.reset()
+
+    def reset(self) -> None:
+        """Zero every counter and histogram."""
+        with self._lock:
+            self.bytes_out = 0
+            self.bytes_in = 0
+            self.short_reads = 0
+            self.timeouts = 0
+            self._commands = {}
+
+    def add_hook(self, hook) -> None:
+        """
+        Call hook(event) after every command round trip.
+
+        Parameters
+        ----------
+        hook : callable
+            hook(CommandEvent), exceptions are logged and ignored.
+        """
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook) -> None:
+        """Stop calling a hook added with add_hook()."""
+        self._hooks.remove(hook)
+
+    def written(self, size) -> None:
+        """Count bytes written."""
+        with self._lock:
+            self.bytes_out += size
+
+    def read(self, size, expected=None) -> None:
+        """Count bytes read, and a short read or timeout if fewer than expected."""
+        with self._lock:
+            self.bytes_in += size
+            if expected:
+                if size == 0:
+                    self.timeouts += 1
+                elif size < expected:
+                    self.short_reads += 1
+
+    def command(self, event) -> None:
+        """Record a command round trip, then call the hooks."""
+        with self._lock:
+            metrics = self._commands.get(event.name)
+            if metrics is None:
+                metrics = self._commands[event.name] = _CommandMetrics()
+            metrics.latency.record(event.latency_ns)
+            metrics.bytes_out += event.bytes_out
+            metrics.bytes_in += event.bytes_in
+            metrics.short_reads += event.short
+            metrics.timeouts += event.timeout
+        for hook in list(self._hooks):
+            try:
+                hook(event)
+            except Exception:
+                logger.exception(f"Hook {hook} failed")
+
+    def histogram(self, name) -> LatencyHistogram:
+        """
+        Latency histogram of a command, a copy.
+
+        Parameters
+        ----------
+        name : str
+            Command name e.g. 'GETCPM'
+        """
+        histogram = LatencyHistogram()
+        with self._lock:
+            if name in self._commands:
+                histogram.merge(self._commands[name].latency)
+        return histogram
+
+    def stats(self) -> dict:
+        """
+        Snapshot of the counters.
+
+        Returns
+        -------
+        dict
+            bytes_out, bytes_in, short_reads, timeouts totals, and commands
+            {name: {count, bytes_out, bytes_in, short_reads, timeouts, latency_ms}}
+            latency_ms is LatencyHistogram.summary()
+        """
+        with self._lock:
+            return {
+                "bytes_out": self.bytes_out,
+                "bytes_in": self.bytes_in,
+                "short_reads": self.short_reads,
+                "timeouts": self.timeouts,
+                "commands": {
+                    name: {
+                        "count": metrics.latency.count,
+                        "bytes_out": metrics.bytes_out,
+                        "bytes_in": metrics.bytes_in,
+                        "short_reads": metrics.short_reads,
+                        "timeouts": metrics.timeouts,
+                        "latency_ms": metrics.latency.summary(),
+                    }
+                    for name, metrics in sorted(self._commands.items())
+                },
+            }
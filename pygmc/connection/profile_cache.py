@@ -0,0 +1,91 @@
+"""
+Persistent cache of device connection profiles for fast reconnects.
+"""
+import json
+import logging
+import os
+
+logger = logging.getLogger("pygmc.connection.profile")
+
+
+class ProfileCache:
+    """
+    Connection profiles of known devices in a JSON file.
+
+    Profiles are keyed by USB hardware ID, which includes the USB location, so a
+    profile is found again when the port name changes (e.g. /dev/ttyUSB0 becomes
+    /dev/ttyUSB1). A profile is a dict:
+    {"port", "hwid", "baudrate", "serial", "device" (device class name), "version"}
+    """
+
+    _version = 1
+
+    def __init__(self, path=None):
+        """
+        Represent a profile cache file.
+
+        Parameters
+        ----------
+        path : str | None, optional
+            Cache file path, by default None i.e. default_path()
+        """
+        self.path = path or self.default_path()
+
+    @staticmethod
+    def default_path() -> str:
+        """$XDG_CACHE_HOME/pygmc/profiles.json, default ~/.cache/pygmc/profiles.json"""
+        cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+            os.path.expanduser("~"), ".cache"
+        )
+        return os.path.join(cache_home, "pygmc", "profiles.json")
+
+    def load(self) -> dict:
+        """
+        Load profiles.
+
+        Returns
+        -------
+        dict
+            {hwid: profile}, empty if there is no usable cache file.
+        """
+        try:
+            with open(self.path, "r") as f:
+                d = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.debug(f"No profile cache: {e}")
+            return {}
+        if d.get("version") != self._version:
+            return {}
+        return d.get("profiles", {})
+
+    def get(self, hwid):
+        """Profile of hwid, None if unknown."""
+        return self.load().get(hwid)
+
+    def put(self, profile) -> None:
+        """
+        Add or replace the profile of profile['hwid'].
+
+        Parameters
+        ----------
+        profile : dict
+            {"port", "hwid", "baudrate", "serial", "device", "version"}
+        """
+        profiles = self.load()
+        profiles[profile["hwid"]] = profile
+        self._save(profiles)
+
+    def remove(self, hwid) -> None:
+        """Remove the profile of hwid, e.g. when it no longer validates."""
+        profiles = self.load()
+        if profiles.pop(hwid, None) is not None:
+            self._save(profiles)
+
+    def _save(self, profiles) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": self._version, "profiles": profiles}, f, indent=2)
+        os.replace(tmp_path, self.path)
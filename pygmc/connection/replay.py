@@ -0,0 +1,270 @@
+"""
+Record a serial session with a device to a capture file, replay it without the device.
+
+Capture file format, big-endian:
+    b"PYGMCREC" + version (1 byte)
+    metadata: length (4 bytes) + JSON e.g. {"port": "/dev/ttyUSB0", "baudrate": 115200}
+    events: kind (1 byte) + time_ns since the recording started (8 bytes)
+            + payload length (4 bytes) + payload
+
+Event kinds:
+    W: bytes written
+    R: bytes returned by a read (read, read_until, read_all), empty on timeout
+    N: in_waiting value, 4 bytes
+    D: reset_input_buffer(), payload is the unread input it discarded
+"""
+import json
+import logging
+import struct
+import time
+
+logger = logging.getLogger("pygmc.connection.replay")
+
+_magic = b"PYGMCREC"
+_version = 1
+_event = struct.Struct(">cQI")
+
+
+def record(connection, path):
+    """
+    Record the session of a connected Connection from now on.
+
+    Parameters
+    ----------
+    connection : pygmc.connection.Connection
+        Connected connection, its serial port is wrapped.
+    path : str
+        Capture file path.
+
+    Returns
+    -------
+    RecordingSerial
+        The wrapper, closing the connection closes the capture file.
+    """
+    recorder = RecordingSerial(connection._con, path)
+    connection._con = recorder
+    return recorder
+
+
+def read_capture(path) -> tuple:
+    """
+    Read a capture file.
+
+    Returns
+    -------
+    tuple
+        (metadata, [(kind, time_ns, payload), ...]) kind is a str e.g. 'W'
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[: len(_magic)] != _magic or data[len(_magic)] != _version:
+        raise ValueError("Not a pygmc capture file: {}".format(path))
+    position = len(_magic) + 1
+    (size,) = struct.unpack_from(">I", data, position)
+    position += 4
+    metadata = json.loads(data[position : position + size].decode("utf8"))
+    position += size
+    events = []
+    while position < len(data):
+        kind, time_ns, size = _event.unpack_from(data, position)
+        position += _event.size
+        events.append((kind.decode(), time_ns, data[position : position + size]))
+        position += size
+    return metadata, events
+
+
+class RecordingSerial:
+    """
+    serial.Serial wrapper recording every write and read to a capture file.
+
+    Use with Connection.connect_user_provided() or record().
+    """
+
+    def __init__(self, con, path):
+        """
+        Represent a recording serial port.
+
+        Parameters
+        ----------
+        con : serial.Serial
+            Open serial port.
+        path : str
+            Capture file path, overwritten.
+        """
+        self._con = con
+        self.path = path
+        self._file = open(path, "wb")
+        metadata = json.dumps(
+            {
+                "port": getattr(con, "port", None),
+                "baudrate": getattr(con, "baudrate", None),
+            }
+        ).encode("utf8")
+        self._file.write(_magic + bytes([_version]) + struct.pack(">I", len(metadata)))
+        self._file.write(metadata)
+        self._start = time.monotonic_ns()
+        logger.info(f"Recording {con} to {path}")
+
+    def _record(self, kind, payload) -> None:
+        time_ns = time.monotonic_ns() - self._start
+        self._file.write(_event.pack(kind, time_ns, len(payload)))
+        self._file.write(payload)
+
+    def __getattr__(self, name):
+        # port, baudrate, fileno... of the wrapped port
+        return getattr(self._con, name)
+
+    @property
+    def timeout(self):
+        return self._con.timeout
+
+    @timeout.setter
+    def timeout(self, value):
+        self._con.timeout = value
+
+    @property
+    def in_waiting(self) -> int:
+        waiting = self._con.in_waiting
+        self._record(b"N", struct.pack(">I", waiting))
+        return waiting
+
+    def write(self, data):
+        n = self._con.write(data)
+        self._record(b"W", bytes(data))
+        return n
+
+    def flush(self) -> None:
+        self._con.flush()
+
+    def read(self, size=1) -> bytes:
+        result = self._con.read(size)
+        self._record(b"R", result)
+        return result
+
+    def read_until(self, *args, **kwargs) -> bytes:
+        result = self._con.read_until(*args, **kwargs)
+        self._record(b"R", result)
+        return result
+
+    def read_all(self) -> bytes:
+        result = self._con.read_all()
+        self._record(b"R", result)
+        return result
+
+    def reset_input_buffer(self) -> None:
+        # keep the discarded input e.g. the extra byte of the SPIR bug
+        waiting = self._con.in_waiting
+        discarded = self._con.read(waiting) if waiting else b""
+        self._con.reset_input_buffer()
+        self._record(b"D", discarded)
+
+    def reset_output_buffer(self) -> None:
+        self._con.reset_output_buffer()
+
+    def close(self) -> None:
+        """Close the serial port and the capture file."""
+        self._con.close()
+        if not self._file.closed:
+            self._file.close()
+
+
+class ReplaySerial:
+    """
+    serial.Serial like port playing back a capture file.
+
+    The code under test must make the same calls as during the recording, every call
+    gets the recorded result. A read returns its recorded delay after the last write,
+    divided by speed.
+
+    Use with Connection.connect_user_provided().
+    """
+
+    def __init__(self, path, speed=1.0):
+        """
+        Represent a replay of a capture file.
+
+        Parameters
+        ----------
+        path : str
+            Capture file path.
+        speed : float | None, optional
+            Playback speed factor e.g. 2 plays twice as fast, by default 1.0 i.e.
+            original speed. None plays as fast as possible.
+        """
+        metadata, self._events = read_capture(path)
+        self.port = metadata.get("port")
+        self.baudrate = metadata.get("baudrate")
+        self.timeout = None
+        self.write_timeout = None
+        self.speed = speed
+        self._position = 0
+        # replay time.monotonic_ns() & recorded time_ns of the last write
+        self._anchor = (time.monotonic_ns(), 0)
+        self.is_open = True
+
+    def _next(self, kind) -> bytes:
+        """Payload of the next event, which must be kind, at its recorded time."""
+        if self._position >= len(self._events):
+            raise RuntimeError("Replay ended, expected {} event".format(kind))
+        event_kind, time_ns, payload = self._events[self._position]
+        if event_kind != kind:
+            raise RuntimeError(
+                "Replay diverged at event {}: got {} expected {}".format(
+                    self._position, kind, event_kind
+                )
+            )
+        self._position += 1
+        if self.speed:
+            replay_ns, recorded_ns = self._anchor
+            due = replay_ns + (time_ns - recorded_ns) / self.speed
+            delay = (due - time.monotonic_ns()) / 1e9
+            if delay > 0:
+                time.sleep(delay)
+        if kind == "W":
+            self._anchor = (time.monotonic_ns(), time_ns)
+        return payload
+
+    @property
+    def remaining(self) -> int:
+        """Events not replayed yet."""
+        return len(self._events) - self._position
+
+    @property
+    def in_waiting(self) -> int:
+        return struct.unpack(">I", self._next("N"))[0]
+
+    def idle_sleep(self, seconds) -> None:
+        """Connection.read_until_idle() poll wait, divided by speed, none if None."""
+        if self.speed:
+            time.sleep(seconds / self.speed)
+
+    def write(self, data) -> int:
+        expected = self._next("W")
+        if bytes(data) != expected:
+            raise RuntimeError(
+                "Replay diverged at event {}: wrote {} expected {}".format(
+                    self._position - 1, bytes(data), expected
+                )
+            )
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def read(self, size=1) -> bytes:
+        return self._next("R")
+
+    def read_until(self, *args, **kwargs) -> bytes:
+        return self._next("R")
+
+    def read_all(self) -> bytes:
+        return self._next("R")
+
+    def reset_input_buffer(self) -> None:
+        self._next("D")
+
+    def reset_output_buffer(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.is_open = False
@@ -1,7 +1,9 @@
 import logging
 import re
 
-from .device import BaseDevice
+from .async_device import AsyncBaseDevice, AsyncDeviceRFC1201, AsyncDeviceRFC1801
+from .device import BaseDevice, _version_min_size
+from .device_loop import DeviceLoop
 from .device_rfc1201 import DeviceRFC1201
 from .device_rfc1801 import DeviceRFC1801
 from .gmc300 import GMC300, GMC300S, GMC300EPlus
@@ -9,6 +11,7 @@ from .gmc320 import GMC320, GMC320Plus, GMC320PlusV5
 from .gmc500 import GMC500, GMC500Plus
 from .gmc600 import GMC600, GMC600Plus
 from .gmc800 import GMC800
+from .heartbeat import HeartbeatCapture, HeartbeatStream
 
 logger = logging.getLogger("pygmc.device")
 
@@ -99,6 +102,27 @@ _regex_device_match_list = [
 ]
 
 
+def _device_class(version):
+    """Device class of a <GETVER>> version e.g. 'GMC-500+Re 2.22'"""
+    for device_re in _regex_device_match_list:
+        pattern = device_re["match"]
+        m = re.match(pattern=pattern, string=version)
+        if m:
+            logger.debug(f"pattern={pattern} matched version={version}")
+            return device_re["device"]
+
+    logger.debug("No device regex matched. Trying lower level base version.")
+
+    base_version = version[0:7]
+
+    if base_version not in _device_map:
+        logger.warning(f"Unable to auto assign device to Device={version}")
+        logger.warning("Assuming newer device. Manually specify device if incorrect.")
+        return DeviceRFC1801
+
+    return _device_map[base_version]
+
+
 def auto_get_device(connection):
     """
     Auto get device class
@@ -113,23 +137,31 @@ def auto_get_device(connection):
     """
     cmd = b"<GETVER>>"
     connection.reset_buffers()
-    version = connection.get(cmd).decode("utf8")
+    version = connection.get_until_idle(cmd, min_size=_version_min_size).decode("utf8")
     logger.debug(f"Device={version}")
+    return _device_class(version)(connection)
 
-    for device_re in _regex_device_match_list:
-        pattern = device_re["match"]
-        m = re.match(pattern=pattern, string=version)
-        if m:
-            logger.debug(f"pattern={pattern} matched version={version}")
-            return device_re["device"](connection)
 
-    logger.debug("No device regex matched. Trying lower level base version.")
+async def auto_get_device_async(connection):
+    """
+    Auto get asyncio device class, AsyncDeviceRFC1201 or AsyncDeviceRFC1801.
 
-    base_version = version[0:7]
+    Parameters
+    ----------
+    connection : pygmc.connection.AsyncConnection
+        An asyncio connection interface to the USB device.
 
-    if base_version not in _device_map:
-        logger.warning(f"Unable to auto assign device to Device={version}")
-        logger.warning("Assuming newer device. Manually specify device if incorrect.")
-        return DeviceRFC1801(connection)
+    Returns
+    -------
+    AsyncBaseDevice
+        Device ready to use.
 
-    return _device_map[base_version](connection)
+    """
+    cmd = b"<GETVER>>"
+    connection.reset_buffers()
+    version = await connection.get_until_idle(cmd, min_size=_version_min_size)
+    version = version.decode("utf8")
+    logger.debug(f"Device={version}")
+    if issubclass(_device_class(version), DeviceRFC1201):
+        return await AsyncDeviceRFC1201.create(connection)
+    return await AsyncDeviceRFC1801.create(connection)
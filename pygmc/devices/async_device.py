@@ -0,0 +1,259 @@
+"""
+asyncio GMC devices, use with pygmc.connection.AsyncConnection
+
+Commands, response sizes and response parsing are shared with the blocking device
+classes (_cmd_spec_map), only waiting on the device is done on the event loop.
+"""
+import logging
+from typing import AsyncGenerator, Tuple
+
+from .device import BaseDevice, _set_datetime_cmd, _version_min_size
+from .device_rfc1201 import DeviceRFC1201
+from .device_rfc1801 import DeviceRFC1801
+
+logger = logging.getLogger("pygmc.devices.async")
+
+
+class AsyncBaseDevice:
+    _cfg_spec_map = BaseDevice._cfg_spec_map
+    _cmd_spec_map = BaseDevice._cmd_spec_map
+    _heartbeat_spec = None
+    _parse_cfg = BaseDevice._parse_cfg
+
+    def __init__(self, connection):
+        """
+        Represent a base GMC device with an asyncio connection.
+
+        Heartbeat is not turned off here (no I/O in __init__), use create() or
+        pygmc.connect_async() to get a device ready to use.
+
+        Parameters
+        ----------
+        connection : pygmc.connection.AsyncConnection
+            An asyncio connection interface to the USB device.
+        """
+        self.connection = connection
+        # the config under the hood, initialize empty and lazily create
+        self._config = dict()
+        logger.debug("Initialize AsyncBaseDevice")
+
+    @classmethod
+    async def create(cls, connection):
+        """
+        Create device and turn heartbeat off, same as the blocking device __init__.
+
+        Parameters
+        ----------
+        connection : pygmc.connection.AsyncConnection
+            An asyncio connection interface to the USB device.
+
+        Returns
+        -------
+        AsyncBaseDevice
+            Device ready to use.
+        """
+        device = cls(connection)
+        # heartbeat-on keeps writing to buffer making other functionality un-parsable
+        await device._heartbeat_off()
+        return device
+
+    async def _heartbeat_off(self) -> None:
+        """Turn heartbeat OFF."""
+        await self.connection.write(b"<HEARTBEAT0>>")
+        self.connection.reset_buffers()
+        logger.debug("Heartbeat OFF")
+
+    async def _heartbeat_on(self) -> None:
+        """Turn heartbeat ON."""
+        await self.connection.write(b"<HEARTBEAT1>>")
+        logger.debug("Heartbeat ON")
+
+    async def _get(self, name):
+        """Write a command from _cmd_spec_map, read its response and parse it."""
+        spec = self._cmd_spec_map[name]
+        result = await self.connection.get_exact(
+            spec["cmd"], expected=b"", size=spec["size"]
+        )
+        return spec["parse"](result)
+
+    async def get_version(self) -> str:
+        """
+        Get version of device.
+
+        The response size is unknown, it is read until the device stops writing
+        (AsyncConnection.read_until_idle).
+
+        Returns
+        -------
+        str
+            Device version
+        """
+        self.connection.reset_buffers()
+        result = await self.connection.get_until_idle(
+            b"<GETVER>>", min_size=_version_min_size
+        )
+        return result.decode("utf8")
+
+    async def get_serial(self) -> str:
+        """Get serial."""
+        self.connection.reset_buffers()
+        return await self._get("get_serial")
+
+    async def get_cpm(self) -> int:
+        """Get CPM counts-per-minute data."""
+        return await self._get("get_cpm")
+
+    async def get_usv_h(self) -> float:
+        """
+        Get µSv/h.
+
+        Uses device calibration config.
+
+        Returns
+        -------
+        float
+            µSv/h
+        """
+        if not self._config:
+            await self.get_config()
+        cpm = await self.get_cpm()
+        return (cpm / self._config["CalibrationCPM_1"]) * self._config[
+            "Calibration_uSv_1"
+        ]
+
+    async def get_gyro(self) -> Tuple[int, int, int]:
+        """Get (X, Y, Z) gyroscope data."""
+        return await self._get("get_gyro")
+
+    async def get_voltage(self) -> float:
+        """Get device voltage in volts."""
+        return await self._get("get_voltage")
+
+    async def get_datetime(self):
+        """Get device datetime."""
+        return await self._get("get_datetime")
+
+    async def get_config(self) -> dict:
+        """
+        Get device config.
+
+        Returns
+        -------
+        dict
+
+        """
+        self.connection.reset_buffers()
+        cfg_bytes = await self._get("get_config")
+        self._parse_cfg(cfg_bytes)
+        return self._config
+
+    async def heartbeat_live(self, count=60) -> AsyncGenerator[int, None]:
+        """
+        Get live CPS data, as an async generator.
+
+        Parameters
+        ----------
+        count : int, optional
+            How many CPS counts to return (default=60). Theoretically, 1count = 1second.
+
+        Yields
+        ------
+        int
+            CPS
+        """
+        size, parse = self._heartbeat_spec["size"], self._heartbeat_spec["parse"]
+        self.connection.reset_buffers()
+        try:
+            await self._heartbeat_on()
+            for i in range(count):
+                raw = await self.connection.read_until(expected=b"", size=size)
+                yield parse(raw)
+        finally:
+            await self._heartbeat_off()
+
+    async def power_off(self) -> None:
+        """Power OFF device."""
+        self.connection.reset_buffers()
+        await self.connection.write(b"<POWEROFF>>")
+
+    async def power_on(self) -> None:
+        """Power ON device."""
+        self.connection.reset_buffers()
+        await self.connection.write(b"<POWERON>>")
+
+    async def send_key(self, key_number) -> None:
+        """
+        Send key press signal to device.
+
+        Parameters
+        ----------
+        key_number: int
+            key=0 -> S1 (back button), key=1 -> S2 (down button),
+            key=2 -> S3 (up button), key=3 -> S4 (power button)
+        """
+        if key_number not in (0, 1, 2, 3):
+            raise ValueError("key must be in (0, 1, 2, 3)")
+        await self.connection.write("<KEY{}>>".format(key_number).encode())
+
+    async def set_datetime(self, datetime_=None) -> None:
+        """
+        Set datetime on device.
+
+        Parameters
+        ----------
+        datetime_: None | datetime.datetime
+            Datetime to set. Default=None uses current time on computer.
+
+        Raises
+        ------
+        ValueError
+            Year value earlier than 2000.
+
+        RuntimeError
+            Unexpected response from device.
+        """
+        cmd = _set_datetime_cmd(datetime_)
+        self.connection.reset_buffers()
+        result = await self.connection.get_exact(cmd, expected=b"", size=1)
+        if not result == b"\xaa":
+            raise RuntimeError("Unexpected response: {}".format(result))
+
+    async def reboot(self) -> None:
+        """Reboot device."""
+        await self.connection.write(b"<REBOOT>>")
+
+
+class AsyncDeviceRFC1201(AsyncBaseDevice):
+    """asyncio GMC-280, GMC-300, GMC-320, GMC-800, same as DeviceRFC1201"""
+
+    _cfg_spec_map = DeviceRFC1201._cfg_spec_map
+    _cmd_spec_map = DeviceRFC1201._cmd_spec_map
+    _heartbeat_spec = DeviceRFC1201._heartbeat_spec
+
+    async def get_temp(self) -> float:
+        """Get device temperature in Celsius."""
+        return await self._get("get_temp")
+
+
+class AsyncDeviceRFC1801(AsyncBaseDevice):
+    """asyncio GMC-500, GMC-500+, GMC-600, GMC-600+, same as DeviceRFC1801"""
+
+    _cfg_spec_map = DeviceRFC1801._cfg_spec_map
+    _cmd_spec_map = DeviceRFC1801._cmd_spec_map
+    _heartbeat_spec = DeviceRFC1801._heartbeat_spec
+
+    async def get_cps(self) -> int:
+        """Get CPS counts-per-second."""
+        return await self._get("get_cps")
+
+    async def get_max_cps(self) -> int:
+        """Get the maximum counts-per-second since the device POWERED ON."""
+        return await self._get("get_max_cps")
+
+    async def get_cpmh(self) -> int:
+        """Get CPM of the high dose tube."""
+        return await self._get("get_cpmh")
+
+    async def get_cpml(self) -> int:
+        """Get CPM of the low dose tube."""
+        return await self._get("get_cpml")
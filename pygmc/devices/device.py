@@ -1,12 +1,161 @@
+import datetime
+import hashlib
+import json
 import logging
+import os
 import struct
+from concurrent.futures import Future
+from typing import Tuple
 
 from ..history import HistoryParser
 
 logger = logging.getLogger("pygmc.device")
 
+# <GETVER>> responses start with the model e.g. 'GMC-500', the rest has no set size
+_version_min_size = 7
+
+
+def _decode_utf8(result) -> str:
+    return result.decode("utf8")
+
+
+def _parse_datetime(data) -> datetime.datetime:
+    """Device datetime from YY MM DD HH MM SS 0xAA"""
+    year = int("20{0:2d}".format(data[0]))
+    month = int("{0:2d}".format(data[1]))
+    day = int("{0:2d}".format(data[2]))
+    hour = int("{0:2d}".format(data[3]))
+    minute = int("{0:2d}".format(data[4]))
+    second = int("{0:2d}".format(data[5]))
+    return datetime.datetime(year, month, day, hour, minute, second)
+
+
+def _parse_gyro(result) -> Tuple[int, int, int]:
+    """(X, Y, Z) from 3 big-endian signed 16 bit values then 0xAA"""
+    x, y, z, dummy = struct.unpack(">hhhB", result)
+    return x, y, z
+
+
+def _set_datetime_cmd(datetime_=None) -> bytes:
+    """<SETDATETIME[YYMMDDHHMMSS]>> command, default datetime_=None is now."""
+    if not datetime_:
+        datetime_ = datetime.datetime.now()
+
+    if datetime_.year < 2000:
+        # welp... device has year hardcoded 20xx
+        raise ValueError("Device can't set year earlier than 2000")
+
+    dt_cmd = struct.pack(
+        ">BBBBBB",
+        datetime_.year - 2000,
+        datetime_.month,
+        datetime_.day,
+        datetime_.hour,
+        datetime_.minute,
+        datetime_.second,
+    )
+    return b"<SETDATETIME" + dt_cmd + b">>"
+
 
 class BaseDevice:
+    # Best effort interpretation from:
+    #     https://www.gqelectronicsllc.com/forum/topic.asp?TOPIC_ID=4948
+    # self-documenting code to interpret config data
+    # type=None means treat byte literally. e.g. b'\x00'[0] -> 0
+    # type is a string means struct.unpack type
+    _cfg_spec_map = {
+        "Power": {
+            "index": 0,
+            "size": 1,
+            "description": "0=ON, 1=OFF... Backwards for reasons beyond comprehension.",
+            "type": None,
+        },
+        "Alarm": {
+            "index": 1,
+            "size": 1,
+            # Somehow this is not backwards like Power
+            "description": "0=OFF, 1=ON",
+            "type": None,
+        },
+        "Speaker": {
+            "index": 2,
+            "size": 1,
+            "description": "0=OFF, 1=ON",
+            "type": None,
+        },
+        "CalibrationCPM_0": {
+            "index": 8,
+            "size": 2,
+            "description": "",
+            "type": ">H",
+        },
+        "CalibrationCPM_1": {
+            "index": 14,
+            "size": 2,
+            "description": "",
+            "type": ">H",
+        },
+        "CalibrationCPM_2": {
+            "index": 20,
+            "size": 2,
+            "description": "",
+            "type": ">H",
+        },
+        "SaveDataType": {
+            "index": 32,
+            "size": 1,
+            "description": "History data; 0=off, 1=CPS, 2=CPM, 3=CPM(avg/hr)",
+            "type": None,
+        },
+        "MaxCPM": {
+            "index": 49,
+            "size": 2,
+            "description": "MaxCPM Hi + Lo Byte",
+            "type": ">H",
+        },
+        "Baudrate": {
+            "index": 57,
+            "size": 1,
+            # coded differently for 300 and 500/600 series
+            # see https://www.gqelectronicsllc.com/forum/topic.asp?TOPIC_ID=4948 reply#12
+            "description": "see https://www.gqelectronicsllc.com/forum/topic.asp?TOPIC_ID=4948 reply#12",
+            "type": None,
+        },
+        "BatteryType": {
+            "index": 56,
+            "size": 1,
+            "description": "0=rechargeable, 1=non-rechargeable",
+            "type": None,
+        },
+        "ThresholdMode": {
+            "index": 64,
+            "size": 1,
+            "description": "0=CPM, 1=µSv/h, 2=mR/h",
+            "type": None,
+        },
+        "ThresholdCPM": {
+            "index": 62,
+            "size": 2,
+            "description": "",
+            "type": ">H",
+        },
+    }
+
+    # Commands with a fixed response size (size=None means unknown response size, read
+    # until idle once min_size bytes are in):
+    # method name -> cmd, response size in bytes, parse function for the response
+    _cmd_spec_map = {
+        "get_version": {
+            "cmd": b"<GETVER>>",
+            "size": None,
+            "min_size": _version_min_size,
+            "parse": _decode_utf8,
+        },
+        "get_serial": {"cmd": b"<GETSERIAL>>", "size": 7, "parse": bytes.hex},
+        "get_datetime": {"cmd": b"<GETDATETIME>>", "size": 7, "parse": _parse_datetime},
+        "get_gyro": {"cmd": b"<GETGYRO>>", "size": 7, "parse": _parse_gyro},
+    }
+
     def __init__(self, connection):
         """
         Represent a base GMC device.
@@ -27,89 +176,6 @@ class BaseDevice:
         # the config under the hood, initialize empty and lazily create
         self._config = dict()
 
-        # Best effort interpretation from:
-        #     https://www.gqelectronicsllc.com/forum/topic.asp?TOPIC_ID=4948
-        # self-documenting code to interpret config data
-        # type=None means treat byte literally. e.g. b'\x00'[0] -> 0
-        # type is a string means struct.unpack type
-        self._cfg_spec_map = {
-            "Power": {
-                "index": 0,
-                "size": 1,
-                "description": "0=ON, 1=OFF... Backwards for reasons beyond comprehension.",
-                "type": None,
-            },
-            "Alarm": {
-                "index": 1,
-                "size": 1,
-                # Somehow this is not backwards like Power
-                "description": "0=OFF, 1=ON",
-                "type": None,
-            },
-            "Speaker": {
-                "index": 2,
-                "size": 1,
-                "description": "0=OFF, 1=ON",
-                "type": None,
-            },
-            "CalibrationCPM_0": {
-                "index": 8,
-                "size": 2,
-                "description": "",
-                "type": ">H",
-            },
-            "CalibrationCPM_1": {
-                "index": 14,
-                "size": 2,
-                "description": "",
-                "type": ">H",
-            },
-            "CalibrationCPM_2": {
-                "index": 20,
-                "size": 2,
-                "description": "",
-                "type": ">H",
-            },
-            "SaveDataType": {
-                "index": 32,
-                "size": 1,
-                "description": "History data; 0=off, 1=CPS, 2=CPM, 3=CPM(avg/hr)",
-                "type": None,
-            },
-            "MaxCPM": {
-                "index": 49,
-                "size": 2,
-                "description": "MaxCPM Hi + Lo Byte",
-                "type": ">H",
-            },
-            "Baudrate": {
-                "index": 57,
-                "size": 1,
-                # coded differently for 300 and 500/600 series
-                # see https://www.gqelectronicsllc.com/forum/topic.asp?TOPIC_ID=4948 reply#12
-                "description": "see https://www.gqelectronicsllc.com/forum/topic.asp?TOPIC_ID=4948 reply#12",
-                "type": None,
-            },
-            "BatteryType": {
-                "index": 56,
-                "size": 1,
-                "description": "0=rechargeable, 1=non-rechargeable",
-                "type": None,
-            },
-            "ThresholdMode": {
-                "index": 64,
-                "size": 1,
-                "description": "0=CPM, 1=µSv/h, 2=mR/h",
-                "type": None,
-            },
-            "ThresholdCPM": {
-                "index": 62,
-                "size": 2,
-                "description": "",
-                "type": ">H",
-            },
-        }
-
         # will likely save someone a lot of time
         # heartbeat-on keeps writing to buffer making other functionality un-parsable
         self._heartbeat_off()
@@ -135,6 +201,79 @@ class BaseDevice:
         self.connection.write(b"<HEARTBEAT1>>")
         logger.debug("Heartbeat ON")
 
+    def _get(self, name):
+        """
+        Write a command from _cmd_spec_map, read its response and parse it.
+
+        Parameters
+        ----------
+        name: str
+            Command name i.e. device method name e.g. get_cpm
+
+        Returns
+        -------
+        Any
+            Parsed device response.
+
+        """
+        spec = self._cmd_spec_map[name]
+        result = self.connection.get_exact(spec["cmd"], expected=b"", size=spec["size"])
+        return spec["parse"](result)
+
+    def submit(self, name, *args, **kwargs) -> Future:
+        """
+        Run a device method as one transaction on the connection I/O worker.
+
+        Thread-safe way to share a device, e.g. between a poller, a web API and a
+        history sync: device.submit("get_cpm").result()
+
+        Parameters
+        ----------
+        name: str
+            Device method name e.g. 'get_cpm'
+        args, kwargs:
+            Method arguments.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Method return value or exception.
+
+        """
+        return self.connection.submit(getattr(self, name), *args, **kwargs)
+
+    def get_many(self, names) -> dict:
+        """
+        Run many commands pipelined over the connection.
+
+        Commands are written back-to-back and their responses split by the known
+        response sizes (Connection.get_pipelined), e.g. a CPM, voltage & datetime
+        snapshot in about one USB round trip.
+
+        Parameters
+        ----------
+        names: list
+            Command names i.e. device method names e.g. ['get_cpm', 'get_voltage']
+
+        Returns
+        -------
+        dict
+            {name: parsed device response}, get_config is the parsed config dict.
+
+        """
+        specs = [self._cmd_spec_map[name] for name in names]
+        self.connection.reset_buffers()
+        results = self.connection.get_pipelined(
+            [(s["cmd"], s["size"], s.get("min_size", 1)) for s in specs]
+        )
+        values = {}
+        for name, spec, result in zip(names, specs, results):
+            values[name] = spec["parse"](result)
+            if name == "get_config":
+                self._parse_cfg(values[name])
+                values[name] = self._config
+        return values
+
     def _read_history_position(self, start_position, chunk_size):
         # http://www.gqelectronicsllc.com/forum/topic.asp?TOPIC_ID=4445
         # don't need spir fix because... reset read/write buffer.
@@ -182,6 +321,58 @@ class BaseDevice:
 
             self._config[name] = value
 
+    def iter_history_pages(self, start_page=0, buffer=None):
+        """
+        Read device history one flash page at a time, as a generator.
+
+        Stops reading when an entire page contains empty data.
+        Pages are written contiguously into ``buffer``, wrapping to the start when the
+        next page doesn't fit, and a memoryview of the written bytes is yielded.
+        i.e. no new bytes objects are concatenated.
+
+        Parameters
+        ----------
+        start_page: int, optional
+            Flash page to start reading from, by default 0
+        buffer: bytearray | None, optional
+            Preallocated buffer to write pages into, at least one flash page in size.
+            Default=None allocates a single page buffer which is re-used for every
+            page, i.e. a yielded memoryview is only valid until the next page is read.
+
+        Yields
+        ------
+        memoryview
+            Raw history page data.
+
+        """
+        page_size = self._flash_memory_page_size_bytes
+        if buffer is None:
+            buffer = bytearray(page_size)
+        if len(buffer) < page_size:
+            raise ValueError(
+                "buffer size must be at least page size={}".format(page_size)
+            )
+
+        view = memoryview(buffer)
+        offset = 0
+        start = start_page * page_size
+        for start_position in range(start, self._flash_memory_size_bytes, page_size):
+            data = self._read_history_position(start_position, page_size)
+
+            if data.count(b"\xff") == page_size:
+                logger.debug("Entire read block '\\xff' stop reading history")
+                break
+
+            # device with SPIR bug may return an extra byte, never write past the page
+            size = min(len(data), page_size)
+            if offset + size > len(buffer):
+                offset = 0
+            view[offset : offset + size] = data[:size]
+
+            logger.debug("Read history page {} done".format(start_position // page_size))
+            yield view[offset : offset + size]
+            offset += size
+
     def get_raw_history(self):
         """
         Get device history data.
@@ -194,38 +385,195 @@ class BaseDevice:
             Raw history data.
 
         """
-        i = 0
-        hist = b""
-        for start_position in range(
-            0, self._flash_memory_size_bytes, self._flash_memory_page_size_bytes
-        ):
-            data = self._read_history_position(
-                start_position, self._flash_memory_page_size_bytes
-            )
+        buffer = bytearray(self._flash_memory_size_bytes)
+        size = 0
+        for page in self.iter_history_pages(buffer=buffer):
+            size += len(page)
+            page.release()
 
-            if data.count(b"\xff") == self._flash_memory_page_size_bytes:
-                logger.debug("Entire read block '\\xff' stop reading history")
-                break
-            hist += data
+        return bytes(memoryview(buffer)[:size])
+
+    def download_history_to(self, fileobj):
+        """
+        Download device memory history page by page into a binary file object.
 
-            i += 1
-            logger.debug("Read history page {} done".format(i))
+        Pages are written as soon as they are read, i.e. the full history is never
+        held in memory.
+
+        Parameters
+        ----------
+        fileobj: BufferedIOBase
+            Writable binary file object i.e. open(file, 'wb')
+
+        Returns
+        -------
+        int
+            Number of bytes written.
 
-        return hist
+        """
+        size = 0
+        for page in self.iter_history_pages():
+            size += fileobj.write(page)
+        return size
 
     def save_history(self, file_path):
         """
         Download device memory history and save to file.
 
+        Parameters
+        ----------
+        file_path: str | os.PathLike
+            Path to save. Written once the download completed, a failed download
+            leaves an existing file unchanged.
+
+        """
+        part_path = os.fspath(file_path) + ".part"
+        try:
+            with open(part_path, "wb") as f:
+                self.download_history_to(f)
+            os.replace(part_path, file_path)
+        except BaseException:
+            try:
+                os.remove(part_path)
+            except OSError:
+                pass
+            raise
+
+    def sync_history(self, file_path, checkpoint_path=None):
+        """
+        Incrementally sync device memory history to a local dump file.
+
+        A checkpoint keyed by device serial stores a content hash per synced page. On
+        the next sync, only the last synced page (which may have been partially
+        written) and newer pages are read from the device. Only new or changed pages
+        are written to the dump file.
+        History is only appended to, so the last synced page read again must start
+        with its local bytes. If not (e.g. the device memory was erased), the first
+        page changed once memory is full (i.e. history wrapped around) or there is no
+        usable checkpoint, a full sync is done.
+        A short page read (e.g. timeout) stops the sync, pages before it are kept in
+        the dump and checkpoint for the next sync.
+
         Parameters
         ----------
         file_path: str
-            Path to save.
+            Path of the local history dump.
+        checkpoint_path: str | None, optional
+            Path of the checkpoint file, by default None i.e. file_path + '.sync.json'
+
+        Returns
+        -------
+        int
+            Number of new or changed pages written.
+
+        """
+        if checkpoint_path is None:
+            checkpoint_path = file_path + ".sync.json"
+        page_size = self._flash_memory_page_size_bytes
+        serial = self.get_serial()
+
+        checkpoints = {}
+        if os.path.exists(checkpoint_path):
+            with open(checkpoint_path, "r") as f:
+                checkpoints = json.load(f)
+
+        checkpoint = checkpoints.get(serial, {})
+        hashes = checkpoint.get("pages", [])
+        if (
+            checkpoint.get("page_size") != page_size
+            or not os.path.exists(file_path)
+            or os.path.getsize(file_path) < len(hashes) * page_size
+        ):
+            hashes = []
+
+        with open(file_path, "r+b" if hashes else "wb") as f:
+            # last synced page may have been partially written, read it again
+            start_page = max(len(hashes) - 1, 0)
+            logger.debug(f"Sync history serial={serial} start_page={start_page}")
+            synced = self._sync_pages(f, start_page, hashes)
+            if synced is None:
+                logger.info("History changed since last sync, doing full sync")
+                synced = self._sync_pages(f, 0, hashes)
+            written, end = synced
+            f.truncate(end)
+        del hashes[(end + page_size - 1) // page_size :]
+
+        checkpoints[serial] = {"page_size": page_size, "pages": hashes}
+        tmp_path = checkpoint_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(checkpoints, f)
+        os.replace(tmp_path, checkpoint_path)
+
+        logger.info(f"Synced {written} history pages to {file_path}")
+        return written
+
+    def _sync_pages(self, f, start_page, hashes):
+        """
+        Write new or changed pages from start_page on to the dump f, update hashes.
+
+        Returns (pages written, dump size), or None if resuming (start_page > 0) and
+        the dump doesn't continue into the device history i.e. a full sync is needed.
+        """
+        page_size = self._flash_memory_page_size_bytes
+        written = 0
+        end = start_page * page_size
+        for i, page in enumerate(self.iter_history_pages(start_page), start_page):
+            if len(page) < page_size:
+                # writing it would leave a hole before the next page
+                logger.warning(
+                    f"Short history page {i} read ({len(page)} bytes), sync stopped"
+                )
+                end = i * page_size
+                break
+            digest = _page_digest(page)
+            if i < len(hashes) and hashes[i] == digest:
+                end = (i + 1) * page_size
+                continue
+            f.seek(i * page_size)
+            if start_page and i == start_page:
+                # flash is written once until erased: the synced bytes stay the same
+                local = f.read(page_size).rstrip(b"\xff")
+                if page[: len(local)] != local:
+                    return None
+                f.seek(i * page_size)
+            f.write(page)
+            if i < len(hashes):
+                hashes[i] = digest
+            else:
+                hashes.append(digest)
+            written += 1
+            end = (i + 1) * page_size
+        else:
+            if start_page and end <= start_page * page_size:
+                # the last synced page is empty now, e.g. memory erased
+                return None
+            if start_page and end == self._flash_memory_size_bytes:
+                # memory full: history may wrap around, overwriting the first page
+                first_page = self._read_history_position(0, page_size)
+                if _page_digest(first_page) != hashes[0]:
+                    return None
+        return written, end
+
+    def iter_history_records(self):
+        """
+        Get tidy device memory history as a generator.
+
+        Pages are parsed as they are downloaded, i.e. records are available before
+        the entire history is read. Stops reading once end of history is detected.
+        Record: ("datetime", "count", "unit", "mode", "reference_datetime", "notes")
+
+        Yields
+        ------
+        tuple
+            History record.
 
         """
-        data = self.get_raw_history()
-        with open(file_path, "wb") as f:
-            f.write(data)
+        parser = HistoryParser()
+        for page in self.iter_history_pages():
+            yield from parser.feed(page)
+            if parser.eof:
+                break
+        yield from parser.close()
 
     def get_history_data(self):
         """
@@ -239,18 +587,16 @@ class BaseDevice:
             List of tuples, first row is column names.
 
         """
-        data = self.get_raw_history()
-        h = HistoryParser(data)
-        data = [h.get_columns()]
-        data.extend(h.get_data())
+        data = [HistoryParser().get_columns()]
+        data.extend(self.iter_history_records())
         return data
 
     def get_version(self) -> str:
         """
         Get version of device.
 
-        Has a sleep wait to read as spec RFC1801 doesn't specify end char nor byte size.
-        i.e. SLOW.
+        Spec RFC1801 doesn't specify end char nor byte size, the response ends when
+        the device stops writing (Connection.read_until_idle).
 
         Returns
         -------
@@ -259,15 +605,16 @@ class BaseDevice:
         """
         cmd = b"<GETVER>>"
         self.connection.reset_buffers()
-        # longer sleep wait for GMC-300S since it returns nothing at times after 0.3 sec
-        # TODO: add a read_at_least X bytes method that will then wait Y seconds after
-        # in case more bytes come in. make this method more reliable!
-        result = self.connection.get(cmd, wait_sleep=0.4)
+        # GMC-300S returns nothing at times after 0.3 sec, wait for the model at least
+        result = self.connection.get_until_idle(cmd, min_size=_version_min_size)
         return result.decode("utf8")
 
     def get_serial(self) -> str:
         """Get serial."""
-        cmd = b"<GETSERIAL>>"
         self.connection.reset_buffers()
-        result = self.connection.get_exact(cmd, size=7)
-        return result.hex()
+        return self._get("get_serial")
+
+
+def _page_digest(page) -> str:
+    """Content hash of a history page."""
+    return hashlib.blake2b(page, digest_size=16).hexdigest()
@@ -0,0 +1,242 @@
+"""
+Drive many GMC devices from one thread with selectors (epoll/kqueue/select).
+"""
+import collections
+import logging
+import selectors
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger("pygmc.devices.loop")
+
+
+class _DeviceState:
+    """Command/response state machine of one device."""
+
+    def __init__(self, device):
+        self.device = device
+        # queued (name, spec, future)
+        self.queue = collections.deque()
+        # command waiting for its response, None when idle
+        self.current = None
+        self.buffer = bytearray()
+        self.deadline = None
+        # time.monotonic_ns() the current command was written, None if not written
+        self.start_ns = None
+
+
+class DeviceLoop:
+    """
+    Run device commands on many devices from a single thread.
+
+    Every device serial port file descriptor is registered with a selector. Each
+    device has a command queue: a command is written, then its response is collected
+    as the port becomes readable until the response size from the device
+    _cmd_spec_map is reached. Commands of different devices overlap, a command only
+    waits for the previous command of the same device.
+
+    Loop I/O is counted in the device Connection metrics (Connection.stats()) like
+    Connection.get_exact().
+    """
+
+    def __init__(self, timeout=5):
+        """
+        Represent an I/O loop over many devices.
+
+        Parameters
+        ----------
+        timeout : int, optional
+            Response timeout per command, seconds, by default 5
+        """
+        self._timeout = timeout
+        self._selector = selectors.DefaultSelector()
+        self._states = {}
+
+    def add(self, device) -> None:
+        """
+        Register a device.
+
+        Parameters
+        ----------
+        device : pygmc.devices.BaseDevice
+            Device with a pyserial connection i.e. a file descriptor.
+        """
+        state = _DeviceState(device)
+        self._selector.register(
+            device.connection._con.fileno(), selectors.EVENT_READ, state
+        )
+        self._states[device] = state
+
+    def remove(self, device) -> None:
+        """Unregister a device, its queued commands are cancelled."""
+        state = self._states.pop(device)
+        self._selector.unregister(device.connection._con.fileno())
+        self._cancel(state)
+
+    def request(self, device, name) -> Future:
+        """
+        Queue a device command.
+
+        Parameters
+        ----------
+        device : pygmc.devices.BaseDevice
+            Registered device.
+        name : str
+            Command name i.e. device method name e.g. 'get_cpm'
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Parsed response, available once run() completed the command.
+
+        Raises
+        ------
+        ValueError
+            Command has no fixed response size e.g. 'get_version'
+        """
+        spec = device._cmd_spec_map[name]
+        if spec["size"] is None:
+            raise ValueError("{} has no fixed response size".format(name))
+        future = Future()
+        state = self._states[device]
+        state.queue.append((name, spec, future))
+        if state.current is None:
+            self._start(state)
+        return future
+
+    def run(self, timeout=None) -> bool:
+        """
+        Run until every queued command is done.
+
+        Parameters
+        ----------
+        timeout : float | None, optional
+            Stop after timeout seconds, by default None i.e. until done.
+
+        Returns
+        -------
+        bool
+            True if every queued command is done.
+        """
+        end = None if timeout is None else time.monotonic() + timeout
+        while True:
+            busy = [s for s in self._states.values() if s.current is not None]
+            if not busy:
+                return True
+            now = time.monotonic()
+            if end is not None and now >= end:
+                return False
+            wait = min(s.deadline for s in busy) - now
+            if end is not None:
+                wait = min(wait, end - now)
+            for key, _ in self._selector.select(max(wait, 0)):
+                self._read(key.data)
+            now = time.monotonic()
+            for state in busy:
+                if state.current is not None and state.deadline <= now:
+                    name = state.current[0]
+                    self._finish(state, exception=TimeoutError(name))
+
+    def poll(self, names) -> dict:
+        """
+        Run commands on every registered device.
+
+        Parameters
+        ----------
+        names : list
+            Command names e.g. ['get_cpm', 'get_voltage']
+
+        Returns
+        -------
+        dict
+            {device: {name: parsed response or the exception raised}}
+            A failing device doesn't fail the others. Commands cancelled meanwhile
+            (e.g. Future.cancel() from a callback) are left out.
+        """
+        futures = {
+            device: {name: self.request(device, name) for name in names}
+            for device in self._states
+        }
+        self.run()
+        return {
+            device: {
+                name: future.exception() or future.result()
+                for name, future in device_futures.items()
+                if not future.cancelled()
+            }
+            for device, device_futures in futures.items()
+        }
+
+    def close(self) -> None:
+        """Cancel queued commands and unregister every device."""
+        for device in list(self._states):
+            self.remove(device)
+        self._selector.close()
+
+    def _start(self, state) -> None:
+        """Write the next queued command of a device."""
+        while state.queue:
+            name, spec, future = state.queue.popleft()
+            if not future.set_running_or_notify_cancel():
+                continue
+            state.current = (name, spec, future)
+            state.buffer.clear()
+            state.deadline = time.monotonic() + self._timeout
+            connection = state.device.connection
+            # bytes not belonging to any command e.g. a late response
+            connection.reset_buffers()
+            state.start_ns = time.monotonic_ns()
+            try:
+                connection.write(spec["cmd"])
+            except Exception as e:
+                state.start_ns = None
+                self._finish(state, exception=e)
+            return
+
+    def _read(self, state) -> None:
+        """Port is readable, collect the response of the current command."""
+        con = state.device.connection._con
+        waiting = con.in_waiting
+        if not waiting:
+            return
+        data = con.read(waiting)
+        if state.current is None:
+            logger.debug(f"Discard unexpected data={data}")
+            state.device.connection.record_received(data)
+            return
+        state.buffer += data
+        size = state.current[1]["size"]
+        if len(state.buffer) >= size:
+            # any extra byte is discarded (e.g. SPIR bug) when the next command starts
+            self._finish(state, result=bytes(state.buffer[:size]))
+
+    def _finish(self, state, result=None, exception=None) -> None:
+        """Complete the current command and start the next one."""
+        name, spec, future = state.current
+        state.current = None
+        if state.start_ns is not None:
+            # same accounting as Connection.get_exact()
+            connection = state.device.connection
+            size = spec["size"]
+            connection.record_received(bytes(state.buffer), size)
+            connection.record_command(
+                spec["cmd"], state.start_ns, bytes(state.buffer[:size]), size
+            )
+            state.start_ns = None
+        if exception is None:
+            try:
+                future.set_result(spec["parse"](result))
+            except Exception as e:
+                future.set_exception(e)
+        else:
+            logger.warning(f"{name} failed: {exception!r}")
+            future.set_exception(exception)
+        self._start(state)
+
+    def _cancel(self, state) -> None:
+        if state.current is not None:
+            # already running, can't be cancelled
+            state.current[2].set_exception(ConnectionError("device removed"))
+            state.current = None
+        while state.queue:
+            state.queue.popleft()[2].cancel()
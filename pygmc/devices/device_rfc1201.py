@@ -3,12 +3,94 @@ import logging
 import struct
 from typing import Generator, Tuple
 
-from .device import BaseDevice
+from .device import BaseDevice, _set_datetime_cmd
 
 logger = logging.getLogger("pygmc.devices.rfc1201")
 
 
+def _unpack_u16(result) -> int:
+    return struct.unpack(">H", result)[0]
+
+
+def _parse_voltage(result) -> float:
+    # result example: b'*'.hex() -> '2a' -> int('2a', 16) -> 42 -> 4.2V
+    return int(result.hex(), 16) / 10
+
+
+def _parse_temp(result) -> float:
+    sign = 1
+    if result[2] != 0:
+        sign = -1
+    return sign * float("{}.{}".format(result[0], result[1]))
+
+
+def _parse_heartbeat(raw) -> int:
+    # only first 14 bits are used, because why not complicate things
+    return struct.unpack(">H", raw)[0] & 0x3FFF
+
+
 class DeviceRFC1201(BaseDevice):
+    # Overwrites from BaseConfig & adds specific items
+    _cfg_spec_map = {
+        **BaseDevice._cfg_spec_map,
+        "Calibration_uSv_0": {
+            "index": 10,
+            "size": 4,
+            "description": "",
+            "type": "<f",
+        },
+        "Calibration_uSv_1": {
+            "index": 16,
+            "size": 4,
+            "description": "",
+            "type": "<f",
+        },
+        "Calibration_uSv_2": {
+            "index": 22,
+            "size": 4,
+            "description": "",
+            "type": "<f",
+        },
+        "IdleTextState": {
+            "index": 26,
+            "size": 1,
+            "description": "??",
+            "type": None,
+        },
+        "AlarmValue_uSv": {
+            "index": 27,
+            "size": 4,
+            "description": "",
+            "type": "<f",
+        },
+        "Baudrate": {
+            "index": 57,
+            "size": 1,
+            # see https://www.gqelectronicsllc.com/forum/topic.asp?TOPIC_ID=4948
+            # reply#12
+            "description": "64=1200,160=2400,208=4800,232=9600,240=14400,"
+            "244=19200,248=28800,250=38400,252=57600,254=115200",
+            "type": None,
+        },
+        "Threshold_uSv": {
+            "index": 65,
+            "size": 4,
+            "description": "",
+            "type": "<f",
+        },
+    }
+
+    _cmd_spec_map = {
+        **BaseDevice._cmd_spec_map,
+        "get_cpm": {"cmd": b"<GETCPM>>", "size": 2, "parse": _unpack_u16},
+        "get_voltage": {"cmd": b"<GETVOLT>>", "size": 1, "parse": _parse_voltage},
+        "get_temp": {"cmd": b"<GETTEMP>>", "size": 4, "parse": _parse_temp},
+        "get_config": {"cmd": b"<GETCFG>>", "size": 256, "parse": bytes},
+    }
+
+    # heartbeat CPS frame written by the device every second
+    _heartbeat_spec = {"size": 2, "parse": _parse_heartbeat}
+
     def __init__(self, connection):
         """
         Represent a GMC device.
@@ -23,57 +105,6 @@ class DeviceRFC1201(BaseDevice):
         """
         super().__init__(connection)
 
-        # Overwrites from BaseConfig & adds 1801 specific items
-        self._cfg_spec_map.update(
-            {
-                "Calibration_uSv_0": {
-                    "index": 10,
-                    "size": 4,
-                    "description": "",
-                    "type": "<f",
-                },
-                "Calibration_uSv_1": {
-                    "index": 16,
-                    "size": 4,
-                    "description": "",
-                    "type": "<f",
-                },
-                "Calibration_uSv_2": {
-                    "index": 22,
-                    "size": 4,
-                    "description": "",
-                    "type": "<f",
-                },
-                "IdleTextState": {
-                    "index": 26,
-                    "size": 1,
-                    "description": "??",
-                    "type": None,
-                },
-                "AlarmValue_uSv": {
-                    "index": 27,
-                    "size": 4,
-                    "description": "",
-                    "type": "<f",
-                },
-                "Baudrate": {
-                    "index": 57,
-                    "size": 1,
-                    # see https://www.gqelectronicsllc.com/forum/topic.asp?TOPIC_ID=4948
-                    # reply#12
-                    "description": "64=1200,160=2400,208=4800,232=9600,240=14400,"
-                    "244=19200,248=28800,250=38400,252=57600,254=115200",
-                    "type": None,
-                },
-                "Threshold_uSv": {
-                    "index": 65,
-                    "size": 4,
-                    "description": "",
-                    "type": "<f",
-                },
-            }
-        )
-
     def get_cpm(self) -> int:
         """
         Get CPM counts-per-minute data.
@@ -88,10 +119,7 @@ class DeviceRFC1201(BaseDevice):
         # The first byte is MSB byte data and second byte is LSB byte data.
         # 	  e.g.: 00 1C     the returned CPM is 28.
 
-        cmd = b"<GETCPM>>"
-        result = self.connection.get_exact(cmd, expected=b"", size=2)
-        count = struct.unpack(">H", result)[0]
-        return count
+        return self._get("get_cpm")
 
     def get_usv_h(self) -> float:
         """
@@ -127,7 +155,6 @@ class DeviceRFC1201(BaseDevice):
         Tuple[int, int, int]
             (X, Y, Z) gyroscope data
         """
-        cmd = b"<GETGYRO>>"
         # Return: Seven bytes gyroscope data in hexdecimal:
         #   BYTE1,BYTE2,BYTE3,BYTE4,BYTE5,BYTE6,BYTE7
         # Here: BYTE1,BYTE2 are the X position data in 16 bits value.
@@ -137,9 +164,7 @@ class DeviceRFC1201(BaseDevice):
         # BYTE5,BYTE6 are the Z position data in 16 bits value.
         #   The first byte is MSB byte data and second byte is LSB byte data.
         # BYTE7 always 0xAA
-        result = self.connection.get_exact(cmd, expected=b"", size=7)
-        x, y, z, dummy = struct.unpack(">hhhB", result)
-        return x, y, z
+        return self._get("get_gyro")
 
     def get_voltage(self) -> float:
         """
@@ -151,11 +176,7 @@ class DeviceRFC1201(BaseDevice):
             Device voltage in volts
 
         """
-        cmd = b"<GETVOLT>>"
-        result = self.connection.get_exact(cmd, expected=b"", size=1)
-        # result example: b'*'.hex() -> '2a' -> int('2a', 16) -> 42 -> 4.2V
-        result = int(result.hex(), 16) / 10
-        return result
+        return self._get("get_voltage")
 
     def get_datetime(self) -> datetime.datetime:
         """
@@ -167,15 +188,7 @@ class DeviceRFC1201(BaseDevice):
             Device datetime
         """
         # Return: Seven bytes data: YY MM DD HH MM SS 0xAA
-        cmd = b"<GETDATETIME>>"
-        data = self.connection.get_exact(cmd, expected=b"", size=7)
-        year = int("20{0:2d}".format(data[0]))
-        month = int("{0:2d}".format(data[1]))
-        day = int("{0:2d}".format(data[2]))
-        hour = int("{0:2d}".format(data[3]))
-        minute = int("{0:2d}".format(data[4]))
-        second = int("{0:2d}".format(data[5]))
-        return datetime.datetime(year, month, day, hour, minute, second)
+        return self._get("get_datetime")
 
     def get_config(self) -> dict:
         """
@@ -186,9 +199,8 @@ class DeviceRFC1201(BaseDevice):
         dict
 
         """
-        cmd = b"<GETCFG>>"
         self.connection.reset_buffers()
-        cfg_bytes = self.connection.get_exact(cmd, expected=b"", size=256)
+        cfg_bytes = self._get("get_config")
         self._parse_cfg(cfg_bytes)
         return self._config
 
@@ -202,12 +214,7 @@ class DeviceRFC1201(BaseDevice):
             Device temperature is celsius.
 
         """
-        result = self.connection.get_exact(b"<GETTEMP>>", size=4)
-        sign = 1
-        if result[2] != 0:
-            sign = -1
-        temp = sign * float("{}.{}".format(result[0], result[1]))
-        return temp
+        return self._get("get_temp")
 
     def heartbeat_live(self, count=60) -> Generator[int, None, None]:
         """
@@ -224,14 +231,13 @@ class DeviceRFC1201(BaseDevice):
         int
             CPS
         """
+        size, parse = self._heartbeat_spec["size"], self._heartbeat_spec["parse"]
         self.connection.reset_buffers()
         try:
             self._heartbeat_on()
             for i in range(count):
-                raw = self.connection.read_until(expected=b"", size=2)
-                # only first 14 bits are used, because why not complicate things
-                cps = struct.unpack(">H", raw)[0] & 0x3FFF
-                yield cps
+                raw = self.connection.read_until(expected=b"", size=size)
+                yield parse(raw)
         finally:
             self._heartbeat_off()
 
@@ -314,23 +320,7 @@ class DeviceRFC1201(BaseDevice):
             Unexpected response from device.
 
         """
-        if not datetime_:
-            datetime_ = datetime.datetime.now()
-
-        if datetime_.year < 2000:
-            # welp... device has year hardcoded 20xx
-            raise ValueError("Device can't set year earlier than 2000")
-
-        dt_cmd = struct.pack(
-            ">BBBBBB",
-            datetime_.year - 2000,
-            datetime_.month,
-            datetime_.day,
-            datetime_.hour,
-            datetime_.minute,
-            datetime_.second,
-        )
-        cmd = b"<SETDATETIME" + dt_cmd + b">>"
+        cmd = _set_datetime_cmd(datetime_)
         self.connection.reset_buffers()
         result = self.connection.get_exact(cmd, expected=b"", size=1)
         if not result == b"\xaa":
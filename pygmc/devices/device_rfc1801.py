@@ -3,12 +3,85 @@ import logging
 import struct
 from typing import Generator, Tuple
 
-from .device import BaseDevice
+from .device import BaseDevice, _set_datetime_cmd
 
 logger = logging.getLogger("pygmc.devices.rfc1801")
 
 
+def _unpack_u32(result) -> int:
+    return struct.unpack(">I", result)[0]
+
+
+def _parse_voltage(result) -> float:
+    # result example: b'4.8v\x00'
+    return float(result[0:3])  # e.g. float(b'4.8')
+
+
 class DeviceRFC1801(BaseDevice):
+    # Overwrites from BaseConfig & adds specific items
+    _cfg_spec_map = {
+        **BaseDevice._cfg_spec_map,
+        "Calibration_uSv_0": {
+            "index": 10,
+            "size": 4,
+            "description": "",
+            "type": ">f",
+        },
+        "Calibration_uSv_1": {
+            "index": 16,
+            "size": 4,
+            "description": "",
+            "type": ">f",
+        },
+        "Calibration_uSv_2": {
+            "index": 22,
+            "size": 4,
+            "description": "",
+            "type": ">f",
+        },
+        "IdleTextState": {
+            "index": 26,
+            "size": 1,
+            "description": "??",
+            "type": None,
+        },
+        "AlarmValue_uSv": {
+            "index": 27,
+            "size": 4,
+            "description": "",
+            "type": ">f",
+        },
+        "Baudrate": {
+            "index": 57,
+            "size": 1,
+            # see https://www.gqelectronicsllc.com/forum/topic.asp?TOPIC_ID=4948
+            # reply#14
+            "description": "0=115200, 1=1200, 2=2400, 3=4800, 4=9600, 5=14400, "
+            "6=19200, 7=28800, 8=38400, 9=57600",
+            "type": None,
+        },
+        "Threshold_uSv": {
+            "index": 65,
+            "size": 4,
+            "description": "",
+            "type": ">f",
+        },
+    }
+
+    _cmd_spec_map = {
+        **BaseDevice._cmd_spec_map,
+        "get_cpm": {"cmd": b"<GETCPM>>", "size": 4, "parse": _unpack_u32},
+        "get_cps": {"cmd": b"<GETCPS>>", "size": 4, "parse": _unpack_u32},
+        "get_max_cps": {"cmd": b"<GETMAXCPS>>", "size": 4, "parse": _unpack_u32},
+        "get_cpmh": {"cmd": b"<GETCPMH>>", "size": 4, "parse": _unpack_u32},
+        "get_cpml": {"cmd": b"<GETCPML>>", "size": 4, "parse": _unpack_u32},
+        "get_voltage": {"cmd": b"<GETVOLT>>", "size": 5, "parse": _parse_voltage},
+        "get_config": {"cmd": b"<GETCFG>>", "size": 512, "parse": bytes},
+    }
+
+    # heartbeat CPS frame written by the device every second
+    _heartbeat_spec = {"size": 4, "parse": _unpack_u32}
+
     def __init__(self, connection):
         """
         Represent a GMC device.
@@ -23,57 +96,6 @@ class DeviceRFC1801(BaseDevice):
         """
         super().__init__(connection)
 
-        # Overwrites from BaseConfig & adds 1801 specific items
-        self._cfg_spec_map.update(
-            {
-                "Calibration_uSv_0": {
-                    "index": 10,
-                    "size": 4,
-                    "description": "",
-                    "type": ">f",
-                },
-                "Calibration_uSv_1": {
-                    "index": 16,
-                    "size": 4,
-                    "description": "",
-                    "type": ">f",
-                },
-                "Calibration_uSv_2": {
-                    "index": 22,
-                    "size": 4,
-                    "description": "",
-                    "type": ">f",
-                },
-                "IdleTextState": {
-                    "index": 26,
-                    "size": 1,
-                    "description": "??",
-                    "type": None,
-                },
-                "AlarmValue_uSv": {
-                    "index": 27,
-                    "size": 4,
-                    "description": "",
-                    "type": ">f",
-                },
-                "Baudrate": {
-                    "index": 57,
-                    "size": 1,
-                    # see https://www.gqelectronicsllc.com/forum/topic.asp?TOPIC_ID=4948
-                    # reply#14
-                    "description": "0=115200, 1=1200, 2=2400, 3=4800, 4=9600, 5=14400, "
-                    "6=19200, 7=28800, 8=38400, 9=57600",
-                    "type": None,
-                },
-                "Threshold_uSv": {
-                    "index": 65,
-                    "size": 4,
-                    "description": "",
-                    "type": ">f",
-                },
-            }
-        )
-
     def get_cpm(self) -> int:
         """
         Get CPM counts-per-minute data.
@@ -89,10 +111,7 @@ class DeviceRFC1801(BaseDevice):
         # In total 4 bytes data return from GQ GMC unit.
         # The first byte is MSB byte data and fourth byte is LSB byte data.
         # e.g.: 00 00 00 1C     the returned CPM is 28. big-endian
-        cmd = b"<GETCPM>>"
-        result = self.connection.get_exact(cmd, expected=b"", size=4)
-        count = struct.unpack(">I", result)[0]
-        return count
+        return self._get("get_cpm")
 
     def get_usv_h(self) -> float:
         """
@@ -126,10 +145,7 @@ class DeviceRFC1801(BaseDevice):
         int
             Counts per second
         """
-        cmd = b"<GETCPS>>"
-        result = self.connection.get_exact(cmd, expected=b"", size=4)
-        count = struct.unpack(">I", result)[0]
-        return count
+        return self._get("get_cps")
 
     def get_max_cps(self) -> int:
         """
@@ -140,10 +156,7 @@ class DeviceRFC1801(BaseDevice):
         int
             Max counts per second observed
         """
-        cmd = b"<GETMAXCPS>>"
-        result = self.connection.get_exact(cmd, expected=b"", size=4)
-        count = struct.unpack(">I", result)[0]
-        return count
+        return self._get("get_max_cps")
 
     def get_cpmh(self) -> int:
         """
@@ -161,10 +174,7 @@ class DeviceRFC1801(BaseDevice):
         # In total 4 bytes data return from GQ GMC unit.
         # The first byte is MSB byte data and fourth byte is LSB byte data.
         # e.g.: 00 00 00 1C     the returned CPM is 28. big-endian
-        cmd = b"<GETCPMH>>"
-        result = self.connection.get_exact(cmd, expected=b"", size=4)
-        count = struct.unpack(">I", result)[0]
-        return count
+        return self._get("get_cpmh")
 
     def get_cpml(self) -> int:
         """
@@ -177,10 +187,7 @@ class DeviceRFC1801(BaseDevice):
         int
              Counts per minute on low dose tube (GMC has 2 tubes)
         """
-        cmd = b"<GETCPML>>"
-        result = self.connection.get_exact(cmd, expected=b"", size=4)
-        count = struct.unpack(">I", result)[0]
-        return count
+        return self._get("get_cpml")
 
     def get_datetime(self) -> datetime.datetime:
         """
@@ -192,15 +199,7 @@ class DeviceRFC1801(BaseDevice):
             Device datetime
         """
         # Return: Seven bytes data: YY MM DD HH MM SS 0xAA
-        cmd = b"<GETDATETIME>>"
-        data = self.connection.get_exact(cmd, expected=b"", size=7)
-        year = int("20{0:2d}".format(data[0]))
-        month = int("{0:2d}".format(data[1]))
-        day = int("{0:2d}".format(data[2]))
-        hour = int("{0:2d}".format(data[3]))
-        minute = int("{0:2d}".format(data[4]))
-        second = int("{0:2d}".format(data[5]))
-        return datetime.datetime(year, month, day, hour, minute, second)
+        return self._get("get_datetime")
 
     def get_gyro(self) -> Tuple[int, int, int]:
         """
@@ -213,7 +212,6 @@ class DeviceRFC1801(BaseDevice):
         Tuple[int, int, int]
             (X, Y, Z) gyroscope data
         """
-        cmd = b"<GETGYRO>>"
         # Return: Seven bytes gyroscope data in hexdecimal:
         #   BYTE1,BYTE2,BYTE3,BYTE4,BYTE5,BYTE6,BYTE7
         # Here: BYTE1,BYTE2 are the X position data in 16 bits value.
@@ -223,9 +221,7 @@ class DeviceRFC1801(BaseDevice):
         # BYTE5,BYTE6 are the Z position data in 16 bits value.
         #   The first byte is MSB byte data and second byte is LSB byte data.
         # BYTE7 always 0xAA
-        result = self.connection.get_exact(cmd, expected=b"", size=7)
-        x, y, z, dummy = struct.unpack(">hhhB", result)
-        return x, y, z
+        return self._get("get_gyro")
 
     def get_voltage(self) -> float:
         """
@@ -242,11 +238,7 @@ class DeviceRFC1801(BaseDevice):
 
         """
         # Device only has resolution to tenth of a volt despite example in spec RFC1801.
-        cmd = b"<GETVOLT>>"
-        result = self.connection.get_exact(cmd, expected=b"", size=5)
-        # result example: b'4.8v\x00'
-        result = float(result[0:3])  # e.g. float(b'4.8')
-        return result
+        return self._get("get_voltage")
 
     def get_config(self) -> dict:
         """
@@ -257,9 +249,8 @@ class DeviceRFC1801(BaseDevice):
         dict
 
         """
-        cmd = b"<GETCFG>>"
         self.connection.reset_buffers()
-        cfg_bytes = self.connection.get_exact(cmd, expected=b"", size=512)
+        cfg_bytes = self._get("get_config")
         self._parse_cfg(cfg_bytes)
         return self._config
 
@@ -293,13 +284,13 @@ class DeviceRFC1801(BaseDevice):
             CPS - Counts-Per-Second int
 
         """
+        size, parse = self._heartbeat_spec["size"], self._heartbeat_spec["parse"]
         self.connection.reset_buffers()
         try:
             self._heartbeat_on()
             for i in range(count):
-                raw = self.connection.read_until(expected=b"", size=4)
-                cps = struct.unpack(">I", raw)[0]
-                yield cps
+                raw = self.connection.read_until(expected=b"", size=size)
+                yield parse(raw)
         finally:
             self._heartbeat_off()
 
@@ -369,23 +360,7 @@ class DeviceRFC1801(BaseDevice):
             Unexpected response from device.
 
         """
-        if not datetime_:
-            datetime_ = datetime.datetime.now()
-
-        if datetime_.year < 2000:
-            # welp... device has year hardcoded 20xx
-            raise ValueError("Device can't set year earlier than 2000")
-
-        dt_cmd = struct.pack(
-            ">BBBBBB",
-            datetime_.year - 2000,
-            datetime_.month,
-            datetime_.day,
-            datetime_.hour,
-            datetime_.minute,
-            datetime_.second,
-        )
-        cmd = b"<SETDATETIME" + dt_cmd + b">>"
+        cmd = _set_datetime_cmd(datetime_)
         self.connection.reset_buffers()
         result = self.connection.get_exact(cmd, expected=b"", size=1)
         if not result == b"\xaa":
@@ -0,0 +1,462 @@
+"""
+Keep heartbeat ON: run device commands between heartbeat frames and capture frames
+in the background.
+"""
+import array
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Tuple
+
+logger = logging.getLogger("pygmc.devices.heartbeat")
+
+
+class _Pending:
+    """Command waiting for its response."""
+
+    def __init__(self, size):
+        self.size = size
+        self.buffer = bytearray()
+        self.future = Future()
+        # time.monotonic_ns() of writing the command and of its last response byte
+        self.start_ns = None
+        self.end_ns = None
+
+
+class HeartbeatStream:
+    """
+    Demultiplex heartbeat CPS frames and command responses on one serial stream.
+
+    With heartbeat ON the device writes a 2 or 4 byte CPS frame every second,
+    unsolicited. A reader thread owns the port, every byte is either a heartbeat
+    frame or the response of the single pending command:
+
+    - timing: a command is only written within _window seconds after a heartbeat
+      frame, so its response is complete long before the next frame is due.
+    - framing: command responses have a known size (_cmd_spec_map), bytes past the
+      response are heartbeat frames. A frame sized chunk arriving when a frame is due
+      (within _guard seconds), before the response started, is a heartbeat frame.
+
+    Every CPS frame is passed to on_frame(cps, monotonic_ns), by default queued for
+    get_cps().
+
+    A command without a complete response within timeout resyncs the stream: partial
+    response and frame bytes are dropped with the OS input buffer, so late response
+    bytes can't shift the following frames. The reset may split a frame in flight,
+    so bytes are dropped until a chunk arrives at least _period - _guard seconds
+    after the resync and the bytes before it, i.e. at a frame boundary. The frame
+    after the resync may be dropped too.
+
+    Bytes read and command round trips are counted in the device Connection metrics
+    (Connection.stats()), like the Connection methods do.
+    """
+
+    # commands start at most this long after a heartbeat frame, seconds
+    _window = 0.5
+    # reader poll interval, seconds
+    _poll = 0.05
+    # device heartbeat period, seconds
+    _period = 1
+    # a frame arrives within _guard seconds of its due time, seconds
+    _guard = 0.2
+
+    def __init__(self, device, on_frame=None, timeout=5):
+        """
+        Represent a heartbeat stream of a device.
+
+        Parameters
+        ----------
+        device : pygmc.devices.BaseDevice
+            Device with _heartbeat_spec, i.e. DeviceRFC1201 or DeviceRFC1801
+        on_frame : callable | None, optional
+            on_frame(cps, monotonic_ns) called from the reader thread for every frame,
+            by default None i.e. queued for get_cps()
+        timeout : int, optional
+            Command response timeout, seconds, by default 5
+        """
+        self.device = device
+        self._timeout = timeout
+        self._frames = queue.Queue()
+        self._on_frame = on_frame or (lambda cps, t: self._frames.put((cps, t)))
+        self._size = device._heartbeat_spec["size"]
+        self._parse = device._heartbeat_spec["parse"]
+        # reader state, guarded by _lock
+        self._lock = threading.Lock()
+        self._tick = threading.Condition(self._lock)
+        self._frame = bytearray()
+        self._frame_count = 0
+        self._last_frame = None  # time.monotonic() of the last frame
+        self._pending = None
+        # bytes read up to this time.monotonic_ns() are dropped, see _resync()
+        self._resync_ns = 0
+        # after a resync, dropping bytes until a frame boundary
+        self._resyncing = False
+        # time.monotonic_ns() of the last bytes received
+        self._received_ns = 0
+        # one command at a time
+        self._command_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._con_timeout = None
+
+    def start(self) -> None:
+        """Turn heartbeat ON and start the reader thread."""
+        connection = self.device.connection
+        connection.reset_buffers()
+        self._con_timeout = connection._con.timeout
+        connection._con.timeout = self._poll
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="pygmc-heartbeat", daemon=True
+        )
+        self._thread.start()
+        self.device._heartbeat_on()
+
+    def stop(self) -> None:
+        """Turn heartbeat OFF and stop the reader thread."""
+        self.device._heartbeat_off()
+        self._stop.set()
+        self._thread.join()
+        connection = self.device.connection
+        connection._con.timeout = self._con_timeout
+        connection.reset_buffers()
+        with self._lock:
+            self._frame.clear()
+            self._resyncing = False
+            if self._pending is not None:
+                self._pending.future.set_exception(ConnectionError("stream stopped"))
+                self._pending = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def get_cps(self, timeout=None):
+        """
+        Next queued (cps, monotonic_ns), only without on_frame.
+
+        Parameters
+        ----------
+        timeout : float | None, optional
+            Seconds to wait for a frame, by default None i.e. wait.
+
+        Raises
+        ------
+        queue.Empty
+            No frame within timeout.
+        """
+        return self._frames.get(timeout=timeout)
+
+    def get(self, name):
+        """
+        Run a device command without stopping the heartbeat.
+
+        Parameters
+        ----------
+        name : str
+            Command name i.e. device method name e.g. 'get_voltage'
+
+        Returns
+        -------
+        Any
+            Parsed device response.
+
+        Raises
+        ------
+        ValueError
+            Command has no fixed response size e.g. 'get_version'
+        TimeoutError
+            No heartbeat frame to sync with, or no response within timeout.
+        """
+        spec = self.device._cmd_spec_map[name]
+        if spec["size"] is None:
+            raise ValueError("{} has no fixed response size".format(name))
+        with self._command_lock:
+            pending = self._send(spec)
+            try:
+                raw = pending.future.result(self._timeout)
+            except FutureTimeoutError:
+                self._resync()
+                raise TimeoutError(name) from None
+            finally:
+                with self._lock:
+                    if self._pending is pending:
+                        self._pending = None
+                    result = bytes(pending.buffer)
+                self._record(spec, pending, result)
+        return spec["parse"](raw)
+
+    def _record(self, spec, pending, result) -> None:
+        """Count a command response in the connection metrics, as get_exact() does."""
+        connection = self.device.connection
+        connection.record_received(result, pending.size)
+        connection.record_command(
+            spec["cmd"], pending.start_ns, result, pending.size, end_ns=pending.end_ns
+        )
+
+    def _send(self, spec) -> _Pending:
+        """Wait for a window after a heartbeat frame, then write the command."""
+        with self._lock:
+            if (
+                self._last_frame is None
+                or time.monotonic() - self._last_frame > self._window
+            ):
+                count = self._frame_count
+                if not self._tick.wait_for(
+                    lambda: self._frame_count != count, self._period + self._window
+                ):
+                    raise TimeoutError("no heartbeat frame")
+            self._pending = _Pending(spec["size"])
+            pending = self._pending
+            pending.start_ns = time.monotonic_ns()
+        self.device.connection.write(spec["cmd"])
+        return pending
+
+    def _resync(self) -> None:
+        """Drop every byte received so far, e.g. a partial or late response."""
+        with self._lock:
+            logger.warning("Heartbeat stream resync, dropping received bytes")
+            self._pending = None
+            self._frame.clear()
+            self.device.connection._con.reset_input_buffer()
+            # bytes the reader already read, waiting for the lock
+            self._resync_ns = time.monotonic_ns()
+            self._resyncing = True
+
+    def _run(self) -> None:
+        con = self.device.connection._con
+        while not self._stop.is_set():
+            try:
+                data = con.read(con.in_waiting or 1)
+            except Exception as e:
+                logger.warning(f"Heartbeat reader stopped: {e!r}")
+                return
+            if data:
+                self._receive(data, time.monotonic_ns())
+
+    def _receive(self, data, monotonic_ns) -> None:
+        """Split received bytes into the pending response and heartbeat frames."""
+        now = monotonic_ns / 1e9
+        frames = []
+        with self._lock:
+            last_ns = max(self._received_ns, self._resync_ns)
+            self._received_ns = max(self._received_ns, monotonic_ns)
+            if self._resyncing:
+                if (monotonic_ns - last_ns) / 1e9 < self._period - self._guard:
+                    self.device.connection.record_received(data)
+                    return
+                logger.debug("Heartbeat stream resynced at a frame boundary")
+                self._resyncing = False
+            pending = self._pending
+            if pending is not None and not self._is_frame(pending, data, now):
+                n = pending.size - len(pending.buffer)
+                pending.buffer += data[:n]
+                pending.end_ns = monotonic_ns
+                data = data[n:]
+                if len(pending.buffer) == pending.size:
+                    self._pending = None
+                    pending.future.set_result(bytes(pending.buffer))
+            self._frame += data
+            while len(self._frame) >= self._size:
+                frames.append(self._parse(bytes(self._frame[: self._size])))
+                del self._frame[: self._size]
+                self._frame_count += 1
+                self._last_frame = now
+            if frames:
+                self._tick.notify_all()
+        # response bytes are counted by get(), with the response size
+        if data:
+            self.device.connection.record_received(data)
+        for cps in frames:
+            self._on_frame(cps, monotonic_ns)
+
+    def _is_frame(self, pending, data, now) -> bool:
+        """A heartbeat frame arrived before the response started."""
+        return (
+            not pending.buffer
+            and not self._frame
+            and len(data) == self._size
+            and self._last_frame is not None
+            and now - self._last_frame > self._period - self._guard
+        )
+
+
+class HeartbeatCapture:
+    """
+    Capture heartbeat CPS frames in the background into a ring buffer.
+
+    A HeartbeatStream reader thread stamps every frame with time.monotonic_ns() and
+    time.time_ns() as it arrives, independent of how fast consumers are. Frames are
+    stored in fixed size arrays, the oldest frames are overwritten once capacity is
+    reached. Consumers read by sequence number without waiting on the device,
+    commands can still run with get().
+
+    Accounting:
+
+    - dropped: estimate of frames the device didn't deliver (e.g. device busy), a
+      heuristic: frames due by the latest frame, at one per heartbeat period since
+      the first frame of the capture, minus frames arrived. Frames delayed then
+      delivered in a burst (e.g. USB latency) catch up and aren't counted. Clock drift
+      between device and host can add about 1 per 10**4 frames per 100 ppm.
+    - overwritten: frames a read() asked for that were already overwritten, i.e. the
+      consumer fell more than capacity frames behind.
+    """
+
+    def __init__(self, device, capacity=3600, timeout=5):
+        """
+        Represent a background heartbeat capture of a device.
+
+        Parameters
+        ----------
+        device : pygmc.devices.BaseDevice
+            Device with _heartbeat_spec, i.e. DeviceRFC1201 or DeviceRFC1801
+        capacity : int, optional
+            Frames kept, by default 3600 i.e. 1 hour at 1 frame per second.
+        timeout : int, optional
+            Command response timeout, seconds, by default 5
+        """
+        self.capacity = capacity
+        self.stream = HeartbeatStream(device, on_frame=self._append, timeout=timeout)
+        # ring buffer columns, frame seq is at index seq % capacity
+        self._cps = array.array("l", [0]) * capacity
+        self._monotonic_ns = array.array("q", [0]) * capacity
+        self._time_ns = array.array("q", [0]) * capacity
+        self._lock = threading.Lock()
+        # sequence number of the next frame i.e. frames captured so far
+        self._count = 0
+        self._dropped = 0
+        self._overwritten = 0
+        # (monotonic_ns, count) at the first frame of the capture, see _append
+        self._first = None
+        # dropped of earlier captures i.e. before the last start()
+        self._dropped_before = 0
+
+    def start(self) -> None:
+        """Turn heartbeat ON and start capturing."""
+        with self._lock:
+            # the gap between captures isn't dropped frames
+            self._dropped_before = self._dropped
+            self._first = None
+        self.stream.start()
+
+    def stop(self) -> None:
+        """Stop capturing and turn heartbeat OFF, captured frames are kept."""
+        self.stream.stop()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def get(self, name):
+        """Run a device command without stopping the capture, see HeartbeatStream.get"""
+        return self.stream.get(name)
+
+    def _append(self, cps, monotonic_ns) -> None:
+        """Reader thread: store a frame."""
+        time_ns = time.time_ns()
+        with self._lock:
+            if self._first is None:
+                self._first = (monotonic_ns, self._count)
+            i = self._count % self.capacity
+            self._cps[i] = cps
+            self._monotonic_ns[i] = monotonic_ns
+            self._time_ns[i] = time_ns
+            self._count += 1
+            first_ns, first_count = self._first
+            periods = (monotonic_ns - first_ns) / (self.stream._period * 1e9)
+            missing = round(periods) + 1 - (self._count - first_count)
+            self._dropped = self._dropped_before + max(missing, 0)
+
+    @property
+    def count(self) -> int:
+        """Frames captured so far, also the sequence number of the next frame."""
+        return self._count
+
+    def read(self, since=0) -> Tuple[list, int]:
+        """
+        Frames from sequence number since, without waiting.
+
+        Parameters
+        ----------
+        since : int, optional
+            Sequence number of the first frame wanted e.g. the next returned by the
+            previous read(), by default 0
+
+        Returns
+        -------
+        tuple
+            (frames, next) frames [(monotonic_ns, time_ns, cps), ...] oldest first,
+            next is the since of the following read()
+        """
+        with self._lock:
+            first = max(since, self._count - self.capacity, 0)
+            if first > since:
+                self._overwritten += first - since
+            frames = [self._frame(seq) for seq in range(first, self._count)]
+            return frames, self._count
+
+    def window(self, seconds) -> list:
+        """
+        Frames of the last seconds, without waiting.
+
+        Parameters
+        ----------
+        seconds : float
+            Window length, seconds.
+
+        Returns
+        -------
+        list
+            [(monotonic_ns, time_ns, cps), ...] oldest first
+        """
+        start = time.monotonic_ns() - int(seconds * 1e9)
+        with self._lock:
+            frames = []
+            for seq in range(
+                self._count - 1, max(self._count - self.capacity, 0) - 1, -1
+            ):
+                if self._monotonic_ns[seq % self.capacity] < start:
+                    break
+                frames.append(self._frame(seq))
+        frames.reverse()
+        return frames
+
+    def _frame(self, seq) -> tuple:
+        i = seq % self.capacity
+        return self._monotonic_ns[i], self._time_ns[i], self._cps[i]
+
+    def stats(self) -> dict:
+        """
+        Capture accounting.
+
+        Returns
+        -------
+        dict
+            captured: frames captured, buffered: frames in the ring buffer,
+            dropped: estimated frames missing from the heartbeat (see class
+            docstring), overwritten: frames read()
+            asked for after they were overwritten, backlog: bytes waiting in the OS
+            serial buffer i.e. the reader falling behind.
+        """
+        con = self.stream.device.connection._con
+        try:
+            backlog = con.in_waiting
+        except Exception:
+            backlog = None
+        with self._lock:
+            return {
+                "captured": self._count,
+                "buffered": min(self._count, self.capacity),
+                "dropped": self._dropped,
+                "overwritten": self._overwritten,
+                "backlog": backlog,
+            }
@@ -0,0 +1,298 @@
+"""
+Manage many GMC devices: discover them, sample them on a schedule, reconnect.
+"""
+import functools
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, Generator, Tuple
+
+from pygmc.connection import Connection
+from pygmc.devices import auto_get_device
+
+logger = logging.getLogger(__name__)
+
+
+class _Member:
+    """A connected device of the fleet and its sampling schedule."""
+
+    def __init__(self, serial, port, device, plan):
+        self.serial = serial
+        self.port = port
+        self.device = device
+        # {name: interval seconds}
+        self.plan = plan
+        # {name: next due time.monotonic()}, None: due at the next tick
+        self.due = dict.fromkeys(plan)
+        # sample in progress, None once its done callback ran
+        self.future = None
+        # exception of the sample in progress, the device is dropped
+        self.failed = None
+
+
+class Fleet:
+    """
+    Discover every connected GMC device and sample them all on one time grid.
+
+    Each device has a sampling plan {command name: interval seconds} e.g.
+    {"get_cpm": 1, "get_voltage": 60}. Every tick, the commands due on a device run
+    pipelined (BaseDevice.get_many) in a worker thread, all devices in parallel. The
+    ticks are shared by all devices, i.e. samples are time-aligned.
+
+    A failing device doesn't stop the others: it is dropped from the fleet and
+    reconnected by the next discovery (every reconnect_interval seconds), under the
+    same serial.
+    """
+
+    _default_plan = {"get_cpm": 1, "get_voltage": 60}
+
+    def __init__(
+        self,
+        plan=None,
+        workers=None,
+        reconnect_interval=10,
+        timeout=5,
+        vid=None,
+        pid=None,
+        description=None,
+        hardware_id="1A86:7523",
+    ):
+        """
+        Represent a fleet of devices.
+
+        Parameters
+        ----------
+        plan : dict | callable | None, optional
+            Sampling plan {command name: interval seconds}, or plan(device) -> dict
+            for a plan per device. By default None i.e. {"get_cpm": 1, "get_voltage": 60}
+            Commands a device doesn't have (e.g. get_cps on RFC1201) are skipped.
+        workers : int | None, optional
+            Worker threads, by default None i.e. ThreadPoolExecutor default.
+        reconnect_interval : float, optional
+            Seconds between discoveries of new and failed devices while sampling,
+            by default 10
+        timeout : int, optional
+            Device connection timeout, seconds, by default 5
+        vid, pid, description, hardware_id : str | None, optional
+            Device search, same as Connection.discover()
+        """
+        self._plan = plan or self._default_plan
+        self.reconnect_interval = reconnect_interval
+        self._timeout = timeout
+        self._search = {
+            "vid": vid,
+            "pid": pid,
+            "description": description,
+            "hardware_id": hardware_id,
+        }
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="pygmc-fleet"
+        )
+        self._members = {}
+        # members whose sample failed, appended by done callbacks, dropped by sample()
+        self._failed = deque()
+        # discovery running in the background while sampling
+        self._discovery = None
+
+    @property
+    def devices(self) -> dict:
+        """Connected devices {serial: device}"""
+        return {serial: member.device for serial, member in self._members.items()}
+
+    def discover(self) -> list:
+        """
+        Find and connect devices on ports not in use by the fleet.
+
+        Returns
+        -------
+        list
+            Serials of the devices added.
+        """
+        return self._add(self._discover(self._used_ports()))
+
+    def _used_ports(self) -> list:
+        return [member.port for member in self._members.values()]
+
+    def _discover(self, used) -> list:
+        """
+        Connect every new device, ports are probed concurrently. Returns [_Member]
+
+        used is a snapshot of the fleet ports, taken by the caller: discovery runs in
+        a worker thread while sample() adds and removes members.
+        """
+        members = []
+        for port, br in Connection().discover(**self._search, exclude=used):
+            try:
+                members.append(self._connect(port, br))
+            except Exception as e:
+                logger.warning(f"Unable to connect device on port={port}: {e!r}")
+        return members
+
+    def _connect(self, port, baudrate) -> _Member:
+        connection = Connection(timeout=self._timeout)
+        connection.connect_exact(port, baudrate)
+        try:
+            device = auto_get_device(connection)
+            serial = device.get_serial()
+        except Exception:
+            connection.close_connection()
+            raise
+        plan = self._plan(device) if callable(self._plan) else self._plan
+        unknown = [name for name in plan if name not in device._cmd_spec_map]
+        if unknown:
+            logger.warning(f"Device={serial} skips unknown commands {unknown}")
+        plan = {name: interval for name, interval in plan.items() if name not in unknown}
+        return _Member(serial, port, device, plan)
+
+    def _add(self, members) -> list:
+        for member in members:
+            logger.info(f"Fleet add device={member.serial} port={member.port}")
+            old = self._members.get(member.serial)
+            if old is not None:
+                # same device on a new port, e.g. re-enumerated: the old port is stale
+                logger.warning(
+                    f"Fleet replace device={old.serial} port={old.port}->{member.port}"
+                )
+                old.device.connection.close_connection()
+            self._members[member.serial] = member
+        return [member.serial for member in members]
+
+    def _remove(self, member) -> None:
+        logger.warning(f"Fleet drop device={member.serial} port={member.port}")
+        if self._members.get(member.serial) is member:
+            del self._members[member.serial]
+        member.device.connection.close_connection()
+
+    def sample(self, duration=None) -> Generator[Tuple[int, Dict[str, dict]], None, None]:
+        """
+        Sample every device according to its plan, as a generator.
+
+        Discovers devices first if there are none yet.
+
+        Parameters
+        ----------
+        duration : float | None, optional
+            Stop after duration seconds, by default None i.e. forever.
+
+        Yields
+        ------
+        tuple
+            (time_ns, {serial: {name: value}}) per tick, time_ns is the tick
+            time.time_ns(). A device has the commands due at that tick, a value is
+            the exception raised if the device failed, TimeoutError if not done by
+            the next tick. Devices with nothing due, or still busy with an earlier
+            tick, are left out.
+        """
+        if not self._members:
+            self.discover()
+        start = time.monotonic()
+        tick = start
+        next_discovery = start + self.reconnect_interval
+        while duration is None or tick - start < duration:
+            time_ns = time.time_ns()
+            # failures of earlier ticks, also samples done after their tick
+            while self._failed:
+                self._remove(self._failed.popleft())
+            futures = {}
+            for member in list(self._members.values()):
+                if member.future is not None:
+                    continue
+                names = self._due(member, tick)
+                if names:
+                    future = self._executor.submit(self._poll, member, names)
+                    member.future = future
+                    # runs at once if already done, i.e. clears member.future
+                    future.add_done_callback(functools.partial(self._done, member))
+                    futures[member] = (future, names)
+
+            tick += self._tick_interval()
+            wait(
+                [future for future, _ in futures.values()],
+                max(tick - time.monotonic(), 0),
+            )
+            samples = {}
+            for member, (future, names) in futures.items():
+                if future.done():
+                    samples[member.serial] = future.result()
+                else:
+                    late = TimeoutError("sample not done by the next tick")
+                    samples[member.serial] = dict.fromkeys(names, late)
+
+            if self._discovery is not None and self._discovery.done():
+                self._add(self._discovery.result())
+                self._discovery = None
+            if self._discovery is None and time.monotonic() >= next_discovery:
+                self._discovery = self._executor.submit(
+                    self._discover, self._used_ports()
+                )
+                next_discovery = time.monotonic() + self.reconnect_interval
+
+            yield time_ns, samples
+            time.sleep(max(tick - time.monotonic(), 0))
+
+    def _tick_interval(self) -> float:
+        intervals = [i for m in self._members.values() for i in m.plan.values()]
+        return min(intervals, default=self.reconnect_interval)
+
+    @staticmethod
+    def _due(member, tick) -> list:
+        """Commands due at tick, their next due time moves one interval on."""
+        names = []
+        for name, due in member.due.items():
+            # tolerate timer jitter, a tick is never early by more than 1ms
+            if due is None or due <= tick + 1e-3:
+                names.append(name)
+                interval = member.plan[name]
+                due = tick if due is None else due
+                # skip missed intervals, stay on the grid
+                while due <= tick + 1e-3:
+                    due += interval
+                member.due[name] = due
+        return names
+
+    def _poll(self, member, names) -> dict:
+        """Worker: run the due commands, a failing device is marked failed."""
+        member.failed = None
+        try:
+            return member.device.get_many(names)
+        except Exception as e:
+            logger.warning(f"Device={member.serial} failed: {e!r}")
+            member.failed = e
+            return dict.fromkeys(names, e)
+
+    def _done(self, member, future) -> None:
+        """Done callback of a sample: queue a failed device for removal."""
+        if member.failed is not None:
+            self._failed.append(member)
+        member.future = None
+
+    def stats(self) -> dict:
+        """
+        Connection metrics of every device, to compare devices & USB ports.
+
+        Returns
+        -------
+        dict
+            {serial: Connection.stats() + 'hwid'} hwid is the USB hardware ID e.g.
+            'USB VID:PID=1A86:7523 LOCATION=1-1.2' i.e. where the device is plugged in.
+        """
+        hwids = Connection()._port_hwids()
+        stats = {}
+        for serial, member in list(self._members.items()):
+            stats[serial] = member.device.connection.stats()
+            stats[serial]["hwid"] = hwids.get(member.port)
+        return stats
+
+    def close(self) -> None:
+        """Close every device connection and stop the workers."""
+        self._executor.shutdown(wait=True)
+        for member in list(self._members.values()):
+            member.device.connection.close_connection()
+        self._members.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
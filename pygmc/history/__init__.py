@@ -0,0 +1,7 @@
+from .index import HistoryIndex
+from .ingest import ingest_directory
+from .parallel import parse_parallel
+from .parser import HistoryParser
+from .segment import HistorySegment
+from .synthetic import SyntheticHistory
+from .table import HistoryTable
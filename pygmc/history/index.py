@@ -0,0 +1,212 @@
+"""
+Time-range index over saved history dumps, e.g. from BaseDevice.save_history()
+"""
+import datetime
+import json
+import logging
+import os
+
+from .parser import HistoryParser
+from .table import _mode_step, _save_modes
+
+logger = logging.getLogger(__name__)
+
+
+class _IndexParser(HistoryParser):
+    """HistoryParser that keeps the parser state at every context marker."""
+
+    def __init__(self):
+        super().__init__()
+        # [(position, eof_check, last_note), ...] for every context, incl. invalid
+        self.contexts = []
+
+    def _set_context(self, ref_dt, unit, mode):
+        self.contexts.append((self._context_position, self._eof_check, self._last_note))
+        super()._set_context(ref_dt, unit, mode)
+
+
+class HistoryIndex:
+    """
+    Index of the history contexts (0x55 0xAA 0x00 markers) in a history dump.
+
+    The dump is parsed once to find the byte position, reference datetime and number
+    of counts of every context. query() then only reads and parses the contexts
+    covering the requested time range.
+    """
+
+    _version = 1
+
+    def __init__(self, path, entries, size, mtime):
+        """
+        Represent a history dump index. Use HistoryIndex.build() or .load()
+
+        Parameters
+        ----------
+        path: str
+            History dump path.
+        entries: list
+            [(position, end, reference, save_mode, n_counts, eof_check, note), ...]
+            One per context, data in [position, end) is parsed with parser state
+            eof_check & note (pending note) to get the exact same result as a full
+            parse.
+        size: int
+            Dump file size when indexed.
+        mtime: float
+            Dump file modification time when indexed.
+
+        """
+        self.path = path
+        self.entries = entries
+        self.size = size
+        self.mtime = mtime
+
+    @staticmethod
+    def index_path(path) -> str:
+        """Index file path of a history dump."""
+        return path + ".idx"
+
+    @classmethod
+    def build(cls, path):
+        """
+        Scan a history dump and index it.
+
+        Parameters
+        ----------
+        path: str
+            History dump path.
+
+        Returns
+        -------
+        HistoryIndex
+
+        """
+        stat = os.stat(path)
+        parser = _IndexParser()
+        with open(path, "rb") as f:
+            parser._feed_file(f)
+        parser.close()
+
+        # last context is parsed until end of file or end of history (255 heuristic)
+        ends = [position for position, _, _ in parser.contexts[1:]]
+        ends.append(stat.st_size)
+        segments = {segment.position: segment for segment in parser.get_segments()}
+        entries = []
+        for (position, eof_check, note), end in zip(parser.contexts, ends):
+            segment = segments.get(position)
+            if segment is None:
+                # unknown save mode, counts are ignored
+                continue
+            entries.append(
+                (
+                    position,
+                    end,
+                    segment.reference,
+                    segment.save_mode,
+                    len(segment),
+                    eof_check,
+                    note,
+                )
+            )
+        logger.debug("Indexed {} history contexts in {}".format(len(entries), path))
+        return cls(path, entries, stat.st_size, stat.st_mtime)
+
+    @classmethod
+    def load(cls, path, save=True):
+        """
+        Load the index of a history dump, build it if missing or out of date.
+
+        Parameters
+        ----------
+        path: str
+            History dump path.
+        save: bool, optional
+            Save a newly built index next to the dump, by default True
+
+        Returns
+        -------
+        HistoryIndex
+
+        """
+        index_path = cls.index_path(path)
+        stat = os.stat(path)
+        if os.path.exists(index_path):
+            with open(index_path, "r") as f:
+                d = json.load(f)
+            if (
+                d.get("version") == cls._version
+                and d["size"] == stat.st_size
+                and d["mtime"] == stat.st_mtime
+            ):
+                entries = [
+                    (p, e, datetime.datetime.fromisoformat(r), m, n, c, note)
+                    for p, e, r, m, n, c, note in d["entries"]
+                ]
+                return cls(path, entries, d["size"], d["mtime"])
+            logger.info("History index out of date: {}".format(index_path))
+
+        index = cls.build(path)
+        if save:
+            index.save()
+        return index
+
+    def save(self) -> None:
+        """Save index next to the history dump."""
+        d = {
+            "version": self._version,
+            "size": self.size,
+            "mtime": self.mtime,
+            "entries": [
+                (p, e, r.isoformat(), m, n, c, note)
+                for p, e, r, m, n, c, note in self.entries
+            ],
+        }
+        with open(self.index_path(self.path), "w") as f:
+            json.dump(d, f)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _overlaps(self, entry, start, end) -> bool:
+        _, _, reference, save_mode, n_counts, _, _ = entry
+        if not n_counts:
+            return False
+        step = _mode_step(_save_modes[save_mode][1])
+        first = reference + step
+        last = reference + n_counts * step
+        return (start is None or last >= start) and (end is None or first < end)
+
+    def query(self, start=None, end=None):
+        """
+        Get history with start <= datetime < end.
+
+        Only the contexts covering the time range are read and parsed.
+
+        Parameters
+        ----------
+        start: datetime.datetime | None, optional
+            Inclusive start, by default None
+        end: datetime.datetime | None, optional
+            Exclusive end, by default None
+
+        Returns
+        -------
+        list
+            [HistorySegment, ...] use segment.to_tuples() for HistoryParser.get_data()
+            rows.
+
+        """
+        segments = []
+        with open(self.path, "rb") as f:
+            for entry in self.entries:
+                if not self._overlaps(entry, start, end):
+                    continue
+                position, end_position, _, _, _, eof_check, note = entry
+                f.seek(position)
+                parser = HistoryParser()
+                parser._position = position
+                parser._eof_check = eof_check
+                parser._last_note = note
+                parser.feed(f.read(end_position - position))
+                parser.close()
+                segments.extend(parser.get_segments(start, end))
+        return segments
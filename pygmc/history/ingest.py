@@ -0,0 +1,99 @@
+"""
+Ingest a directory of saved history dumps into one timeline per device.
+"""
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from .parser import HistoryParser
+from .table import HistoryTable
+
+logger = logging.getLogger(__name__)
+
+# files written next to history dumps, not dumps themselves
+_sidecar_suffixes = (".idx", ".sync.json")
+
+
+def device_of(path) -> str:
+    """
+    Default device key of a history dump.
+
+    The device serial from the BaseDevice.sync_history() checkpoint next to the
+    dump if there is one, else the file name up to the first "_" e.g.
+    "05004D323533AB_2023-11-10.bin" -> "05004D323533AB".
+
+    Parameters
+    ----------
+    path: str
+        History dump path.
+
+    Returns
+    -------
+    str
+
+    """
+    checkpoint = path + ".sync.json"
+    if os.path.exists(checkpoint):
+        with open(checkpoint, "r") as f:
+            serials = list(json.load(f))
+        if len(serials) == 1:
+            return serials[0]
+    return Path(path).name.split("_")[0].split(".")[0]
+
+
+def ingest_directory(directory, pattern="*", workers=None, device=None, backend="python"):
+    """
+    Parse every history dump in a directory with a pool of worker processes, then
+    merge the dumps of every device into one sorted, de-duplicated timeline.
+
+    Full dumps repeat older flash content: a datetime in more than one dump of a
+    device is kept from the later dump (by file name) only, see HistoryTable.merge
+
+    Parameters
+    ----------
+    directory: str
+        Directory of history dumps e.g. from BaseDevice.save_history()
+    pattern: str, optional
+        Glob pattern of dump file names, by default "*". Index and sync checkpoint
+        files are skipped.
+    workers: int | None, optional
+        Number of worker processes, by default None i.e. os.cpu_count()
+    device: callable | None, optional
+        device(path) -> device key of a dump, by default None i.e. device_of()
+    backend: str, optional
+        HistoryParser backend, 'python' (default) or 'numpy'.
+
+    Returns
+    -------
+    dict
+        {device: HistoryTable} sorted by datetime, without duplicates between dumps.
+
+    """
+    device = device or device_of
+    paths = sorted(
+        str(path)
+        for path in Path(directory).glob(pattern)
+        if path.is_file() and not path.name.endswith(_sidecar_suffixes)
+    )
+    devices = {}
+    for path in paths:
+        devices.setdefault(device(path), []).append(path)
+    logger.info("Ingest {} history dumps of {} devices".format(len(paths), len(devices)))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # submit every dump first, so the pool is busy while merging
+        futures = {
+            key: [executor.submit(_parse_table, path, backend) for path in device_paths]
+            for key, device_paths in devices.items()
+        }
+        return {
+            key: HistoryTable.merge(future.result() for future in device_futures)
+            for key, device_futures in futures.items()
+        }
+
+
+def _parse_table(path, backend):
+    """Worker: parse a history dump to a table."""
+    return HistoryParser(path, backend=backend).get_table()
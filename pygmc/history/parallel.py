@@ -0,0 +1,130 @@
+"""
+Parse large history dumps in parallel, split at context markers.
+"""
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from .parser import HistoryParser
+
+logger = logging.getLogger(__name__)
+
+_CONTEXT_MARKER = b"\x55\xaa\x00"
+
+
+def parse_parallel(path, workers=None, spans=None):
+    """
+    Parse a history dump with a pool of worker processes.
+
+    The dump is split at context markers (0x55 0xAA 0x00) and every span is parsed
+    in a worker, then the spans are merged in order. A marker found by searching
+    may not be a real one (e.g. inside a note) and a span may depend on the parser
+    state at its start (a pending note or a run of 255 counts). Such spans are
+    parsed again in order, so the result is always the same as HistoryParser(path).
+
+    Parameters
+    ----------
+    path: str
+        History dump path e.g. from BaseDevice.save_history()
+    workers: int | None, optional
+        Number of worker processes, by default None i.e. os.cpu_count()
+    spans: int | None, optional
+        Number of spans to split the dump into, by default None i.e. 4 per worker
+
+    Returns
+    -------
+    HistoryParser
+        Closed parser with the parsed data, use get_data(), get_table() or
+        get_segments().
+
+    """
+    workers = workers or os.cpu_count() or 1
+    spans = spans or workers * 4
+    with open(path, "rb") as f:
+        bounds = _split(f, spans)
+        parser = HistoryParser()
+        if workers == 1 or len(bounds) <= 2:
+            f.seek(0)
+            parser._feed_file(f)
+            parser.close()
+            return parser
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(_parse_span, path, start, end)
+                for start, end in zip(bounds, bounds[1:])
+            ]
+            for future, start, end in zip(futures, bounds, bounds[1:]):
+                if parser.eof:
+                    future.cancel()
+                    continue
+                span = future.result()
+                if not _merge(parser, span, start):
+                    # span does not start where the previous one ended, or with
+                    # parser state it did not know of, parse it again in order
+                    logger.debug("Parse history span {}-{} in order".format(start, end))
+                    f.seek(start)
+                    parser._feed(f.read(end - start))
+    parser.close()
+    return parser
+
+
+def _split(f, spans):
+    """Split points: 0, positions of context markers about evenly spaced, size."""
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    bounds = [0]
+    for i in range(1, spans):
+        target = max(size * i // spans, bounds[-1] + 1)
+        f.seek(target)
+        # read a bit more to find a marker after target, not all the way to the end
+        data = f.read(max(size // spans, 2**16))
+        found = data.find(_CONTEXT_MARKER)
+        if found != -1:
+            bounds.append(target + found)
+    bounds.append(size)
+    return sorted(set(bounds))
+
+
+def _parse_span(path, start, end):
+    """Worker: parse [start, end) of a history dump with a fresh parser."""
+    parser = HistoryParser()
+    parser._position = start
+    with open(path, "rb") as f:
+        f.seek(start)
+        parser._feed(f.read(end - start))
+    # not closed, pending bytes are needed to continue from the next span
+    return parser
+
+
+def _merge(parser, span, start):
+    """
+    Append the result of a span parsed from start to parser, if it is the same as
+    parsing the span in order. Returns False if not i.e. parser is unchanged.
+    """
+    if (
+        parser._pending
+        or parser._position != start
+        or parser._eof_check
+        or parser._last_note is not None
+        or (not span._context_history and parser._segment is not None)
+    ):
+        return False
+
+    for segment in span._segments:
+        parser._segments.append(segment)
+        parser._segment_rows.append(parser._n_rows)
+        parser._n_rows += len(segment)
+    parser._notes.extend(span._notes)
+    parser._context_history.extend(span._context_history)
+    if span._context_history:
+        parser._segment = span._segment
+        parser._context_position = span._context_position
+    if span._last_reference_datetime is not None:
+        parser._last_reference_datetime = span._last_reference_datetime
+    parser._last_note = span._last_note
+    parser._eof_check = span._eof_check
+    parser._pending = span._pending
+    parser._position = span._position
+    parser._eof = span._eof
+    return True
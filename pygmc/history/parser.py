@@ -0,0 +1,497 @@
+import bisect
+import datetime
+import logging
+import mmap
+from io import BufferedIOBase
+
+from .segment import HistorySegment
+from .table import HistoryTable, _save_mode_codes, _save_modes
+
+logger = logging.getLogger(__name__)
+
+
+# input parsed in place, without reading it into new bytes
+_buffer_types = (bytes, bytearray, memoryview, mmap.mmap)
+
+
+class HistoryParser:
+    """Parse GQ GMC device history data."""
+
+    # file input is read in chunks of this size
+    _read_size = 2**16
+
+    def __init__(self, data=None, backend="python", use_mmap=True):
+        """
+        Parse GMC flash memory saved history data.
+
+        Parameters
+        ----------
+        data: bytes | bytearray | memoryview | mmap.mmap | str | BufferedIOBase | None
+            Input raw bytes of history, or file path as str, or an BufferedIOBase
+            i.e. open(file, 'rb')
+            Default=None creates a push parser, give it data with feed() and close().
+        backend: str, optional
+            'python' (default) or 'numpy'. The numpy backend gives the same result
+            and is faster for large history data, e.g. 1 MiB at low cpm: get_table()
+            ~4x, get_data() only ~1.8x as creating a tuple per row dominates.
+            Each 0x55 0xAA marker is still visited in Python, so history dense in
+            markers (high cpm, mostly 2-byte counts) gains least: get_table() ~1.5x,
+            get_data() ~1.25x. Requires numpy.
+        use_mmap: bool, optional
+            Memory map file input and parse it in place instead of reading it in
+            chunks, by default True. Falls back to reading if the file can not be
+            mapped e.g. a pipe or an empty file.
+
+        """
+        if backend not in ("python", "numpy"):
+            raise ValueError("backend must be 'python' or 'numpy'")
+        if data is None and backend != "python":
+            raise ValueError("push parser requires backend='python'")
+
+        if data is None or isinstance(data, _buffer_types):
+            self._raw = data
+        elif isinstance(data, str) and len(data) < 32_767:
+            # Ugh...
+            self._raw = open(data, "rb")
+        elif isinstance(data, BufferedIOBase):
+            self._raw = data
+        else:
+            raise TypeError
+        self._use_mmap = use_mmap
+
+        # current segment, None means no valid context i.e. ignore counts
+        self._segment = None
+        self._segments = []
+        # row index of the first count of every segment
+        self._segment_rows = []
+        self._n_rows = 0
+        self._columns = [
+            "datetime",
+            "count",
+            "unit",
+            "mode",
+            "reference_datetime",
+            "notes",
+        ]
+        # get_table() and get_data(), created from self._segments when asked for
+        self._table = HistoryTable()
+        self._rows = []
+        # notes = [(datetime, notes), ...]
+        self._notes = []
+        # context = [(reference_datetime, unit, mode)]
+        self._context_history = []
+        # reference time
+        self._last_reference_datetime = None
+        # last notes - add to next data input and reset to blank
+        self._last_note = None
+        self._eof_check = 0
+        # undecoded bytes from the end of the previous feed() e.g. a split marker
+        self._pending = b""
+        # position of the start of self._pending in the raw history data
+        self._position = 0
+        # position of the last context marker
+        self._context_position = None
+        self._eof = False
+        self._closed = False
+
+        # parse
+        if data is None:
+            return
+        if backend == "numpy":
+            self._parse_numpy()
+        else:
+            self._parse()
+
+    @property
+    def eof(self):
+        """True once end of history data was detected, further data is ignored."""
+        return self._eof
+
+    def feed(self, chunk):
+        """
+        Parse the next chunk of history data.
+
+        Markers, counts and notes split across chunks are parsed once the rest of
+        the data is fed.
+
+        Parameters
+        ----------
+        chunk: bytes | bytearray | memoryview
+            Next raw history data e.g. a flash page.
+
+        Returns
+        -------
+        list
+            Records parsed from this chunk, same format as get_data().
+
+        """
+        if self._closed:
+            raise ValueError("feed() on a closed HistoryParser")
+        if self._eof:
+            return []
+        n = self._n_rows
+        self._feed(chunk)
+        rows = []
+        for segment, start in self._segments_from(n):
+            rows.extend(segment.to_tuples(start))
+        return rows
+
+    def _feed(self, chunk, start=0):
+        """Parse chunk[start:] after the pending bytes of the previous chunk."""
+        if self._pending:
+            chunk = self._pending + bytes(chunk[start:])
+            start = 0
+        pos = self._decode(chunk, start)
+        self._position += pos - start
+        # copy, chunk may be a re-used buffer
+        self._pending = b"" if self._eof else bytes(chunk[pos:])
+
+    def _feed_file(self, f):
+        """Parse an open file from its current position, memory mapped if possible."""
+        mm = _map_file(f) if self._use_mmap else None
+        if mm is None:
+            while not self._eof:
+                chunk = f.read(self._read_size)
+                if len(chunk) == 0:
+                    # nothing left to read...
+                    break
+                self._feed(chunk)
+            return
+        with mm:
+            # indexing and slicing the map itself is as fast as bytes, and unlike
+            # a memoryview leaves no exported buffer that would keep the map open
+            self._feed(mm, f.tell())
+
+    def close(self):
+        """
+        Finish parsing. Incomplete data left over from feed() is discarded.
+
+        Returns
+        -------
+        list
+            Records parsed on close, same format as get_data().
+
+        """
+        if self._pending:
+            logger.debug("Discard incomplete history data: {}".format(self._pending))
+            self._pending = b""
+        if not self._closed:
+            logger.info("End of history data")
+        self._closed = True
+        return []
+
+    def _get_count_data(self, value):
+        # we may be at end of file...
+        # treat several consecutive 255 as end of file
+        if value == 255:
+            self._eof_check += 1
+        else:
+            self._eof_check = 0
+        return value
+
+    def _get_context(self, data):
+        ref_dt, unit, mode_str = _decode_context(data)
+        if ref_dt is not None:
+            self._last_reference_datetime = ref_dt
+        return ref_dt, unit, mode_str
+
+    def _set_context(self, ref_dt, unit, mode):
+        if ref_dt is None:
+            self._segment = None
+        else:
+            self._segment = HistorySegment(ref_dt, _save_mode_codes[(unit, mode)])
+            self._segment.position = self._context_position
+            self._segments.append(self._segment)
+            self._segment_rows.append(self._n_rows)
+        self._context_history.append((ref_dt, unit, mode))
+
+    def _add_to_df(self, count):
+        # It appears that a ref time is dumped out then the next data entry
+        # is put in after <mode> time i.e. count i is at reference + (i + 1) * step
+        # Datetimes are only computed when rows are asked for, see HistorySegment
+        segment = self._segment
+        if segment is None:
+            # add count data with other fields as None?
+            return
+        # threshold modes: really hope GMC outputs reference time for every threshold
+        # output. TODO: investigate.
+
+        # header=["datetime", "count", "unit", "mode", "reference_datetime", "note"]
+        if self._last_note:
+            # i.e. add note to very next count data
+            segment.notes[len(segment.counts)] = self._last_note
+            self._last_note = None
+
+        segment.counts.append(count)
+        self._n_rows += 1
+
+        # check suspicious 255 values
+        # Ok, Hubert Farnsworth, Rick Sanchez...
+        # Only you two are capable of making 100 contiguous counts of 255
+        if self._eof_check > 100:
+            logger.debug("EOFError raised - 100 contiguous counts of 255")
+            raise EOFError
+
+    def _add_notes(self, note):
+        # um... guessing here
+        try:
+            note = note.decode("utf8")
+            segment = self._segment
+            if segment is None:
+                dt = None
+            elif len(segment):
+                dt = segment.datetime_at(-1)
+            else:
+                dt = segment.reference
+            self._notes.append((dt, note))
+            self._last_note = note
+        except UnicodeDecodeError:
+            if self._eof_check > 5:
+                logger.warning(
+                    "Possible end of file... unable to decode note: {}".format(note)
+                )
+
+    def _segments_from(self, row):
+        """(segment, first count) pairs for every row from row index onward."""
+        i = max(bisect.bisect_right(self._segment_rows, row) - 1, 0)
+        for segment, start in zip(self._segments[i:], self._segment_rows[i:]):
+            if start + len(segment) > row:
+                yield segment, max(row - start, 0)
+
+    def _parse(self):
+        if isinstance(self._raw, _buffer_types):
+            self._feed(self._raw)
+        else:
+            with self._raw:
+                self._feed_file(self._raw)
+        self.close()
+
+    def _decode(self, buf, pos=0):
+        """
+        Parse as much of buf as possible.
+
+        Parameters
+        ----------
+        buf: bytes | bytearray | memoryview | mmap.mmap
+            Raw history data.
+        pos: int, optional
+            Position in buf to start parsing from, by default 0
+
+        Returns
+        -------
+        int
+            Position of the first byte not parsed, i.e. an incomplete marker.
+
+        """
+        # The meat of the matter...
+        size = len(buf)
+        try:
+            while pos < size:
+                # command
+                com = buf[pos]
+                # 0x55 (85) Could be context, 2-byte count, notes, OR a regular count
+                if com != 85:
+                    self._add_to_df(self._get_count_data(com))
+                    pos += 1
+                    continue
+
+                if pos + 1 >= size:
+                    break
+                com2 = buf[pos + 1]
+                # 0xaa (170)
+                if com2 != 170:
+                    # Turns out com=85 was a count and not a command flag
+                    # Need to log them as counts, then
+                    self._add_to_df(self._get_count_data(com))
+                    self._add_to_df(self._get_count_data(com2))
+                    pos += 2
+                    continue
+
+                if pos + 2 >= size:
+                    break
+                com3 = buf[pos + 2]
+                # 0x00 (0)
+                # context data - save mode & datetime
+                if com3 == 0:
+                    if pos + 12 > size:
+                        break
+                    self._context_position = self._position + pos
+                    ref_dt, unit, mode = self._get_context(bytes(buf[pos + 3 : pos + 12]))
+                    self._set_context(ref_dt, unit, mode)
+                    pos += 12
+                # 0x01 (1)
+                elif com3 == 1:
+                    # two byte count number
+                    # so... max CPM is 65,535?
+                    if pos + 5 > size:
+                        break
+                    n = self._get_count_data(buf[pos + 3] << 8 | buf[pos + 4])
+                    self._add_to_df(n)
+                    pos += 5
+                # 0x02 (2)
+                elif com3 == 2:
+                    # Notes flag
+                    # bytes size of notes (so max notes size is 255?)
+                    if pos + 4 > size:
+                        break
+                    end = pos + 4 + buf[pos + 3]
+                    if end > size:
+                        break
+                    self._add_notes(bytes(buf[pos + 4 : end]))
+                    pos = end
+                else:
+                    # Whoa! You just hit a rare event
+                    # Counts: 85 then 170 then not 0 nor 1 nor 2.
+                    # Treat them as counts
+                    self._add_to_df(self._get_count_data(com))
+                    self._add_to_df(self._get_count_data(com2))
+                    self._add_to_df(self._get_count_data(com3))
+                    pos += 3
+        except EOFError:
+            # we hit end of file
+            self._eof = True
+        return pos
+
+    def _parse_numpy(self):
+        try:
+            from .vectorized import _parse_segments_table
+        except ImportError as e:
+            raise ImportError("backend='numpy' requires numpy to be installed") from e
+
+        if isinstance(self._raw, _buffer_types):
+            segments, table = _parse_segments_table(self._raw)
+        else:
+            with self._raw:
+                mm = _map_file(self._raw) if self._use_mmap else None
+                if mm is None:
+                    segments, table = _parse_segments_table(self._raw.read())
+                else:
+                    start = self._raw.tell()
+                    segments, table = _parse_mapped(_parse_segments_table, mm, start)
+        for segment in segments:
+            self._segments.append(segment)
+            self._segment_rows.append(self._n_rows)
+            self._n_rows += len(segment)
+        # columns computed in bulk, get_table() has nothing left to extend
+        self._table = table
+        logger.info("End of history data")
+        self._closed = True
+
+    def get_data(self):
+        """Get parsed data."""
+        table = self.get_table()
+        if not self._rows:
+            self._rows = table.to_tuples()
+        elif len(self._rows) < len(table):
+            self._rows.extend(table.to_tuples(len(self._rows)))
+        return self._rows
+
+    def get_table(self):
+        """
+        Get parsed data as a compact columnar table.
+
+        Returns
+        -------
+        HistoryTable
+            Same data as get_data() without creating a tuple per row.
+
+        """
+        for segment, start in self._segments_from(len(self._table)):
+            self._table.extend(segment, start)
+        return self._table
+
+    def get_segments(self, start=None, end=None):
+        """
+        Get parsed data as segments, one per history context.
+
+        Timestamps are not computed, i.e. time slicing is per segment.
+
+        Parameters
+        ----------
+        start: datetime.datetime | None, optional
+            Only counts at or after start, by default None
+        end: datetime.datetime | None, optional
+            Only counts before end, by default None
+
+        Returns
+        -------
+        list
+            [HistorySegment, ...]
+
+        """
+        if start is None and end is None:
+            return list(self._segments)
+        segments = []
+        for segment in self._segments:
+            if not len(segment):
+                continue
+            if (start is not None and segment.end < start) or (
+                end is not None and segment.start >= end
+            ):
+                continue
+            segments.append(segment.between(start, end))
+        return segments
+
+    def get_columns(self):
+        """Get column names."""
+        return self._columns
+
+
+def _decode_context(data):
+    """
+    Decode context data i.e. the 9 bytes after 0x55 0xAA 0x00.
+
+    Parameters
+    ----------
+    data: bytes
+        YY MM DD HH MM SS 0x55 0xAA save_mode
+
+    Returns
+    -------
+    tuple
+        (reference_datetime, unit, mode). reference_datetime is None for an unknown
+        save mode.
+
+    """
+    save_mode = data[8]
+    if save_mode not in _save_modes:
+        msg = "Unknown save mode: {}".format(save_mode)
+        logger.error(msg)
+        return None, "Unknown", "Unknown"
+    unit, mode_str = _save_modes[save_mode]
+
+    year = int("20{0:2d}".format(data[0]))
+    month = int("{0:2d}".format(data[1]))
+    day = int("{0:2d}".format(data[2]))
+    hour = int("{0:2d}".format(data[3]))
+    minute = int("{0:2d}".format(data[4]))
+    second = int("{0:2d}".format(data[5]))
+    ref_dt = datetime.datetime(year, month, day, hour, minute, second)
+    logger.debug(
+        "Context: unit={} mode={} reference_time={}".format(unit, mode_str, ref_dt)
+    )
+    return ref_dt, unit, mode_str
+
+
+def _map_file(f):
+    """Memory map an open file read only, None if it can not be mapped."""
+    try:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        # no file descriptor e.g. BytesIO, or an empty file
+        return None
+
+
+def _parse_mapped(parse, mm, start):
+    """Parse memory mapped data from position start, then unmap it."""
+    view = memoryview(mm)[start:]
+    try:
+        return parse(view)
+    finally:
+        try:
+            view.release()
+            mm.close()
+        except BufferError:
+            # arrays over the map are still referenced e.g. by a traceback, the map
+            # is closed once they are garbage collected
+            pass
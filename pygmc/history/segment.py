@@ -0,0 +1,151 @@
+"""
+Run-length representation of history data, one segment per history context.
+"""
+import datetime
+from array import array
+
+from .table import _mode_step, _save_modes
+
+
+class HistorySegment:
+    """
+    Counts sharing one history context, i.e. between two context markers.
+
+    Count i was recorded at reference + (offset + i + 1) * step.
+    Timestamps are only computed when asked for, so slicing by time and aggregating
+    is done per segment instead of per count.
+    """
+
+    def __init__(self, reference, save_mode, counts=None, notes=None, offset=0):
+        """
+        Represent a history segment.
+
+        Parameters
+        ----------
+        reference: datetime.datetime
+            Reference datetime from the history context.
+        save_mode: int
+            Save mode code from the history context e.g. 1=CPS every second
+        counts: array.array | None, optional
+            Counts, by default None i.e. empty
+        notes: dict | None, optional
+            {count index: note}, by default None i.e. no notes
+        offset: int, optional
+            Number of counts between the reference and the first count, by default 0
+            i.e. not a time slice of another segment.
+
+        """
+        self.reference = reference
+        self.save_mode = save_mode
+        self.unit, self.mode = _save_modes[save_mode]
+        self.step = _mode_step(self.mode)
+        self.counts = array("I") if counts is None else counts
+        self.notes = {} if notes is None else notes
+        self.offset = offset
+        # byte position of the context marker in the raw history data, if known
+        self.position = None
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __repr__(self):
+        return "HistorySegment(reference={}, unit={}, mode={}, counts={})".format(
+            self.reference, self.unit, self.mode, len(self)
+        )
+
+    def datetime_at(self, index) -> datetime.datetime:
+        """Datetime of count at index."""
+        if index < 0:
+            index += len(self)
+        return self.reference + (self.offset + index + 1) * self.step
+
+    @property
+    def start(self):
+        """Datetime of the first count, None if empty."""
+        return self.datetime_at(0) if len(self) else None
+
+    @property
+    def end(self):
+        """Datetime of the last count, None if empty."""
+        return self.datetime_at(-1) if len(self) else None
+
+    def datetimes(self) -> list:
+        """Datetime of every count."""
+        first = self.offset + 1
+        return [self.reference + i * self.step for i in range(first, first + len(self))]
+
+    def _index(self, dt) -> int:
+        """Index of the first count at or after dt."""
+        if not self.step:
+            return 0 if dt <= self.reference else len(self)
+        # ceil((dt - reference) / step) - 1 - offset
+        n = -((self.reference - dt) // self.step) - 1 - self.offset
+        return min(max(n, 0), len(self))
+
+    def between(self, start=None, end=None):
+        """
+        Counts with start <= datetime < end.
+
+        Parameters
+        ----------
+        start: datetime.datetime | None, optional
+            Inclusive start, by default None i.e. from the first count
+        end: datetime.datetime | None, optional
+            Exclusive end, by default None i.e. until the last count
+
+        Returns
+        -------
+        HistorySegment
+            Time slice of this segment, may be empty.
+
+        """
+        lo = 0 if start is None else self._index(start)
+        hi = len(self) if end is None else self._index(end)
+        hi = max(lo, hi)
+        return self[lo:hi]
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError("HistorySegment index must be a slice")
+        lo, hi, step = index.indices(len(self))
+        if step != 1:
+            raise ValueError("HistorySegment slice step must be 1")
+        hi = max(lo, hi)
+        notes = {i - lo: note for i, note in self.notes.items() if lo <= i < hi}
+        segment = HistorySegment(
+            self.reference, self.save_mode, self.counts[lo:hi], notes, self.offset + lo
+        )
+        segment.position = self.position
+        return segment
+
+    def total(self) -> int:
+        """Sum of counts."""
+        return sum(self.counts)
+
+    def mean(self):
+        """Mean count, None if empty."""
+        return sum(self.counts) / len(self) if len(self) else None
+
+    def to_tuples(self, start=0) -> list:
+        """
+        Rows as a list of tuples, same format as HistoryParser.get_data()
+
+        Parameters
+        ----------
+        start: int, optional
+            First count, by default 0
+
+        Returns
+        -------
+        list
+            [("datetime", "count", "unit", "mode", "reference_datetime", "notes"), ...]
+
+        """
+        segment = self[start:] if start else self
+        rows = [
+            (dt, count, self.unit, self.mode, self.reference, None)
+            for dt, count in zip(segment.datetimes(), segment.counts)
+        ]
+        for i, note in segment.notes.items():
+            rows[i] = rows[i][:5] + (note,)
+        return rows
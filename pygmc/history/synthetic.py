@@ -0,0 +1,254 @@
+"""
+Synthetic device history: realistic flash images and the records they hold.
+
+For load testing and fuzzing history parsers, the ground truth has the same
+interface as HistoryParser, i.e. compare HistoryParser(history.data) with history.
+"""
+import datetime
+import math
+import random
+
+from .segment import HistorySegment
+from .table import HistoryTable, _mode_step, _save_modes
+
+
+class SyntheticHistory:
+    """
+    Generate a flash image in the device history format, with its ground truth.
+
+    The image holds, in the format HistoryParser decodes:
+
+    - a context record (0x55 0xAA 0x00, datetime, save mode) per segment, save modes
+      0-5. Save mode 0 (history off) segments have no counts.
+    - counts: Poisson at cpm, per second (CPS modes) or per minute (CPM modes), as
+      1 byte or as 0x55 0xAA 0x01 + 2 bytes when over 255.
+    - notes: 0x55 0xAA 0x02 + size + utf8, attached to the count after them.
+    - accidental 85/170 count sequences e.g. counts 85 7 or 85 170 9, which look
+      like the start of a marker.
+    - 0xff padding to size, i.e. erased flash.
+
+    A count of 85 is only written as 1 byte when the bytes after it can't be read
+    as a marker (like the device... hopefully), otherwise as a 2 byte count. So
+    decoding the image gives back exactly the generated records.
+
+    HistoryParser keeps up to 101 counts of 255 from the padding (its end of data
+    heuristic), the ground truth has none: compare the first len(history) rows.
+    """
+
+    def __init__(
+        self,
+        size=2**20,
+        cpm=30,
+        seed=None,
+        save_modes=(0, 1, 2, 3, 4, 5),
+        segment_counts=1000,
+        note_rate=0.001,
+        accidental_rate=0.001,
+        padding=2048,
+        start=datetime.datetime(2023, 1, 1),
+    ):
+        """
+        Generate a synthetic history.
+
+        Parameters
+        ----------
+        size : int, optional
+            Image size in bytes, by default 2**20 i.e. 1 MiB flash
+        cpm : float, optional
+            Mean counts per minute, by default 30
+        seed : int | None, optional
+            Random seed, by default None
+        save_modes : tuple, optional
+            Save modes to pick from for each segment, by default (0, 1, 2, 3, 4, 5)
+        segment_counts : int, optional
+            Mean counts per segment, by default 1000
+        note_rate : float, optional
+            Probability of a note before a count, by default 0.001
+        accidental_rate : float, optional
+            Probability of an accidental 85/170 sequence instead of a count, by
+            default 0.001
+        padding : int, optional
+            Minimum 0xff bytes at the end, by default 2048 i.e. one flash page.
+        start : datetime.datetime, optional
+            Reference datetime of the first segment, by default 2023-01-01
+        """
+        if padding > size:
+            raise ValueError("padding must not be larger than size")
+        self.size = size
+        self.cpm = cpm
+        self.seed = seed
+        self._random = random.Random(seed)  # noqa: S311
+        self._save_modes = save_modes
+        self._segment_counts = segment_counts
+        self._note_rate = note_rate
+        self._accidental_rate = accidental_rate
+        self._segments = []
+        # {mean: Poisson table}
+        self._poisson = {}
+        self.data = self._generate(size - padding, start) + b"\xff" * padding
+        self.data += b"\xff" * (size - len(self.data))
+
+    def __len__(self):
+        """Number of records."""
+        return sum(len(segment) for segment in self._segments)
+
+    def get_segments(self):
+        """Ground truth segments, [HistorySegment, ...] same as HistoryParser."""
+        return list(self._segments)
+
+    def get_table(self):
+        """Ground truth as a HistoryTable, same as HistoryParser."""
+        return HistoryTable.from_segments(self._segments)
+
+    def get_data(self):
+        """Ground truth records, same format as HistoryParser.get_data()."""
+        return self.get_table().to_tuples()
+
+    def _generate(self, limit, start) -> bytes:
+        """History data of at most limit bytes, segments are added to _segments."""
+        rng = self._random
+        out = bytearray()
+        reference = start
+        while True:
+            save_mode = rng.choice(self._save_modes)
+            context = _context(reference, save_mode)
+            if len(out) + len(context) > limit:
+                break
+            segment = HistorySegment(reference, save_mode)
+            segment.position = len(out)
+            out += context
+            complete = True
+            if save_mode != 0:
+                n = rng.randint(1, 2 * self._segment_counts)
+                counts, notes = self._items(save_mode, n)
+                complete = _encode(counts, notes, segment, out, limit)
+            self._segments.append(segment)
+            if not complete:
+                break
+            # power off, change of mode... then a new context
+            step = _mode_step(segment.mode)
+            gap = datetime.timedelta(seconds=rng.randint(1, 86400))
+            reference += step * len(segment) + gap
+            if reference.year > 2099:
+                # context years are 2 digits, the clock was reset
+                reference = start
+        return bytes(out)
+
+    def _skip(self, rate) -> int:
+        """Counts until the next event of probability rate per count, geometric."""
+        if rate <= 0:
+            return 2**62
+        if rate >= 1:
+            return 0
+        return int(math.log(1 - self._random.random()) / math.log(1 - rate))
+
+    def _items(self, save_mode, n) -> tuple:
+        """Counts of a segment and its notes {count index: note}"""
+        rng = self._random
+        unit = _save_modes[save_mode][0]
+        mean = self.cpm / 60 if unit == "CPS" else self.cpm
+        if mean not in self._poisson:
+            self._poisson[mean] = _poisson_table(mean)
+        values, cum_weights = self._poisson[mean]
+        counts = rng.choices(values, cum_weights=cum_weights, k=n)
+
+        i = self._skip(self._accidental_rate)
+        while i < len(counts):
+            if rng.random() < 0.5:
+                accidental = [85, 170, rng.randint(3, 255)]
+            else:
+                accidental = [85, rng.choice(_not_170)]
+            counts[i : i + 1] = accidental
+            i += len(accidental) + self._skip(self._accidental_rate)
+
+        notes = {}
+        i = self._skip(self._note_rate)
+        while i < len(counts):
+            notes[i] = "note {}".format(rng.randint(0, 99999))
+            i += 1 + self._skip(self._note_rate)
+        return counts, notes
+
+
+_not_170 = [b for b in range(256) if b != 170]
+
+
+def _encode(counts, notes, segment, out, limit) -> bool:
+    """
+    Append encoded counts & notes to out and segment while they fit in limit bytes.
+
+    Returns False if not all fit.
+    """
+    # counts that aren't a plain byte, written one by one
+    special = {i for i, count in enumerate(counts) if count == 85 or count > 255}
+    special = iter(sorted(special.union(notes)))
+    i = 0
+    while i < len(counts):
+        j = next(special, len(counts))
+        if j < i:
+            continue
+        # plain 1 byte counts up to the next special one
+        n = min(j - i, limit - len(out))
+        out += bytes(counts[i : i + n])
+        segment.counts.extend(counts[i : i + n])
+        if i + n < j:
+            return False
+        i = j
+        if i == len(counts):
+            break
+
+        count = counts[i]
+        # counts decoded together, a note would split them
+        after = []
+        for k in (i + 1, i + 2):
+            if k >= len(counts) or k in notes:
+                break
+            after.append(counts[k])
+        group = [count]
+        if count == 85 and after[:1] and after[0] <= 255 and after[0] != 170:
+            group = [85, after[0]]
+        elif count == 85 and len(after) == 2 and after[0] == 170 and 2 < after[1] < 256:
+            group = [85, 170, after[1]]
+        if len(group) == 1 and (count > 255 or count == 85):
+            raw = bytes([85, 170, 1]) + count.to_bytes(2, "big")
+        else:
+            raw = bytes(group)
+        note = notes.get(i)
+        if note is not None:
+            text = note.encode("utf8")
+            raw = bytes([85, 170, 2, len(text)]) + text + raw
+        if len(out) + len(raw) > limit:
+            return False
+        if note is not None:
+            segment.notes[len(segment)] = note
+        segment.counts.extend(group)
+        out += raw
+        i += len(group)
+    return True
+
+
+def _context(dt, save_mode) -> bytes:
+    """0x55 0xAA 0x00 + YY MM DD HH MM SS 0x55 0xAA save_mode"""
+    return bytes(
+        [85, 170, 0, dt.year - 2000, dt.month, dt.day, dt.hour, dt.minute, dt.second]
+        + [85, 170, save_mode]
+    )
+
+
+def _poisson_table(mean) -> tuple:
+    """
+    Poisson(mean) values and cumulative probabilities, for random.choices().
+
+    Values beyond 12 standard deviations of the mean (probability < 1e-32) are left
+    out.
+    """
+    spread = 12 * math.sqrt(mean) + 12
+    values = range(max(int(mean - spread), 0), int(mean + spread) + 1)
+    cum_weights = []
+    total = 0.0
+    for k in values:
+        if mean:
+            total += math.exp(-mean + k * math.log(mean) - math.lgamma(k + 1))
+        else:
+            total = 1.0
+        cum_weights.append(total)
+    return list(values), cum_weights
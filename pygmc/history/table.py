@@ -0,0 +1,280 @@
+"""
+Columnar, compact storage of parsed history data.
+"""
+import datetime
+import itertools
+from array import array
+
+# Device datetimes have no timezone, timestamps are seconds since this naive epoch.
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+# save mode byte in context data -> (unit, mode)
+_save_modes = {
+    0: ("OFF", "off"),
+    1: ("CPS", "every second"),
+    2: ("CPM", "every minute"),
+    3: ("CPM", "every hour"),
+    4: ("CPS", "every second - threshold"),
+    5: ("CPM", "every minute - threshold"),
+}
+# (unit, mode) -> save mode byte
+_save_mode_codes = {v: k for k, v in _save_modes.items()}
+
+
+def _mode_step(mode):
+    """Time between consecutive counts for a save mode string."""
+    if "second" in mode:
+        return datetime.timedelta(seconds=1)
+    elif "minute" in mode:
+        return datetime.timedelta(minutes=1)
+    elif "hour" in mode:
+        return datetime.timedelta(hours=1)
+    return datetime.timedelta(0)
+
+
+def to_timestamp(dt) -> int:
+    """Naive datetime to seconds since 1970-01-01 (no timezone conversion)."""
+    return (dt - _EPOCH) // datetime.timedelta(seconds=1)
+
+
+def to_datetime(timestamp) -> datetime.datetime:
+    """Seconds since 1970-01-01 to naive datetime (no timezone conversion)."""
+    return _EPOCH + datetime.timedelta(seconds=timestamp)
+
+
+def _to_datetimes(timestamps):
+    """Many timestamps (array('q')) to a list of naive datetimes."""
+    try:
+        import numpy as np
+    except ImportError:
+        return [_EPOCH + datetime.timedelta(seconds=ts) for ts in timestamps]
+    return np.frombuffer(timestamps, dtype="datetime64[s]").tolist()
+
+
+class HistoryTable:
+    """
+    Columnar history data.
+
+    One row per count. Columns are compact arrays:
+    timestamps (int64 seconds since 1970-01-01 in device time), counts (uint32),
+    save_modes (uint8 save mode code, i.e. unit and mode) and references (int64
+    reference datetime timestamp). Notes are a sparse {row index: note} table.
+
+    Rows are only created as tuples when asked for e.g. table[i], iter(table) or
+    to_tuples().
+    """
+
+    columns = ["datetime", "count", "unit", "mode", "reference_datetime", "notes"]
+
+    def __init__(self):
+        self.timestamps = array("q")
+        self.counts = array("I")
+        self.save_modes = array("B")
+        self.references = array("q")
+        self.notes = {}
+
+    def append(self, timestamp, count, save_mode, reference, note=None) -> None:
+        """
+        Append a row.
+
+        Parameters
+        ----------
+        timestamp: int
+            Count datetime, seconds since 1970-01-01.
+        count: int
+            Count.
+        save_mode: int
+            Save mode code from the history context data e.g. 1=CPS every second
+        reference: int
+            Reference datetime, seconds since 1970-01-01.
+        note: str | None, optional
+            Note, by default None
+
+        """
+        if note:
+            self.notes[len(self.counts)] = note
+        self.timestamps.append(timestamp)
+        self.counts.append(count)
+        self.save_modes.append(save_mode)
+        self.references.append(reference)
+
+    @classmethod
+    def from_segments(cls, segments):
+        """
+        Create table from history segments.
+
+        Parameters
+        ----------
+        segments: [HistorySegment, ...]
+            History segments in order.
+
+        Returns
+        -------
+        HistoryTable
+
+        """
+        table = cls()
+        for segment in segments:
+            table.extend(segment)
+        return table
+
+    @classmethod
+    def merge(cls, tables):
+        """
+        Merge tables into one sorted by datetime, without duplicates between tables.
+
+        A datetime in more than one table is a duplicate, e.g. from overlapping
+        history dumps of one device: only the rows of the latest table with it are
+        kept. Rows of one table are never de-duplicated, e.g. counts of a save mode 0
+        segment or after a clock reset share a datetime.
+
+        Parameters
+        ----------
+        tables: [HistoryTable, ...]
+            Tables, oldest first.
+
+        Returns
+        -------
+        HistoryTable
+
+        """
+        tables = list(tables)
+        # timestamp -> latest table with it
+        owner = {}
+        for t, table in enumerate(tables):
+            owner.update(dict.fromkeys(table.timestamps, t))
+        # (timestamp, table, row), rows of one datetime stay in table order
+        rows = sorted(
+            (ts, t, i)
+            for t, table in enumerate(tables)
+            for i, ts in enumerate(table.timestamps)
+            if owner[ts] == t
+        )
+        merged = cls()
+        for row, (ts, t, i) in enumerate(rows):
+            table = tables[t]
+            merged.timestamps.append(ts)
+            merged.counts.append(table.counts[i])
+            merged.save_modes.append(table.save_modes[i])
+            merged.references.append(table.references[i])
+            note = table.notes.get(i)
+            if note:
+                merged.notes[row] = note
+        return merged
+
+    def extend(self, segment, start=0) -> None:
+        """
+        Append the rows of a history segment.
+
+        Parameters
+        ----------
+        segment: HistorySegment
+            History segment.
+        start: int, optional
+            First count of the segment to append, by default 0
+
+        """
+        n = len(segment) - start
+        if n <= 0:
+            return
+        row = len(self)
+        reference = to_timestamp(segment.reference)
+        step = segment.step // datetime.timedelta(seconds=1)
+        first = reference + (segment.offset + start + 1) * step
+        if step:
+            self.timestamps.extend(range(first, first + n * step, step))
+        else:
+            self.timestamps.extend(array("q", [first]) * n)
+        self.counts.extend(segment.counts[start:])
+        self.save_modes.extend(array("B", [segment.save_mode]) * n)
+        self.references.extend(array("q", [reference]) * n)
+        for i, note in segment.notes.items():
+            if i >= start:
+                self.notes[row + i - start] = note
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError("HistoryTable slice step must be 1")
+            table = HistoryTable()
+            table.timestamps = self.timestamps[start:stop]
+            table.counts = self.counts[start:stop]
+            table.save_modes = self.save_modes[start:stop]
+            table.references = self.references[start:stop]
+            table.notes = {
+                i - start: note for i, note in self.notes.items() if start <= i < stop
+            }
+            return table
+
+        if index < 0:
+            index += len(self)
+        unit, mode = _save_modes[self.save_modes[index]]
+        return (
+            to_datetime(self.timestamps[index]),
+            self.counts[index],
+            unit,
+            mode,
+            to_datetime(self.references[index]),
+            self.notes.get(index),
+        )
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def to_tuples(self, start=0):
+        """
+        Rows as a list of tuples, same as HistoryParser.get_data()
+
+        Parameters
+        ----------
+        start: int, optional
+            First row, by default 0
+
+        Returns
+        -------
+        list
+            [("datetime", "count", "unit", "mode", "reference_datetime", "notes"), ...]
+
+        """
+        table = self[start:] if start else self
+        references = {ref: to_datetime(ref) for ref in set(table.references)}
+        units = {code: unit for code, (unit, _) in _save_modes.items()}
+        modes = {code: mode for code, (_, mode) in _save_modes.items()}
+        rows = list(
+            zip(
+                _to_datetimes(table.timestamps),
+                table.counts,
+                map(units.__getitem__, table.save_modes),
+                map(modes.__getitem__, table.save_modes),
+                map(references.__getitem__, table.references),
+                itertools.repeat(None),
+            )
+        )
+        for i, note in table.notes.items():
+            rows[i] = rows[i][:5] + (note,)
+        return rows
+
+    def to_numpy(self) -> dict:
+        """
+        Columns as numpy arrays, without copying. Requires numpy.
+
+        Returns
+        -------
+        dict
+            {"datetime": datetime64[s], "count": uint32, "save_mode": uint8,
+            "reference_datetime": datetime64[s]}
+
+        """
+        import numpy as np
+
+        return {
+            "datetime": np.frombuffer(self.timestamps, dtype="datetime64[s]"),
+            "count": np.frombuffer(self.counts, dtype=np.uint32),
+            "save_mode": np.frombuffer(self.save_modes, dtype=np.uint8),
+            "reference_datetime": np.frombuffer(self.references, dtype="datetime64[s]"),
+        }
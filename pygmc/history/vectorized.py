@@ -0,0 +1,300 @@
+"""
+Vectorized (NumPy) history parser backend.
+
+Same output as the pure Python HistoryParser, but count runs, table columns and the
+255 end of file heuristic are computed with array operations. Only the 0x55 0xAA
+pairs (possible markers) are visited one at a time, 2-byte counts are then decoded
+and marker bytes removed in one array operation each.
+
+Row tuples (get_data()) are still created one by one at the end, use the table
+(get_table(), HistoryTable.to_numpy()) to benefit most.
+"""
+import bisect
+import datetime
+import logging
+
+import numpy as np
+
+from .parser import _decode_context
+from .segment import HistorySegment
+from .table import HistoryTable, _save_mode_codes, to_timestamp
+
+logger = logging.getLogger(__name__)
+
+
+def parse_history(raw):
+    """
+    Parse GMC flash memory saved history data.
+
+    Parameters
+    ----------
+    raw: bytes | bytearray | memoryview | mmap.mmap
+        Raw history data.
+
+    Returns
+    -------
+    list
+        List of tuples, same as HistoryParser.get_data()
+        ("datetime", "count", "unit", "mode", "reference_datetime", "notes")
+
+    """
+    rows = parse_history_table(raw).to_tuples()
+    logger.info("End of history data")
+    return rows
+
+
+def parse_history_segments(raw):
+    """
+    Parse GMC flash memory saved history data into segments.
+
+    Parameters
+    ----------
+    raw: bytes | bytearray | memoryview | mmap.mmap
+        Raw history data.
+
+    Returns
+    -------
+    list
+        [HistorySegment, ...] same as HistoryParser.get_segments()
+
+    """
+    segments, _ = _parse_segments_table(raw)
+    logger.info("End of history data")
+    return segments
+
+
+def parse_history_table(raw):
+    """
+    Parse GMC flash memory saved history data into a columnar table.
+
+    Parameters
+    ----------
+    raw: bytes | bytearray | memoryview | mmap.mmap
+        Raw history data.
+
+    Returns
+    -------
+    HistoryTable
+        Same data as HistoryParser.get_table()
+
+    """
+    _, table = _parse_segments_table(raw)
+    logger.info("End of history data")
+    return table
+
+
+def _parse_segments_table(raw):
+    """
+    Parse raw history into segments and a table, sharing the count data.
+
+    Table columns are computed with array operations, no Python loop over rows.
+
+    Returns
+    -------
+    tuple
+        ([HistorySegment, ...], HistoryTable)
+
+    """
+    counts, segments, notes = _parse(raw)
+    counts = counts.astype(np.uint32)
+    starts = [segment[0] for segment in segments]
+
+    history_segments = []
+    for start, end, ref_dt, unit, mode, position in segments:
+        segment = HistorySegment(ref_dt, _save_mode_codes[(unit, mode)])
+        segment.position = position
+        segment.counts.frombytes(counts[start:end].tobytes())
+        history_segments.append(segment)
+
+    for row, note in notes.items():
+        i = bisect.bisect_right(starts, row) - 1
+        history_segments[i].notes[row - starts[i]] = note
+
+    # per segment values, then repeated to one per row
+    lengths = np.array([len(segment) for segment in history_segments], dtype=np.int64)
+    references = np.array(
+        [to_timestamp(segment.reference) for segment in history_segments], dtype=np.int64
+    )
+    steps = np.array(
+        [segment.step // datetime.timedelta(seconds=1) for segment in history_segments],
+        dtype=np.int64,
+    )
+    save_modes = np.array(
+        [segment.save_mode for segment in history_segments], dtype=np.uint8
+    )
+    segment_ids = np.repeat(np.arange(len(history_segments)), lengths)
+    # 1 based position of every row in its segment
+    positions = np.arange(1, len(counts) + 1) - np.repeat(
+        np.array(starts, dtype=np.int64), lengths
+    )
+    row_references = references[segment_ids]
+
+    table = HistoryTable()
+    table.timestamps.frombytes(
+        (row_references + positions * steps[segment_ids]).tobytes()
+    )
+    table.counts.frombytes(counts.tobytes())
+    table.save_modes.frombytes(save_modes[segment_ids].tobytes())
+    table.references.frombytes(row_references.tobytes())
+    table.notes = dict(sorted(notes.items()))
+    return history_segments, table
+
+
+def _parse(raw):
+    """
+    Parse raw history into arrays.
+
+    Returns
+    -------
+    tuple
+        (counts, segments, notes)
+        counts: np.ndarray of every count that is added to the history data
+        segments: [(start, end, reference_datetime, unit, mode, position), ...]
+            counts[start:end] share the context at byte position
+        notes: {count index: note}
+
+    """
+    buf = np.frombuffer(raw, dtype=np.uint8)
+    counts, contexts, notes = _tokenize(raw, buf)
+    n_counts = len(counts)
+
+    # context index of every count, 0 means count before first context
+    context_k = np.array([k for k, _, _ in contexts], dtype=np.int64)
+    context_valid = np.array(
+        [False] + [ctx[0] is not None for _, ctx, _ in contexts], dtype=bool
+    )
+    idx = np.arange(n_counts)
+    added = context_valid[np.searchsorted(context_k, idx, side="right")]
+
+    # Treat 100+ contiguous counts of 255 as end of file. The counter includes counts
+    # that were not added but is only checked once a count is added.
+    is_255 = counts == 255
+    last_not_255 = np.maximum.accumulate(np.where(is_255, -1, idx)) if n_counts else idx
+    streak = idx - last_not_255
+    eof = np.flatnonzero((streak > 100) & added)
+    if len(eof):
+        logger.debug("EOFError raised - 100 contiguous counts of 255")
+        n_counts = int(eof[0]) + 1
+        added = added[:n_counts]
+        contexts = [c for c in contexts if c[0] < n_counts]
+        notes = [n for n in notes if n[0] < n_counts]
+
+    # note is added to the very next added count, empty note is no note
+    added_idx = np.flatnonzero(added)
+    row_notes = {}
+    for k, note in notes:
+        row = int(np.searchsorted(added_idx, k))
+        if row < len(added_idx):
+            row_notes[row] = note
+    row_notes = {row: note for row, note in row_notes.items() if note}
+
+    segments = []
+    start = 0
+    for i, (k, (ref_dt, unit, mode), position) in enumerate(contexts):
+        end = contexts[i + 1][0] if i + 1 < len(contexts) else n_counts
+        if ref_dt is None:
+            continue
+        segments.append((start, start + end - k, ref_dt, unit, mode, position))
+        start += end - k
+
+    return counts[added_idx], segments, row_notes
+
+
+def _tokenize(raw, buf):
+    """
+    Split raw history into counts, contexts and notes.
+
+    Bytes between markers are counts as they are, including 85 + not 170 pairs, so
+    only 0x55 0xAA pairs (possible markers) are visited one at a time. The counts
+    are then gathered in one pass: marker bytes are masked out and 2 byte counts
+    decoded together.
+
+    Returns
+    -------
+    tuple
+        (counts, contexts, notes)
+        counts: np.ndarray (int64) of counts in order
+        contexts: [(count index, (reference_datetime, unit, mode), position), ...]
+        notes: [(count index, note), ...]
+
+    """
+    size = len(raw)
+    candidates = np.flatnonzero((buf[:-1] == 85) & (buf[1:] == 170)).tolist()
+    # bytes [start, end) that aren't counts: contexts, notes, 2 byte count payloads
+    removed_starts = []
+    removed_ends = []
+    count2 = []
+    contexts = []  # (position, context)
+    notes = []  # (position, note)
+    stop = size
+    pos = 0
+    for c in candidates:
+        if c < pos:
+            # inside the previous marker
+            continue
+        if c > pos and raw[c - 1] == 85:
+            # 85 not followed by 170 takes the next byte as a count: in a run of 85
+            # from pos, every other 85 starts a pair
+            r = c - 1
+            while r > pos and raw[r - 1] == 85:
+                r -= 1
+            if (c - r) % 2:
+                continue
+        if c + 2 >= size:
+            stop = c
+            break
+        com3 = raw[c + 2]
+        if com3 == 0:
+            if c + 12 > size:
+                stop = c
+                break
+            contexts.append((c, _decode_context(bytes(raw[c + 3 : c + 12]))))
+            removed_starts.append(c)
+            pos = c + 12
+        elif com3 == 1:
+            if c + 5 > size:
+                stop = c
+                break
+            count2.append(c)
+            removed_starts.append(c + 1)
+            pos = c + 5
+        elif com3 == 2:
+            if c + 4 > size or c + 4 + raw[c + 3] > size:
+                stop = c
+                break
+            pos = c + 4 + raw[c + 3]
+            try:
+                notes.append((c, bytes(raw[c + 4 : pos]).decode("utf8")))
+            except UnicodeDecodeError:
+                logger.debug("Unable to decode note at position={}".format(c))
+            removed_starts.append(c)
+        else:
+            # 85 then 170 then not 0 nor 1 nor 2, treat them as counts
+            pos = c + 3
+            continue
+        removed_ends.append(pos)
+    else:
+        # a last 85 starting a pair is a truncated marker, not a count
+        if size and raw[size - 1] == 85:
+            r = size - 1
+            while r > pos and raw[r - 1] == 85:
+                r -= 1
+            if r >= pos and (size - 1 - r) % 2 == 0:
+                stop = size - 1
+
+    values = buf[:stop].astype(np.int64)
+    if count2:
+        count2 = np.array(count2, dtype=np.int64)
+        values[count2] = (values[count2 + 3] << 8) | values[count2 + 4]
+    # +1 at every removed start, -1 at its end: removed where the running sum is 1
+    depth = np.zeros(stop + 1, dtype=np.int8)
+    depth[np.array(removed_starts, dtype=np.int64)] += 1
+    depth[np.array(removed_ends, dtype=np.int64)] -= 1
+    keep = np.cumsum(depth[:stop]) == 0
+    counts = values[keep]
+
+    # count index of a marker: counts before it
+    before = np.concatenate(([0], np.cumsum(keep)))
+    contexts = [(int(before[c]), context, c) for c, context in contexts]
+    notes = [(int(before[c]), note) for c, note in notes]
+    return counts, contexts, notes
@@ -0,0 +1,307 @@
+"""
+Simulate a GMC device behind a pseudo-terminal (Linux, macOS), no hardware needed.
+
+The simulator serves the real pyserial code path, e.g.
+Connection.connect(port=simulator.port) or pygmc.connect(port=simulator.port)
+"""
+import collections
+import datetime
+import logging
+import math
+import os
+import random
+import select
+import struct
+import termios
+import threading
+import time
+import tty
+
+from pygmc.devices import DeviceRFC1201, DeviceRFC1801
+
+logger = logging.getLogger(__name__)
+
+_models = {
+    "GMC-320": {"version": "GMC-320Re 4.26", "device": DeviceRFC1201},
+    "GMC-500+": {"version": "GMC-500+Re 2.42", "device": DeviceRFC1801},
+}
+
+# config written by GETCFG, other config bytes are 0
+_default_config = {
+    "CalibrationCPM_0": 100,
+    "CalibrationCPM_1": 30000,
+    "CalibrationCPM_2": 25,
+    "Calibration_uSv_0": 0.65,
+    "Calibration_uSv_1": 195.0,
+    "Calibration_uSv_2": 4.85,
+    "ThresholdCPM": 100,
+}
+
+# commands with binary arguments: prefix -> full command length
+_fixed_length_cmds = {b"<SPIR": 12, b"<SETDATETIME": 20}
+
+
+class Simulator:
+    """
+    A simulated GMC-320 (RFC1201) or GMC-500+ (RFC1801) on a pseudo-terminal.
+
+    Models:
+
+    - baudrate: the device only answers when the port is opened at its baudrate
+      (i.e. baudrate probing works), responses are paced at 10 bits per byte.
+    - latency: delay before each response.
+    - 1 MiB flash read with SPIR, optionally with the extra byte of the SPIR bug.
+    - counts: Poisson CPS at the given CPM, heartbeat frames every second.
+    """
+
+    def __init__(
+        self,
+        model="GMC-500+",
+        baudrate=115200,
+        latency=0.002,
+        flash=None,
+        serial="05004d323533ab",
+        cpm=30,
+        spir_bug=False,
+        throughput=True,
+        seed=None,
+    ):
+        """
+        Represent a simulated device.
+
+        Parameters
+        ----------
+        model : str, optional
+            'GMC-320' or 'GMC-500+', by default 'GMC-500+'
+        baudrate : int, optional
+            Device baudrate, by default 115200
+        latency : float | dict, optional
+            Seconds before a response, or {command: seconds} e.g. {'GETCFG': 0.05}
+            (other commands 0), by default 0.002
+        flash : bytes | None, optional
+            History flash content, padded with 0xff to 1 MiB, by default None i.e.
+            empty flash.
+        serial : str, optional
+            Serial number as hex, 7 bytes, by default '05004d323533ab'
+        cpm : float, optional
+            Mean counts per minute, by default 30
+        spir_bug : bool, optional
+            SPIR returns one extra byte, like some firmware, by default False
+        throughput : bool, optional
+            Pace responses at the baudrate, by default True
+        seed : int | None, optional
+            Random seed of the counts, by default None
+        """
+        spec = _models[model]
+        self.model = model
+        self.version = spec["version"]
+        self.baudrate = baudrate
+        self.latency = latency
+        self.serial = bytes.fromhex(serial)
+        self.cpm = cpm
+        self.spir_bug = spir_bug
+        self.throughput = throughput
+        self._rfc1801 = spec["device"] is DeviceRFC1801
+        self.flash = bytearray(b"\xff" * 2**20)
+        if flash:
+            self.flash[: len(flash)] = flash
+        self.config = self._build_config(spec["device"])
+        # received command names e.g. {'GETCPM': 3}
+        self.received = collections.Counter()
+
+        self._random = random.Random(seed)  # noqa: S311
+        self._cps = collections.deque([0], maxlen=60)
+        self._max_cps = 0
+        self._heartbeat = False
+        self._clock_offset = datetime.timedelta(0)
+        self._master = None
+        self._slave = None
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    @staticmethod
+    def _build_config(device) -> bytes:
+        config = bytearray(device._cmd_spec_map["get_config"]["size"])
+        for name, value in _default_config.items():
+            spec = device._cfg_spec_map[name]
+            if spec["type"] is None:
+                config[spec["index"]] = value
+            else:
+                struct.pack_into(spec["type"], config, spec["index"], value)
+        return bytes(config)
+
+    @property
+    def port(self) -> str:
+        """Port to connect to e.g. '/dev/pts/3'"""
+        return os.ttyname(self._slave)
+
+    def start(self) -> None:
+        """Open the pseudo-terminal and start answering commands."""
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._serve, name="pygmc-sim", daemon=True),
+            threading.Thread(target=self._tick, name="pygmc-sim-tick", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Simulated {self.model} on {self.port}")
+
+    def stop(self) -> None:
+        """Stop answering and close the pseudo-terminal."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        os.close(self._slave)
+        os.close(self._master)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _baudrate_matches(self) -> bool:
+        """The port is opened at the device baudrate."""
+        speed = termios.tcgetattr(self._slave)[5]
+        return speed == getattr(termios, "B{}".format(self.baudrate), None)
+
+    def _send(self, data, tail=b"") -> None:
+        """Write a response in USB packets paced at the baudrate, tail with the last."""
+        with self._write_lock:
+            for i in range(0, len(data), 64):
+                packet = data[i : i + 64]
+                if i + 64 >= len(data):
+                    packet += tail
+                if self.throughput:
+                    # a packet arrives once its last byte is on the wire
+                    time.sleep(len(packet) * 10 / self.baudrate)
+                os.write(self._master, packet)
+
+    def _serve(self) -> None:
+        buffer = b""
+        while not self._stop.is_set():
+            readable, _, _ = select.select([self._master], [], [], 0.05)
+            if not readable:
+                continue
+            buffer += os.read(self._master, 4096)
+            while True:
+                cmd, buffer = self._split_cmd(buffer)
+                if cmd is None:
+                    break
+                if not self._baudrate_matches():
+                    # garbled at the wrong baudrate, no response
+                    continue
+                self._answer(cmd)
+
+    @staticmethod
+    def _split_cmd(buffer):
+        """(first complete command or None, rest of buffer)"""
+        start = buffer.find(b"<")
+        if start == -1:
+            return None, b""
+        buffer = buffer[start:]
+        for prefix, length in _fixed_length_cmds.items():
+            if buffer.startswith(prefix):
+                if len(buffer) < length:
+                    return None, buffer
+                return buffer[:length], buffer[length:]
+        end = buffer.find(b">>")
+        if end == -1:
+            return None, buffer
+        return buffer[: end + 2], buffer[end + 2 :]
+
+    def _answer(self, cmd) -> None:
+        name = cmd[1:-2]
+        for prefix in _fixed_length_cmds:
+            if cmd.startswith(prefix):
+                name = prefix[1:]
+        name = name.decode("latin1")
+        self.received[name] += 1
+        response = self._response(name, cmd)
+        if response is None:
+            return
+        latency = self.latency
+        if isinstance(latency, dict):
+            latency = latency.get(name, 0)
+        if latency:
+            time.sleep(latency)
+        # SPIR bug: one extra byte right after the data
+        tail = b"\x00" if name == "SPIR" and self.spir_bug else b""
+        self._send(response, tail)
+
+    def _response(self, name, cmd):
+        """Response bytes of a command, None for no response."""
+        u = ">I" if self._rfc1801 else ">H"
+        if name == "GETVER":
+            return self.version.encode()
+        if name == "GETSERIAL":
+            return self.serial
+        if name == "GETCPM":
+            return struct.pack(u, sum(self._cps))
+        if name == "GETCPS":
+            return struct.pack(u, self._cps[-1])
+        if name == "GETMAXCPS" and self._rfc1801:
+            return struct.pack(">I", self._max_cps)
+        if name in ("GETCPMH", "GETCPML") and self._rfc1801:
+            return struct.pack(">I", sum(self._cps))
+        if name == "GETVOLT":
+            return b"4.2v\x00" if self._rfc1801 else bytes([42])
+        if name == "GETTEMP" and not self._rfc1801:
+            return bytes([24, 5, 0, 0xAA])
+        if name == "GETGYRO":
+            return struct.pack(">hhhB", -7, -242, 37, 0xAA)
+        if name == "GETDATETIME":
+            now = datetime.datetime.now() + self._clock_offset
+            return struct.pack(
+                ">7B",
+                now.year - 2000,
+                now.month,
+                now.day,
+                now.hour,
+                now.minute,
+                now.second,
+                0xAA,
+            )
+        if name == "SETDATETIME":
+            year, month, day, hour, minute, second = cmd[12:18]
+            set_to = datetime.datetime(2000 + year, month, day, hour, minute, second)
+            self._clock_offset = set_to - datetime.datetime.now()
+            return b"\xaa"
+        if name == "GETCFG":
+            return self.config
+        if name == "SPIR":
+            position = int.from_bytes(cmd[5:8], "big")
+            size = int.from_bytes(cmd[8:10], "big")
+            return bytes(self.flash[position : position + size])
+        if name in ("HEARTBEAT1", "HEARTBEAT0"):
+            self._heartbeat = name == "HEARTBEAT1"
+            return None
+        # KEY0-3, POWERON, POWEROFF, REBOOT & unknown commands: no response
+        return None
+
+    def _tick(self) -> None:
+        """Count every second, write a heartbeat frame if heartbeat is ON."""
+        next_tick = time.monotonic() + 1
+        while not self._stop.wait(max(next_tick - time.monotonic(), 0)):
+            next_tick += 1
+            cps = self._poisson(self.cpm / 60)
+            self._cps.append(cps)
+            self._max_cps = max(self._max_cps, cps)
+            if self._heartbeat:
+                frame = (
+                    struct.pack(">I", cps) if self._rfc1801 else struct.pack(">H", cps)
+                )
+                self._send(frame)
+
+    def _poisson(self, mean) -> int:
+        # Knuth, fine for background count rates
+        limit = math.exp(-mean)
+        k, p = 0, self._random.random()
+        while p > limit:
+            k += 1
+            p *= self._random.random()
+        return k
@@ -32,6 +32,14 @@ def docs(ctx):
     # Run in ./docs
     ctx.run("make html")
 
+
 @task
 def ruffix(ctx):
     ctx.run("ruff check --fix .")
+
+
+@task
+def bench(ctx, quick=False):
+    # JSON results in bench_output.json
+    quick = "--quick" if quick else ""
+    ctx.run(f"python -m benchmarks {quick} --output bench_output.json")
@@ -1 +1 @@
-from .connection import MockConnection
+from .connection import MockConnection, MockFlashConnection
@@ -18,6 +18,9 @@ class MockConnection(connection.Connection):
     def read(self, wait_sleep):
         return self._cmd_response_map[self._cmd]
 
+    def read_until_idle(self, min_size=1, gap=None):
+        return self._cmd_response_map[self._cmd]
+
     def read_until(self, expected=b"", size=None):
         response = self._cmd_response_map[self._cmd]
         cut_off_index = -1
@@ -37,3 +40,20 @@ class MockConnection(connection.Connection):
             cut_off_index = size
 
         return response[0:cut_off_index]
+
+
+class MockFlashConnection(MockConnection):
+    """Serve <SPIR>> history reads from a flash memory image."""
+
+    def __init__(self, flash, cmd_response_map=None):
+        super().__init__(cmd_response_map or {})
+        self.flash = flash
+        self.spir_reads = []
+
+    def read_until(self, expected=b"", size=None):
+        if self._cmd.startswith(b"<SPIR"):
+            position = int.from_bytes(self._cmd[5:8], "big")
+            length = int.from_bytes(self._cmd[8:10], "big")
+            self.spir_reads.append(position)
+            return self.flash[position : position + length][0:size]
+        return super().read_until(expected=expected, size=size)
@@ -0,0 +1,73 @@
+"""
+Test pygmc.connection.AsyncConnection and the asyncio devices against a mock device.
+mock_serial only works on Linux, so skip test if not on Linux.
+"""
+import asyncio
+import sys
+
+import pytest
+from serial import Serial
+
+import pygmc
+
+from .test_gmc500_plus_device_rfc_1801 import cmd_response_map, device_result_map
+
+# mock_serial only works on Linux
+if not sys.platform.startswith("linux"):
+    pytest.skip("skipping tests - not running linux", allow_module_level=True)
+
+
+async def get_mock_gc():
+    mock_serial = pytest.importorskip("mock_serial", reason="Doesn't work on Win")
+    mock_dev = mock_serial.MockSerial()
+    mock_dev.open()
+    for cmd, resp in cmd_response_map.items():
+        mock_dev.stub(receive_bytes=cmd, send_bytes=resp)
+    mock_dev.stub(receive_bytes=b"<HEARTBEAT0>>", send_bytes=b"")
+
+    connection = pygmc.connection.AsyncConnection(timeout=1)
+    connection.connect_user_provided(Serial(mock_dev.port))
+    return await pygmc.devices.AsyncDeviceRFC1801.create(connection), mock_dev
+
+
+@pytest.mark.parametrize(
+    "cmd,expected",
+    [(k, v) for k, v in device_result_map.items() if k != "get_version"],
+)
+def test_expected_results(cmd, expected):
+    async def main():
+        gc, mock_dev = await get_mock_gc()
+        try:
+            return await getattr(gc, cmd)()
+        finally:
+            mock_dev.close()
+
+    assert asyncio.run(main()) == expected
+
+
+def test_concurrent_devices():
+    """Several devices polled concurrently from one thread."""
+
+    async def main():
+        devices = [await get_mock_gc() for _ in range(5)]
+        try:
+            return await asyncio.gather(*(gc.get_cpm() for gc, _ in devices))
+        finally:
+            for _, mock_dev in devices:
+                mock_dev.close()
+
+    assert asyncio.run(main()) == [device_result_map["get_cpm"]] * 5
+
+
+def test_version_and_timeout():
+    async def main():
+        gc, mock_dev = await get_mock_gc()
+        try:
+            version = await gc.get_version()
+            # no response, returns what was read on timeout
+            short = await gc.connection.get_exact(b"<UNKNOWN>>", size=4)
+            return version, short
+        finally:
+            mock_dev.close()
+
+    assert asyncio.run(main()) == (device_result_map["get_version"], b"")
@@ -0,0 +1,151 @@
+"""
+Test Connection instrumentation: histograms, counters & hooks, against the simulator.
+Pseudo-terminals only work on Linux here, so skip simulator tests if not on Linux.
+"""
+import random
+import sys
+
+import pytest
+
+from pygmc.connection import Connection, LatencyHistogram
+from pygmc.connection.metrics import command_name
+from pygmc.devices import auto_get_device
+
+linux_only = pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="pseudo-terminal simulator"
+)
+
+
+@pytest.mark.parametrize(
+    "cmd,name",
+    [
+        (b"<GETCPM>>", "GETCPM"),
+        (b"<KEY0>>", "KEY0"),
+        (b"<HEARTBEAT1>>", "HEARTBEAT1"),
+        (b"<SPIR\x00\x10\x00\x08\x00>>", "SPIR"),
+        (b"<SPIR\x00\x10\x30\x38\x00>>", "SPIR"),
+        (b"<SETDATETIME\x17\x0b\x0a\x12\x21\x04>>", "SETDATETIME"),
+        (b"garbage", "UNKNOWN"),
+    ],
+)
+def test_command_name(cmd, name):
+    assert command_name(cmd) == name
+
+
+def test_histogram_buckets():
+    histogram = LatencyHistogram(sub_bucket_bits=7)
+    for value in [0, 1, 255, 256, 257, 10**6, 2**40 + 12345]:
+        index = histogram._index(value)
+        # value is in its bucket, within 1/128
+        assert histogram._lowest(index) <= value < histogram._lowest(index + 1)
+        assert histogram._lowest(index + 1) - histogram._lowest(index) <= max(
+            value / 128, 1
+        )
+
+
+def test_histogram_percentile():
+    rng = random.Random(1)  # noqa: S311
+    values = [int(rng.lognormvariate(14, 1)) for _ in range(10_000)]
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    values.sort()
+    assert histogram.count == len(values)
+    assert (histogram.min, histogram.max) == (values[0], values[-1])
+    assert histogram.mean == pytest.approx(sum(values) / len(values))
+    for percent in (50, 90, 99, 99.9):
+        exact = values[int(percent / 100 * len(values)) - 1]
+        assert histogram.percentile(percent) == pytest.approx(exact, rel=0.01)
+    assert histogram.percentile(100) == values[-1]
+
+
+def test_histogram_merge():
+    a, b = LatencyHistogram(), LatencyHistogram()
+    assert a.summary() == {"count": 0}
+    assert a.percentile(50) is None
+    for value in range(1000):
+        (a if value % 2 else b).record(value * 1000)
+    a.merge(b)
+    assert (a.count, a.min, a.max) == (1000, 0, 999_000)
+    assert a.percentile(50) == pytest.approx(499_000, rel=0.01)
+    with pytest.raises(ValueError):
+        a.merge(LatencyHistogram(sub_bucket_bits=5))
+
+
+@pytest.fixture
+def device():
+    from pygmc.simulator import Simulator
+
+    with Simulator(latency={"GETCPM": 0.05}, seed=1) as sim:
+        connection = Connection(timeout=0.3)
+        connection.connect_exact(sim.port, 115200)
+        yield auto_get_device(connection)
+        connection.close_connection()
+
+
+@linux_only
+def test_stats(device):
+    connection = device.connection
+    connection.metrics.reset()
+    for _ in range(3):
+        device.get_cpm()
+    device.get_many(["get_voltage", "get_gyro"])
+    stats = connection.stats()
+
+    assert stats["port"] == connection._con.port
+    assert stats["baudrate"] == 115200
+    cpm = stats["commands"]["GETCPM"]
+    assert cpm["count"] == 3
+    assert (cpm["bytes_out"], cpm["bytes_in"]) == (3 * 9, 3 * 4)
+    # simulated latency of 50ms
+    assert 50 <= cpm["latency_ms"]["p50"] < 150
+    assert (
+        cpm["latency_ms"]["min"] <= cpm["latency_ms"]["p99"] <= cpm["latency_ms"]["max"]
+    )
+    assert stats["commands"]["GETVOLT"]["bytes_in"] == 5
+    assert stats["commands"]["GETGYRO"]["bytes_in"] == 7
+    assert stats["bytes_in"] == 3 * 4 + 5 + 7
+    # get_cpm resets buffers... writes are commands only
+    assert stats["bytes_out"] == 3 * 9 + len(b"<GETVOLT>><GETGYRO>>")
+    assert (stats["short_reads"], stats["timeouts"]) == (0, 0)
+    assert connection.metrics.histogram("GETCPM").count == 3
+
+
+@linux_only
+def test_short_reads_and_timeouts(device):
+    connection = device.connection
+    connection.metrics.reset()
+    # no response from a GMC-500+
+    assert connection.get_exact(b"<GETTEMP>>", size=4) == b""
+    # last 8 bytes of the 1 MiB flash
+    spir = b"<SPIR" + (2**20 - 8).to_bytes(3, "big") + (16).to_bytes(2, "big") + b">>"
+    assert len(connection.get_exact(spir, size=16)) == 8
+    stats = connection.stats()
+    assert (stats["short_reads"], stats["timeouts"]) == (1, 1)
+    assert stats["commands"]["GETTEMP"]["timeouts"] == 1
+    assert stats["commands"]["SPIR"]["short_reads"] == 1
+
+
+@linux_only
+def test_hooks(device):
+    connection = device.connection
+    events = []
+    connection.add_hook(events.append)
+    connection.add_hook(lambda event: 1 / 0)  # logged, doesn't break I/O
+    assert device.get_version() == "GMC-500+Re 2.42"
+    device.get_cpm()
+    connection.remove_hook(events.append)
+    device.get_cpm()
+
+    assert [event.name for event in events] == ["GETVER", "GETCPM"]
+    version, cpm = events
+    assert version.bytes_in == len("GMC-500+Re 2.42")
+    assert (cpm.cmd, cpm.bytes_out, cpm.bytes_in, cpm.expected) == (
+        b"<GETCPM>>",
+        9,
+        4,
+        4,
+    )
+    assert not cpm.short and not cpm.timeout
+    assert cpm.latency_ns >= 50e6
+    assert "GETCPM" in repr(cpm)
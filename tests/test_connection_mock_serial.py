@@ -72,3 +72,17 @@ def test_baudrate_method():
     """Tests baudrate check flow."""
     # returns true
     assert gc.connection._check_baudrate(gc.connection._con)
+
+
+def test_get_many(monkeypatch):
+    """Pipelined commands give the same results as one command at a time."""
+    writes = []
+    write = gc.connection.write
+    monkeypatch.setattr(gc.connection, "write", lambda cmd: writes.append(write(cmd)))
+    names = [n for n in gc._cmd_spec_map if n != "get_version"]
+    names.insert(3, "get_version")
+    result = gc.get_many(names)
+    assert list(result) == names
+    assert result == {name: device_result_map[name] for name in names}
+    # batch of 3, GETVER alone, batch of the other 7
+    assert len(writes) == 3
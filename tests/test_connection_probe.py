@@ -0,0 +1,95 @@
+"""
+Test concurrent port probing of Connection.connect() and Connection.discover()
+against mock devices on pseudo-terminals.
+mock_serial only works on Linux, so skip test if not on Linux.
+"""
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import pygmc
+
+# mock_serial only works on Linux
+if not sys.platform.startswith("linux"):
+    pytest.skip("skipping tests - not running linux", allow_module_level=True)
+
+
+@pytest.fixture
+def ports():
+    """2 GMC devices between 3 silent non-GMC serial adapters"""
+    mock_serial = pytest.importorskip("mock_serial", reason="Doesn't work on Win")
+    mocks = []
+    for gmc in [False, True, False, True, False]:
+        mock_dev = mock_serial.MockSerial()
+        mock_dev.open()
+        if gmc:
+            mock_dev.stub(receive_bytes=b"<GETSERIAL>>", send_bytes=b"00!W!W\xf6")
+        mocks.append(mock_dev)
+    yield [(mock_dev.port, gmc) for mock_dev, gmc in zip(mocks, [0, 1, 0, 1, 0])]
+    for mock_dev in mocks:
+        mock_dev.close()
+
+
+@pytest.fixture
+def connection(ports, monkeypatch):
+    connection = pygmc.connection.Connection()
+    connection._probe_timeout = 0.2
+    connection._baudrates = [115200, 57600, 38400]
+    monkeypatch.setattr(
+        connection,
+        "_get_available_usb_devices",
+        lambda regexp=None: [
+            SimpleNamespace(device=port, hwid=f"USB LOCATION=1-{i}")
+            for i, (port, _) in enumerate(ports)
+        ],
+    )
+    return connection
+
+
+def test_discover(connection, ports):
+    start = time.monotonic()
+    found = connection.discover()
+    assert found == [(port, 115200) for port, gmc in ports if gmc]
+    # silent ports are probed concurrently: 3 baudrates * 0.2s, not 3 ports * 0.6s
+    assert time.monotonic() - start < 1.5
+
+
+def test_connect_first_found(connection, ports):
+    start = time.monotonic()
+    connection.connect()
+    # first device in port order: the silent port before it is fully probed (0.6s),
+    # silent ports after it stop before their next baudrate
+    assert time.monotonic() - start < 1.0
+    assert connection._con.port == ports[1][0]
+    assert connection._baudrate == 115200
+    connection.close_connection()
+
+
+def test_connect_none_found(connection, monkeypatch):
+    monkeypatch.setattr(connection, "_get_available_usb_devices", lambda regexp=None: [])
+    with pytest.raises(ConnectionError):
+        connection.connect()
+
+
+def test_probe_ports_first_in_order(monkeypatch):
+    """A later port working first doesn't win over an earlier, slower one."""
+    delays = {"a": 0.3, "b": 0.0, "c": 0.1}
+    started, stopped = [], []
+
+    def probe(port, stop=None):
+        started.append(port)
+        if stop.wait(delays[port]):
+            stopped.append(port)
+            return None
+        return 115200 if port != "c" else None
+
+    connection = pygmc.connection.Connection()
+    monkeypatch.setattr(connection, "_probe_baudrate", probe)
+    assert connection._probe_ports(["a", "b", "c"], first=True) == [("a", 115200)]
+    # b worked: c is cancelled or stopped, a still probed
+    assert "c" not in started or stopped == ["c"]
+    assert connection._probe_ports(["c", "a", "b"], first=True) == [("a", 115200)]
+    assert connection._probe_ports(["c", "b"], first=True) == [("b", 115200)]
+    assert connection._probe_ports(["a", "b", "c"]) == [("a", 115200), ("b", 115200)]
@@ -0,0 +1,73 @@
+"""
+Test sharing one device between threads with BaseDevice.submit().
+mock_serial only works on Linux, so skip test if not on Linux.
+"""
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from serial import Serial
+
+import pygmc
+
+from .test_gmc500_plus_device_rfc_1801 import cmd_response_map, device_result_map
+
+# mock_serial only works on Linux
+if not sys.platform.startswith("linux"):
+    pytest.skip("skipping tests - not running linux", allow_module_level=True)
+
+
+@pytest.fixture
+def gc():
+    mock_serial = pytest.importorskip("mock_serial", reason="Doesn't work on Win")
+    mock_dev = mock_serial.MockSerial()
+    mock_dev.open()
+    for cmd, resp in cmd_response_map.items():
+        mock_dev.stub(receive_bytes=cmd, send_bytes=resp)
+    mock_dev.stub(receive_bytes=b"<HEARTBEAT0>>", send_bytes=b"")
+    connection = pygmc.connection.Connection(timeout=2)
+    connection.connect_user_provided(Serial(mock_dev.port, timeout=2))
+    yield pygmc.devices.DeviceRFC1801(connection)
+    connection.close_connection()
+    mock_dev.close()
+
+
+def test_submit_from_threads(gc, monkeypatch):
+    """Commands from many threads don't interleave and all run on one I/O thread."""
+    idents = set()
+    get_exact = gc.connection.get_exact
+
+    def recording_get_exact(*args, **kwargs):
+        idents.add(threading.get_ident())
+        return get_exact(*args, **kwargs)
+
+    monkeypatch.setattr(gc.connection, "get_exact", recording_get_exact)
+    names = ["get_cpm", "get_config", "get_serial", "get_voltage", "get_datetime"] * 4
+
+    def caller(name):
+        return name, gc.submit(name).result()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(caller, names))
+
+    assert results == [(name, device_result_map[name]) for name in names]
+    assert len(idents) == 1
+    assert threading.get_ident() not in idents
+
+
+def test_submit_exception(gc):
+    future = gc.submit("send_key", 9)
+    with pytest.raises(ValueError):
+        future.result()
+    # worker keeps going
+    assert gc.submit("get_cpm").result() == device_result_map["get_cpm"]
+
+
+def test_submit_from_worker(gc):
+    """A submitted call submitting another call runs it inline, no deadlock."""
+
+    def nested():
+        return gc.submit("get_cps").result(timeout=1)
+
+    assert gc.connection.submit(nested).result(timeout=5) == device_result_map["get_cps"]
@@ -0,0 +1,163 @@
+"""
+Test history download flow with a mock connection serving a flash memory image.
+"""
+import io
+import json
+
+import pytest
+
+from pygmc import devices
+from pygmc.history import HistoryParser
+
+from .mocks import MockFlashConnection
+
+PAGE = 2**11
+FLASH = 2**20
+
+# 3 pages of history then empty flash
+history = bytes(range(256)) * (3 * PAGE // 256)
+flash = history + b"\xff" * (FLASH - len(history))
+
+
+@pytest.fixture()
+def device():
+    return devices.DeviceRFC1801(MockFlashConnection(flash))
+
+
+def test_get_raw_history(device):
+    assert device.get_raw_history() == history
+
+
+def test_iter_history_pages(device):
+    pages = [bytes(page) for page in device.iter_history_pages()]
+    assert pages == [history[i : i + PAGE] for i in range(0, len(history), PAGE)]
+
+
+def test_iter_history_pages_start_page(device):
+    pages = [bytes(page) for page in device.iter_history_pages(start_page=2)]
+    assert pages == [history[2 * PAGE :]]
+    assert device.connection.spir_reads == [2 * PAGE, 3 * PAGE]
+
+
+def test_iter_history_pages_buffer_too_small(device):
+    with pytest.raises(ValueError):
+        next(device.iter_history_pages(buffer=bytearray(10)))
+
+
+def test_download_history_to(device):
+    f = io.BytesIO()
+    assert device.download_history_to(f) == len(history)
+    assert f.getvalue() == history
+
+
+def test_save_history(device, tmp_path):
+    path = tmp_path / "history.bin"
+    device.save_history(str(path))
+    assert path.read_bytes() == history
+
+
+def test_save_history_pathlike(device, tmp_path):
+    path = tmp_path / "history.bin"
+    device.save_history(path)
+    assert path.read_bytes() == history
+    assert [p.name for p in tmp_path.iterdir()] == ["history.bin"]
+
+
+def test_save_history_failed(device, tmp_path, monkeypatch):
+    path = tmp_path / "history.bin"
+    path.write_bytes(b"previous dump")
+
+    def iter_history_pages(*args, **kwargs):
+        yield history[:PAGE]
+        raise ConnectionError("unplugged")
+
+    monkeypatch.setattr(device, "iter_history_pages", iter_history_pages)
+    with pytest.raises(ConnectionError):
+        device.save_history(str(path))
+    # no truncated dump, no partial file left
+    assert path.read_bytes() == b"previous dump"
+    assert [p.name for p in tmp_path.iterdir()] == ["history.bin"]
+
+
+def test_sync_history(tmp_path):
+    path = str(tmp_path / "history.bin")
+    connection = MockFlashConnection(flash, {b"<GETSERIAL>>": b"00!W!W\xf6"})
+    device = devices.DeviceRFC1801(connection)
+
+    assert device.sync_history(path) == 3
+    assert open(path, "rb").read() == history
+
+    # nothing new on device; only the last page is re-read
+    connection.spir_reads.clear()
+    assert device.sync_history(path) == 0
+    assert connection.spir_reads == [2 * PAGE, 3 * PAGE]
+
+    # device wrote more history; last page changed and a new page is added
+    more = history + bytes(PAGE + 100)
+    connection.flash = more + b"\xff" * (FLASH - len(more))
+    connection.spir_reads.clear()
+    assert device.sync_history(path) == 2
+    assert connection.spir_reads == [2 * PAGE, 3 * PAGE, 4 * PAGE, 5 * PAGE]
+    assert open(path, "rb").read() == connection.flash[: 5 * PAGE]
+    assert "last_page" not in json.load(open(path + ".sync.json"))[b"00!W!W\xf6".hex()]
+
+    # device memory erased and rewritten; full sync
+    connection.flash = b"\x01" * PAGE + b"\xff" * (FLASH - PAGE)
+    assert device.sync_history(path) == 1
+    assert open(path, "rb").read() == b"\x01" * PAGE
+
+    # erased and rewritten past the last synced page; last page doesn't continue
+    connection.flash = b"\x02" * 2 * PAGE + b"\xff" * (FLASH - 2 * PAGE)
+    assert device.sync_history(path) == 2
+    assert open(path, "rb").read() == b"\x02" * 2 * PAGE
+
+
+def test_sync_history_short_read(tmp_path, monkeypatch):
+    path = str(tmp_path / "history.bin")
+    connection = MockFlashConnection(flash, {b"<GETSERIAL>>": b"00!W!W\xf6"})
+    device = devices.DeviceRFC1801(connection)
+    read_until = connection.read_until
+
+    def short_page_1(expected=b"", size=None):
+        data = read_until(expected=expected, size=size)
+        return data[:100] if connection.spir_reads[-1:] == [PAGE] else data
+
+    monkeypatch.setattr(connection, "read_until", short_page_1)
+    # stops at the short page, no hole in the dump
+    assert device.sync_history(path) == 1
+    assert open(path, "rb").read() == history[:PAGE]
+
+    monkeypatch.setattr(connection, "read_until", read_until)
+    connection.spir_reads.clear()
+    assert device.sync_history(path) == 2
+    assert connection.spir_reads == [0, PAGE, 2 * PAGE, 3 * PAGE]
+    assert open(path, "rb").read() == history
+
+
+def test_sync_history_full_memory(tmp_path):
+    path = str(tmp_path / "history.bin")
+    full = bytes(range(256)) * (FLASH // 256)
+    connection = MockFlashConnection(full, {b"<GETSERIAL>>": b"00!W!W\xf6"})
+    device = devices.DeviceRFC1801(connection)
+    assert device.sync_history(path) == FLASH // PAGE
+
+    # memory full: the first page is checked for history wrapping around
+    connection.spir_reads.clear()
+    assert device.sync_history(path) == 0
+    assert connection.spir_reads == [FLASH - PAGE, 0]
+    connection.flash = bytes(PAGE) + full[PAGE:]
+    assert device.sync_history(path) == 1
+    assert open(path, "rb").read() == connection.flash
+
+
+def test_get_history_data():
+    dump = bytes([85, 170, 0, 23, 11, 10, 18, 33, 4, 85, 170, 1]) + bytes(3 * PAGE)
+    dump += b"\xff" * (FLASH - len(dump))
+    device = devices.DeviceRFC1801(MockFlashConnection(dump))
+    data = device.get_history_data()
+    assert data[0] == HistoryParser(b"").get_columns()
+    assert data[1:] == HistoryParser(dump[: 4 * PAGE]).get_data()
+    # zero counts then end of history i.e. 100+ contiguous 255 from empty flash
+    assert len(data) == 1 + 3 * PAGE + 101
+    # stops reading once end of history is detected
+    assert device.connection.spir_reads == [0, PAGE, 2 * PAGE, 3 * PAGE]
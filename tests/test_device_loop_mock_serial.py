@@ -0,0 +1,103 @@
+"""
+Test pygmc.devices.DeviceLoop driving several mock devices from one thread.
+mock_serial only works on Linux, so skip test if not on Linux.
+"""
+import sys
+
+import pytest
+from serial import Serial
+
+import pygmc
+
+from .test_gmc500_plus_device_rfc_1801 import cmd_response_map, device_result_map
+
+# mock_serial only works on Linux
+if not sys.platform.startswith("linux"):
+    pytest.skip("skipping tests - not running linux", allow_module_level=True)
+
+
+@pytest.fixture
+def mock_devices():
+    mock_serial = pytest.importorskip("mock_serial", reason="Doesn't work on Win")
+    mocks = []
+    devices = []
+    for _ in range(4):
+        mock_dev = mock_serial.MockSerial()
+        mock_dev.open()
+        for cmd, resp in cmd_response_map.items():
+            mock_dev.stub(receive_bytes=cmd, send_bytes=resp)
+        mock_dev.stub(receive_bytes=b"<HEARTBEAT0>>", send_bytes=b"")
+        connection = pygmc.connection.Connection()
+        connection.connect_user_provided(Serial(mock_dev.port, timeout=1))
+        mocks.append(mock_dev)
+        devices.append(pygmc.devices.DeviceRFC1801(connection))
+    yield devices
+    for mock_dev in mocks:
+        mock_dev.close()
+
+
+def test_poll(mock_devices):
+    loop = pygmc.devices.DeviceLoop()
+    for device in mock_devices:
+        loop.add(device)
+    names = ["get_cpm", "get_cps", "get_voltage", "get_datetime", "get_serial"]
+    results = loop.poll(names)
+    assert results == {
+        device: {name: device_result_map[name] for name in names}
+        for device in mock_devices
+    }
+    loop.close()
+
+
+def test_poll_cancelled(mock_devices, monkeypatch):
+    loop = pygmc.devices.DeviceLoop()
+    loop.add(mock_devices[0])
+    request = loop.request
+
+    def request_cancel_voltage(device, name):
+        future = request(device, name)
+        if name == "get_voltage":
+            future.cancel()
+        return future
+
+    monkeypatch.setattr(loop, "request", request_cancel_voltage)
+    results = loop.poll(["get_cpm", "get_voltage"])
+    assert results == {mock_devices[0]: {"get_cpm": device_result_map["get_cpm"]}}
+    loop.close()
+
+
+def test_request(mock_devices):
+    loop = pygmc.devices.DeviceLoop(timeout=0.5)
+    device = mock_devices[0]
+    loop.add(device)
+    futures = [loop.request(device, "get_cpm"), loop.request(device, "get_gyro")]
+    assert loop.run()
+    assert [f.result() for f in futures] == [
+        device_result_map["get_cpm"],
+        device_result_map["get_gyro"],
+    ]
+    with pytest.raises(ValueError):
+        loop.request(device, "get_version")
+    loop.close()
+
+
+def test_timeout_isolated(mock_devices):
+    loop = pygmc.devices.DeviceLoop(timeout=0.5)
+    # RFC1201 device on a RFC1801 mock: <GETTEMP>> gets no response
+    rfc1201 = pygmc.devices.DeviceRFC1201(mock_devices[0].connection)
+    loop.add(rfc1201)
+    loop.add(mock_devices[1])
+    temp = loop.request(rfc1201, "get_temp")
+    other = [loop.request(mock_devices[1], "get_cpm") for _ in range(3)]
+    assert loop.run()
+    assert isinstance(temp.exception(), TimeoutError)
+    assert [f.result() for f in other] == [device_result_map["get_cpm"]] * 3
+    loop.close()
+    # loop I/O is in the connection metrics
+    stats = rfc1201.connection.stats()
+    assert stats["timeouts"] == 1
+    assert stats["commands"]["GETTEMP"]["timeouts"] == 1
+    stats = mock_devices[1].connection.stats()
+    assert stats["commands"]["GETCPM"]["count"] == 3
+    assert stats["bytes_in"] == 3 * len(cmd_response_map[b"<GETCPM>>"])
+    assert stats["commands"]["GETCPM"]["bytes_out"] == 3 * len(b"<GETCPM>>")
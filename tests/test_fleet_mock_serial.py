@@ -0,0 +1,166 @@
+"""
+Test Fleet against mock devices on pseudo-terminals.
+mock_serial only works on Linux, so skip test if not on Linux.
+"""
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import pygmc
+
+from .test_gmc500_plus_device_rfc_1801 import cmd_response_map, device_result_map
+
+# mock_serial only works on Linux
+if not sys.platform.startswith("linux"):
+    pytest.skip("skipping tests - not running linux", allow_module_level=True)
+
+serials = [b"\x00\x00\x00\x00\x00\x00\x01", b"\x00\x00\x00\x00\x00\x00\x02"]
+
+
+@pytest.fixture
+def ports(monkeypatch):
+    """2 GMC-500+ with different serials and a silent non-GMC serial adapter"""
+    mock_serial = pytest.importorskip("mock_serial", reason="Doesn't work on Win")
+    mocks = []
+    for serial in serials + [None]:
+        mock_dev = mock_serial.MockSerial()
+        mock_dev.open()
+        if serial:
+            for cmd, resp in cmd_response_map.items():
+                mock_dev.stub(receive_bytes=cmd, send_bytes=resp)
+            mock_dev.stub(receive_bytes=b"<GETSERIAL>>", send_bytes=serial)
+            mock_dev.stub(receive_bytes=b"<HEARTBEAT0>>", send_bytes=b"")
+        mocks.append(mock_dev)
+    monkeypatch.setattr(pygmc.connection.Connection, "_probe_timeout", 0.1)
+    monkeypatch.setattr(
+        pygmc.connection.Connection,
+        "_get_available_usb_devices",
+        staticmethod(
+            lambda regexp=None: [
+                SimpleNamespace(device=m.port, hwid=f"USB LOCATION=1-{i}")
+                for i, m in enumerate(mocks)
+            ]
+        ),
+    )
+    yield [m.port for m in mocks]
+    for mock_dev in mocks:
+        mock_dev.close()
+
+
+def test_fleet_sample(ports):
+    plan = {"get_cpm": 0.1, "get_voltage": 0.3, "get_temp": 1}
+    with pygmc.Fleet(plan=plan) as fleet:
+        assert sorted(fleet.discover()) == ["00000000000001", "00000000000002"]
+        ticks = list(fleet.sample(duration=0.55))
+
+    assert len(ticks) == 6
+    times = [t for t, _ in ticks]
+    assert times == sorted(times)
+    for i, (_, samples) in enumerate(ticks):
+        # time-aligned: both devices sampled every tick, get_temp isn't a RFC1801 cmd
+        expected = {"get_cpm": device_result_map["get_cpm"]}
+        if i % 3 == 0:
+            expected["get_voltage"] = device_result_map["get_voltage"]
+        assert samples == {serial.hex(): expected for serial in serials}
+
+
+def test_fleet_reconnect(ports, monkeypatch):
+    plan = {"get_cpm": 0.1}
+    with pygmc.Fleet(plan=plan, reconnect_interval=0.2) as fleet:
+        fleet.discover()
+        failing = fleet.devices["00000000000001"]
+
+        def get_many(names):
+            raise OSError("unplugged")
+
+        monkeypatch.setattr(failing, "get_many", get_many)
+        ticks = [samples for _, samples in fleet.sample(duration=2)]
+        # failure isolated to one device
+        assert all(s["00000000000002"] == {"get_cpm": 1210} for s in ticks)
+        assert isinstance(ticks[0]["00000000000001"]["get_cpm"], OSError)
+        assert "00000000000001" not in ticks[1]
+        # reconnected by discovery (the silent port takes 10 baudrates * 0.1s)
+        assert ticks[-1]["00000000000001"] == {"get_cpm": 1210}
+        assert fleet.devices["00000000000001"] is not failing
+
+
+def test_fleet_late_failure(ports, monkeypatch):
+    plan = {"get_cpm": 0.1}
+    with pygmc.Fleet(plan=plan, reconnect_interval=100) as fleet:
+        fleet.discover()
+        failing = fleet.devices["00000000000001"]
+        get_many = failing.get_many
+        calls = []
+
+        def fail_late_once(names):
+            calls.append(names)
+            if len(calls) == 1:
+                time.sleep(0.15)
+                raise OSError("unplugged")
+            return get_many(names)
+
+        monkeypatch.setattr(failing, "get_many", fail_late_once)
+        ticks = [samples for _, samples in fleet.sample(duration=0.35)]
+        assert all(s["00000000000002"] == {"get_cpm": 1210} for s in ticks)
+        # failure done after its tick still drops the device, before another poll
+        assert isinstance(ticks[0]["00000000000001"]["get_cpm"], TimeoutError)
+        assert all("00000000000001" not in s for s in ticks[2:])
+        assert len(calls) == 1
+        assert "00000000000001" not in fleet.devices
+
+
+def test_fleet_success_after_failure_kept(ports, monkeypatch):
+    plan = {"get_cpm": 0.1}
+    with pygmc.Fleet(plan=plan, reconnect_interval=100) as fleet:
+        fleet.discover()
+        device = fleet.devices["00000000000001"]
+        member = fleet._members["00000000000001"]
+        # e.g. failure of an earlier poll
+        member.failed = OSError("unplugged")
+        ticks = [samples for _, samples in fleet.sample(duration=0.25)]
+        assert all(s["00000000000001"] == {"get_cpm": 1210} for s in ticks)
+        assert fleet.devices["00000000000001"] is device
+
+
+def test_fleet_stats(ports):
+    with pygmc.Fleet(plan={"get_cpm": 0.1}) as fleet:
+        fleet.discover()
+        list(fleet.sample(duration=0.25))
+        stats = fleet.stats()
+    assert sorted(stats) == ["00000000000001", "00000000000002"]
+    for i, serial in enumerate(sorted(stats)):
+        assert stats[serial]["port"] == ports[i]
+        assert stats[serial]["hwid"] == f"USB LOCATION=1-{i}"
+        assert stats[serial]["commands"]["GETCPM"]["count"] == 3
+        assert stats[serial]["commands"]["GETCPM"]["latency_ms"]["max"] < 1000
+
+
+def test_fleet_discover_port_snapshot(ports, monkeypatch):
+    plan = {"get_cpm": 0.1}
+    with pygmc.Fleet(plan=plan, reconnect_interval=0) as fleet:
+        fleet.discover()
+        excluded = []
+
+        def discover(self, *args, exclude=(), **kwargs):
+            excluded.append(exclude)
+            return []
+
+        monkeypatch.setattr(pygmc.connection.Connection, "discover", discover)
+        list(fleet.sample(duration=0.15))
+    # discovery in a worker thread gets the ports in use when it was submitted
+    assert excluded
+    assert all(sorted(used) == sorted(ports[:2]) for used in excluded)
+
+
+def test_fleet_add_duplicate_serial(ports):
+    with pygmc.Fleet(plan={"get_cpm": 0.1}) as fleet:
+        fleet.discover()
+        old = fleet._members["00000000000001"]
+        new = fleet._connect(ports[1], 115200)
+        new.serial = old.serial
+        fleet._add([new])
+        # the replaced member's port handle is closed, not leaked
+        assert fleet._members["00000000000001"] is new
+        assert not old.device.connection._con.is_open
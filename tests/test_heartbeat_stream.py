@@ -0,0 +1,257 @@
+"""
+Test HeartbeatStream against a fake GMC-500+ on a pseudo-terminal writing heartbeat
+frames while answering commands.
+Pseudo-terminals only work on Linux, so skip test if not on Linux.
+"""
+import os
+import re
+import sys
+import threading
+import time
+
+import pytest
+from serial import Serial
+
+import pygmc
+from pygmc.devices import HeartbeatCapture, HeartbeatStream
+
+from .test_gmc500_plus_device_rfc_1801 import cmd_response_map, device_result_map
+
+if not sys.platform.startswith("linux"):
+    pytest.skip("skipping tests - not running linux", allow_module_level=True)
+
+# heartbeat period of the fake device, seconds
+period = 0.2
+
+
+class FakeDevice:
+    """Answer commands from cmd_response_map, CPS frames 1, 2, 3... every period."""
+
+    def __init__(self, fd):
+        self.fd = fd
+        self.heartbeat = False
+        self.cps = 0
+        self.write_lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.threads = [
+            threading.Thread(target=self.answer, daemon=True),
+            threading.Thread(target=self.tick, daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def write(self, data):
+        with self.write_lock:
+            if not self.stopped.is_set():
+                os.write(self.fd, data)
+
+    def answer(self):
+        buffer = b""
+        while not self.stopped.is_set():
+            try:
+                buffer += os.read(self.fd, 64)
+            except OSError:
+                return
+            for cmd in re.findall(rb"<[^>]*>>", buffer):
+                if cmd in (b"<HEARTBEAT1>>", b"<HEARTBEAT0>>"):
+                    self.heartbeat = cmd == b"<HEARTBEAT1>>"
+                else:
+                    self.write(cmd_response_map[cmd])
+            buffer = buffer[buffer.rfind(b">>") + 2 :] if b">>" in buffer else buffer
+
+    def tick(self):
+        while not self.stopped.wait(period):
+            if self.heartbeat:
+                self.cps += 1
+                self.write(self.cps.to_bytes(4, "big"))
+
+
+@pytest.fixture
+def stream():
+    device_fd, port_fd = os.openpty()
+    fake = FakeDevice(device_fd)
+    connection = pygmc.connection.Connection(timeout=1)
+    connection.connect_user_provided(Serial(os.ttyname(port_fd), timeout=1))
+    stream = HeartbeatStream(pygmc.devices.DeviceRFC1801(connection))
+    stream._period = period
+    stream._window = period / 4
+    stream._guard = period / 4
+    yield stream
+    fake.stopped.set()
+    with fake.write_lock:
+        pass
+    connection.close_connection()
+    os.close(port_fd)
+    os.close(device_fd)
+
+
+def test_heartbeat_stream(stream):
+    names = ["get_voltage", "get_cpm", "get_datetime", "get_config"]
+    with stream:
+        results = [stream.get(name) for name in names * 2]
+        time.sleep(period * 2)
+        frames = []
+        while not stream._frames.empty():
+            frames.append(stream.get_cps())
+
+    # get_config is the raw config, as parsed by _cmd_spec_map
+    expected = [
+        cmd_response_map[b"<GETCFG>>"] if n == "get_config" else device_result_map[n]
+        for n in names
+    ]
+    assert results == expected * 2
+    # every frame, in order, none taken for a command response
+    cps = [c for c, _ in frames]
+    assert cps == list(range(1, len(cps) + 1))
+    assert len(cps) >= 2
+    times = [t for _, t in frames]
+    assert times == sorted(times)
+    # responses and frames are in the connection metrics
+    stats = stream.device.connection.stats()
+    for name in names:
+        cmd = stream.device._cmd_spec_map[name]["cmd"]
+        command = stats["commands"][cmd[1:-2].decode()]
+        assert command["count"] == 2
+        assert command["bytes_in"] == 2 * len(cmd_response_map[cmd])
+        assert command["timeouts"] == command["short_reads"] == 0
+        assert 0 < command["latency_ms"]["max"] < 1000
+    responses = sum(
+        len(cmd_response_map[stream.device._cmd_spec_map[n]["cmd"]]) for n in names
+    )
+    assert stats["bytes_in"] >= 2 * responses + 4 * len(cps)
+
+
+def test_heartbeat_stream_on_frame(stream):
+    frames = []
+    stream._on_frame = lambda cps, t: frames.append(cps)
+    with stream:
+        time.sleep(period * 3.5)
+        assert stream.get("get_cps") == device_result_map["get_cps"]
+    assert frames[:3] == [1, 2, 3]
+
+
+def test_heartbeat_stream_unknown_size(stream):
+    with pytest.raises(ValueError):
+        stream.get("get_version")
+
+
+def test_heartbeat_stream_framing(stream):
+    """A frame due before the response started, and a frame right after it."""
+    frames = []
+    stream._on_frame = lambda cps, t: frames.append(cps)
+    t0 = time.monotonic_ns()
+    ms = 10**6
+    stream._receive(b"\x00\x00\x00\x07", t0)
+    pending = stream._send(stream.device._cmd_spec_map["get_cpm"])
+    # frame due: heartbeat, not the response
+    stream._receive(b"\x00\x00\x00\x08", t0 + 200 * ms)
+    assert not pending.future.done()
+    stream._receive(b"\x00\x00\x04\xba\x00\x00", t0 + 210 * ms)
+    stream._receive(b"\x00\x09", t0 + 220 * ms)
+    assert pending.future.result(0) == b"\x00\x00\x04\xba"
+    assert frames == [7, 8, 9]
+
+
+def test_heartbeat_stream_resync(stream):
+    """Partial response then timeout, late response bytes don't shift frames."""
+    frames = []
+    late = []
+    stream._on_frame = lambda cps, t: frames.append(cps)
+    stream._timeout = 0.01
+
+    def write(cmd):
+        stream._receive(b"\x00\x00", time.monotonic_ns())
+        late.append(time.monotonic_ns())
+
+    stream.device.connection.write = write
+    stream._receive(b"\x00\x00\x00\x07", time.monotonic_ns())
+    with pytest.raises(TimeoutError):
+        stream.get("get_cpm")
+    # rest of the response, read before the resync
+    stream._receive(b"\x04\xba", late[0])
+    stream._receive(b"\x00\x00\x00\x08", time.monotonic_ns() + period * 10**9)
+    assert frames == [7, 8]
+    assert stream._pending is None
+    stats = stream.device.connection.stats()
+    assert stats["short_reads"] == 1
+    assert stats["commands"]["GETCPM"]["short_reads"] == 1
+    assert stats["bytes_in"] == 4 + 2 + 2 + 4
+
+
+def test_heartbeat_stream_resync_split_frame(stream):
+    """The input buffer reset splits a frame, its rest isn't taken as a frame start."""
+    frames = []
+    stream._on_frame = lambda cps, t: frames.append(cps)
+    ns = period * 10**9
+    stream._receive(b"\x00\x00\x00\x07", time.monotonic_ns() - ns)
+    # first half of frame 8 read, then a resync drops the buffered bytes
+    stream._receive(b"\x00\x00", time.monotonic_ns())
+    stream._resync()
+    t0 = time.monotonic_ns()
+    # rest of frame 8, and of frame 9 whose start the reset discarded
+    stream._receive(b"\x00\x08", t0 + 10**6)
+    stream._receive(b"\x00\x09", t0 + ns * 0.5)
+    stream._receive(b"\x00\x00\x00\x0a", t0 + ns * 1.5)
+    stream._receive(b"\x00\x00\x00\x0b", t0 + ns * 2.5)
+    assert frames == [7, 10, 11]
+
+
+def test_heartbeat_stream_timeout_metrics(stream):
+    """No response at all is a timeout in the connection metrics."""
+    stream._timeout = 0.01
+    stream.device.connection.write = lambda cmd: None
+    stream._receive(b"\x00\x00\x00\x07", time.monotonic_ns())
+    with pytest.raises(TimeoutError):
+        stream.get("get_voltage")
+    stats = stream.device.connection.stats()
+    assert stats["timeouts"] == 1
+    assert stats["commands"]["GETVOLT"]["timeouts"] == 1
+    assert stats["commands"]["GETVOLT"]["latency_ms"]["max"] >= 10
+
+
+@pytest.fixture
+def capture(stream):
+    capture = HeartbeatCapture(stream.device, capacity=4)
+    capture.stream._period = period
+    capture.stream._window = period / 4
+    capture.stream._guard = period / 4
+    return capture
+
+
+def test_heartbeat_capture(capture):
+    with capture:
+        time.sleep(period * 2.5)
+        frames, since = capture.read()
+        assert [cps for _, _, cps in frames] == list(range(1, since + 1))
+        # consumer falls behind, the ring buffer keeps the last 4 frames
+        time.sleep(period * 5)
+        assert capture.get("get_voltage") == device_result_map["get_voltage"]
+        frames, next_ = capture.read(since)
+    assert [cps for _, _, cps in frames] == list(range(next_ - 3, next_ + 1))
+    assert capture.stats()["overwritten"] == next_ - since - 4
+    assert capture.stats()["buffered"] == 4
+    assert capture.stats()["dropped"] == 0
+    assert [f[2] for f in capture.window(period * 1.5)] == [next_ - 1, next_]
+    monotonic_ns = [f[0] for f in frames]
+    time_ns = [f[1] for f in frames]
+    assert monotonic_ns == sorted(monotonic_ns)
+    assert abs(time_ns[-1] - time.time_ns()) < 5 * 10**9
+
+
+def test_heartbeat_capture_dropped(capture):
+    t0 = time.monotonic_ns()
+    for i, t in enumerate([0, 1, 2, 5, 6]):
+        capture._append(i, t0 + int(t * period * 1e9))
+    # frames 3 and 4 never arrived
+    assert capture.stats()["dropped"] == 2
+    assert capture.count == 5
+
+
+def test_heartbeat_capture_burst_not_dropped(capture):
+    t0 = time.monotonic_ns()
+    # frames 3 and 4 delayed, then delivered together
+    for i, t in enumerate([0, 1, 2, 4.4, 4.45, 5, 6]):
+        capture._append(i, t0 + int(t * period * 1e9))
+    assert capture.stats()["dropped"] == 0
+    capture._append(7, t0 + int(9 * period * 1e9))
+    assert capture.stats()["dropped"] == 2
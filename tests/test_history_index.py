@@ -0,0 +1,53 @@
+"""
+Test HistoryIndex time range queries against a full HistoryParser parse.
+"""
+import os
+import random
+
+import pytest
+
+from pygmc.history import HistoryIndex, HistoryParser
+
+from .test_history_parser import history, random_history
+
+
+def rows(segments):
+    return [row for segment in segments for row in segment.to_tuples()]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_query(tmp_path, seed):
+    raw = random_history(seed) + history
+    try:
+        data = HistoryParser(raw).get_data()
+    except ValueError:
+        return
+    path = str(tmp_path / "history.bin")
+    with open(path, "wb") as f:
+        f.write(raw)
+
+    index = HistoryIndex.build(path)
+    assert rows(index.query()) == data
+
+    rng = random.Random(seed)  # noqa: S311
+    for _ in range(10):
+        start, end = sorted(rng.choice(data)[0] for _ in range(2))
+        assert rows(index.query(start, end)) == [r for r in data if start <= r[0] < end]
+
+
+def test_load(tmp_path):
+    path = str(tmp_path / "history.bin")
+    with open(path, "wb") as f:
+        f.write(history)
+
+    index = HistoryIndex.load(path)
+    assert os.path.exists(HistoryIndex.index_path(path))
+    loaded = HistoryIndex.load(path)
+    assert loaded.entries == index.entries
+    assert rows(loaded.query()) == HistoryParser(history).get_data()
+
+    # dump changed, index is rebuilt
+    with open(path, "ab") as f:
+        f.write(bytes([1, 2, 3]))
+    os.utime(path, (0, 0))
+    assert HistoryIndex.load(path).size == len(history) + 3
@@ -0,0 +1,78 @@
+"""
+Test directory ingest and HistoryTable.merge de-duplication.
+"""
+import datetime
+import json
+
+from pygmc.history import HistoryParser, HistoryTable, ingest_directory
+from pygmc.history.ingest import device_of
+
+from .test_history_parser import context, dt, note
+
+
+def dump(start, n, save_mode=1, text=None):
+    """CPS history starting at start, counts are the seconds since dt mod 200."""
+    offset = int((start - dt).total_seconds())
+    raw = context(start, save_mode)
+    if text:
+        raw += note(text)
+    return raw + bytes((offset + i + 1) % 200 for i in range(n))
+
+
+def test_merge():
+    a = HistoryParser(dump(dt, 100)).get_table()
+    b = HistoryParser(
+        dump(dt + datetime.timedelta(seconds=50), 100, text="b")
+    ).get_table()
+    merged = HistoryTable.merge([b, a])
+    data = merged.to_tuples()
+    assert len(merged) == 150
+    assert [row[0] for row in data] == sorted(row[0] for row in data)
+    assert [row[1] for row in data] == [(i + 1) % 200 for i in range(150)]
+    # later table wins: note from b is overwritten by a
+    assert merged.notes == {}
+    assert HistoryTable.merge([a, b]).notes == {50: "b"}
+    assert len(HistoryTable.merge([])) == 0
+
+
+def test_merge_same_datetime_in_one_dump():
+    # save mode 0 (history off) counts share their reference datetime
+    off = context(dt, 0) + bytes([7, 8, 9])
+    a = HistoryParser(off + dump(dt + datetime.timedelta(seconds=10), 5)).get_table()
+    b = HistoryParser(dump(dt + datetime.timedelta(seconds=12), 5)).get_table()
+    merged = HistoryTable.merge([a, b])
+    data = merged.to_tuples()
+    assert [row[1] for row in data[:3]] == [7, 8, 9]
+    assert {row[0] for row in data[:3]} == {dt}
+    # a keeps the rows before b started, b wins the overlap
+    assert [row[1] for row in data[3:]] == [11, 12, 13, 14, 15, 16, 17]
+    assert HistoryTable.merge([a]).counts == a.counts
+
+
+def test_ingest_directory(tmp_path):
+    step = datetime.timedelta(seconds=300)
+    for i in range(4):
+        # every dump repeats the flash content of the previous one
+        (tmp_path / "GMC1_{}.bin".format(i)).write_bytes(dump(dt, 300 * (i + 1)))
+        (tmp_path / "GMC2_{}.bin".format(i)).write_bytes(dump(dt + i * step, 300))
+    (tmp_path / "GMC1_0.bin.idx").write_text("{}")
+    (tmp_path / "other.bin").write_bytes(dump(dt, 10))
+    with open(str(tmp_path / "other.bin.sync.json"), "w") as f:
+        json.dump({"SERIAL3": {}}, f)
+
+    tables = ingest_directory(str(tmp_path), workers=2)
+    assert sorted(tables) == ["GMC1", "GMC2", "SERIAL3"]
+    assert len(tables["GMC1"]) == 1200
+    # same counts and datetimes, other reference datetimes
+    assert tables["GMC1"].timestamps == tables["GMC2"].timestamps
+    assert tables["GMC1"].counts == tables["GMC2"].counts
+    assert tables["GMC1"].to_tuples() == HistoryParser(dump(dt, 1200)).get_data()
+    assert len(tables["SERIAL3"]) == 10
+
+    tables = ingest_directory(str(tmp_path), pattern="GMC2_*", device=lambda p: "x")
+    assert list(tables) == ["x"]
+
+
+def test_device_of(tmp_path):
+    assert device_of(str(tmp_path / "05004D323533AB_2023-11-10.bin")) == "05004D323533AB"
+    assert device_of(str(tmp_path / "gmc.bin")) == "gmc"
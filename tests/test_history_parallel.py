@@ -0,0 +1,61 @@
+"""
+Test parse_parallel against a full HistoryParser parse.
+"""
+import datetime
+
+import pytest
+
+from pygmc.history import HistoryParser, parse_parallel
+
+from .test_history_parser import context, dt, history, note, random_history
+
+
+def write(tmp_path, raw):
+    path = str(tmp_path / "history.bin")
+    with open(path, "wb") as f:
+        f.write(raw)
+    return path
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("spans", [2, 7, 50])
+def test_parse_parallel(tmp_path, seed, spans):
+    raw = random_history(seed, size=50_000) + history
+    try:
+        expected = HistoryParser(raw).get_data()
+    except ValueError:
+        return
+    path = write(tmp_path, raw)
+    parser = parse_parallel(path, workers=2, spans=spans)
+    assert parser.get_data() == expected
+    with pytest.raises(ValueError):
+        parser.feed(b"\x01")
+
+
+def test_parse_parallel_boundaries(tmp_path):
+    # marker inside a note, note pending across a marker, 255 run across a marker
+    t = dt + datetime.timedelta(days=1)
+    raw = (
+        context(dt, 1)
+        + bytes(range(1, 80))
+        + note("x" * 20 + context(t, 2).decode("latin1") + "y" * 20)
+        + bytes(range(1, 80))
+        + note("pending")
+        + context(t, 1)
+        + bytes([3] * 80 + [255] * 60)
+        + context(t, 2)
+        + bytes([255] * 60)
+        + context(t, 1)
+        + bytes(range(1, 80))
+    )
+    expected = HistoryParser(raw).get_data()
+    assert HistoryParser(raw).eof
+    assert "pending" in [row[5] for row in expected]
+    path = write(tmp_path, raw)
+    for spans in range(2, 12):
+        assert parse_parallel(path, workers=2, spans=spans).get_data() == expected
+
+
+def test_parse_parallel_one_worker(tmp_path):
+    path = write(tmp_path, history)
+    assert parse_parallel(path, workers=1).get_data() == HistoryParser(history).get_data()
@@ -0,0 +1,284 @@
+"""
+Test HistoryParser with hand-crafted history data.
+"""
+import datetime
+import itertools
+import random
+
+import pytest
+
+from pygmc.history import HistoryParser, HistoryTable
+
+
+def context(dt, save_mode):
+    """0x55 0xAA 0x00 + YY MM DD HH MM SS 0x55 0xAA save_mode"""
+    return bytes(
+        [85, 170, 0, dt.year - 2000, dt.month, dt.day, dt.hour, dt.minute, dt.second]
+        + [85, 170, save_mode]
+    )
+
+
+def count2(n):
+    """0x55 0xAA 0x01 + two byte count"""
+    return bytes([85, 170, 1]) + n.to_bytes(2, "big")
+
+
+def note(text):
+    """0x55 0xAA 0x02 + size + note"""
+    raw = text.encode("utf8") if isinstance(text, str) else text
+    return bytes([85, 170, 2, len(raw)]) + raw
+
+
+dt = datetime.datetime(2023, 11, 10, 18, 33, 4)
+
+history = (
+    context(dt, 1)
+    + bytes([1, 2, 3])
+    + note("hello")
+    + bytes([4])
+    + count2(1000)
+    + bytes([85, 7])  # 85 count, not a marker
+    + bytes([85, 170, 9])  # rare event, 3 counts
+    + context(dt, 2)
+    + bytes([10, 11])
+    + b"\xff" * 2048
+)
+
+
+def random_history(seed, size=20_000):
+    """Random tokens, including nasty ones, for comparing parser backends."""
+    rng = random.Random(seed)  # noqa: S311
+    parts = []
+    n = 0
+    while n < size:
+        r = rng.random()
+        if r < 0.01:
+            t = dt + datetime.timedelta(seconds=rng.randint(0, 10**8))
+            part = context(t, rng.choice([0, 1, 2, 3, 4, 5, 5, 9]))
+        elif r < 0.02:
+            part = count2(rng.randint(0, 2**16 - 1))
+        elif r < 0.03:
+            part = note(rng.choice(["a", "note", "", b"\xff\xfe", "x" * 30]))
+        elif r < 0.05:
+            part = bytes(rng.choice([[85], [85, 170], [85, 85, 170, 0], [170, 85]]))
+        elif r < 0.055:
+            part = b"\xff" * rng.randint(90, 110)
+        else:
+            part = bytes(rng.choices(range(256), k=rng.randint(1, 50)))
+        parts.append(part)
+        n += len(part)
+    return b"".join(parts)
+
+
+def test_parse():
+    data = HistoryParser(history).get_data()
+    assert data[:4] == [
+        (dt + datetime.timedelta(seconds=1), 1, "CPS", "every second", dt, None),
+        (dt + datetime.timedelta(seconds=2), 2, "CPS", "every second", dt, None),
+        (dt + datetime.timedelta(seconds=3), 3, "CPS", "every second", dt, None),
+        (dt + datetime.timedelta(seconds=4), 4, "CPS", "every second", dt, "hello"),
+    ]
+    assert [row[1] for row in data[4:10]] == [1000, 85, 7, 85, 170, 9]
+    assert data[10] == (
+        dt + datetime.timedelta(minutes=1),
+        10,
+        "CPM",
+        "every minute",
+        dt,
+        None,
+    )
+    # 100+ contiguous counts of 255 is end of file
+    assert len(data) == 12 + 101
+
+
+def test_parse_file(tmp_path):
+    path = tmp_path / "history.bin"
+    path.write_bytes(history)
+    assert HistoryParser(str(path)).get_data() == HistoryParser(history).get_data()
+    with open(path, "rb") as f:
+        assert HistoryParser(f).get_data() == HistoryParser(history).get_data()
+
+
+@pytest.mark.parametrize("backend", ["python", "numpy"])
+@pytest.mark.parametrize("use_mmap", [True, False])
+def test_parse_file_mmap(tmp_path, backend, use_mmap):
+    if backend == "numpy":
+        pytest.importorskip("numpy")
+    raw = random_history(3)
+    path = tmp_path / "history.bin"
+    path.write_bytes(b"junk" + raw)
+    expected = HistoryParser(raw).get_data()
+    with open(path, "rb") as f:
+        f.seek(4)
+        assert HistoryParser(f, backend, use_mmap).get_data() == expected
+        assert f.closed
+    path.write_bytes(raw)
+    assert HistoryParser(str(path), backend, use_mmap).get_data() == expected
+    # empty files can not be mapped
+    path.write_bytes(b"")
+    assert HistoryParser(str(path), backend, use_mmap).get_data() == []
+
+
+@pytest.mark.parametrize("backend", ["python", "numpy"])
+def test_parse_buffers(backend):
+    if backend == "numpy":
+        pytest.importorskip("numpy")
+    expected = HistoryParser(history).get_data()
+    for raw in (bytearray(history), memoryview(history)):
+        assert HistoryParser(raw, backend).get_data() == expected
+
+
+def test_parse_bad_input():
+    with pytest.raises(TypeError):
+        HistoryParser(123)
+    with pytest.raises(ValueError):
+        HistoryParser(history, backend="fortran")
+
+
+def test_numpy_backend():
+    pytest.importorskip("numpy")
+    assert HistoryParser(history, backend="numpy").get_data() == (
+        HistoryParser(history).get_data()
+    )
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_numpy_backend_random(seed):
+    pytest.importorskip("numpy")
+    raw = random_history(seed)
+    try:
+        expected = HistoryParser(raw).get_data()
+    except ValueError:
+        # random context with an invalid date
+        with pytest.raises(ValueError):
+            HistoryParser(raw, backend="numpy")
+        return
+    assert HistoryParser(raw, backend="numpy").get_data() == expected
+
+
+def test_numpy_backend_85_runs():
+    """Every short sequence of marker bytes: 85 pairs, runs of 85, truncation."""
+    pytest.importorskip("numpy")
+    for n in range(6):
+        for tail in itertools.product([85, 170, 0, 1, 7], repeat=n):
+            raw = context(dt, 1) + bytes(tail) + count2(300) + bytes(tail)
+            for data in (raw, raw[: len(raw) - n]):
+                assert parse_outcome(data, "numpy") == parse_outcome(data), data
+
+
+def parse_outcome(data, backend="python"):
+    """get_data(), or the exception type e.g. 85 170 0 context with an invalid date"""
+    try:
+        return HistoryParser(data, backend=backend).get_data()
+    except ValueError as e:
+        return type(e)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 5, 13, 2048])
+def test_feed(chunk_size):
+    parser = HistoryParser()
+    records = []
+    raw = random_history(1)
+    for i in range(0, len(raw), chunk_size):
+        records.extend(parser.feed(raw[i : i + chunk_size]))
+    records.extend(parser.close())
+    assert records == HistoryParser(raw).get_data()
+    assert parser.get_data() == records
+
+
+def test_feed_split_marker():
+    parser = HistoryParser()
+    assert parser.feed(context(dt, 1)[:2]) == []
+    assert parser.feed(context(dt, 1)[2:] + note("hi")[:5]) == []
+    assert parser.feed(note("hi")[5:] + bytes([85])) == []
+    assert parser.feed(bytes([170, 1, 1])) == []
+    assert parser.feed(bytes([0])) == [
+        (dt + datetime.timedelta(seconds=1), 256, "CPS", "every second", dt, "hi")
+    ]
+    assert parser.feed(bytes([85])) == []
+    assert parser.close() == []
+    with pytest.raises(ValueError):
+        parser.feed(bytes([1]))
+
+
+def test_feed_eof():
+    parser = HistoryParser()
+    parser.feed(history)
+    assert parser.eof
+    assert parser.feed(bytes([1, 2, 3])) == []
+    assert parser.get_data() == HistoryParser(history).get_data()
+
+
+def test_table():
+    parser = HistoryParser(history)
+    table = parser.get_table()
+    data = parser.get_data()
+    assert isinstance(table, HistoryTable)
+    assert len(table) == len(data)
+    assert table.to_tuples() == data
+    assert list(table) == data
+    assert table[3] == data[3]
+    assert table[-1] == data[-1]
+    assert table[2:6].to_tuples() == data[2:6]
+    assert table.notes == {3: "hello"}
+    assert table.counts[:4].tolist() == [1, 2, 3, 4]
+
+
+def test_table_numpy():
+    np = pytest.importorskip("numpy")
+    parser = HistoryParser(history, backend="numpy")
+    assert parser.get_table().to_tuples() == HistoryParser(history).get_data()
+    columns = parser.get_table().to_numpy()
+    assert columns["count"][:4].tolist() == [1, 2, 3, 4]
+    assert columns["datetime"][0] == np.datetime64(dt + datetime.timedelta(seconds=1))
+
+
+def segment_rows(segments):
+    return [row for segment in segments for row in segment.to_tuples()]
+
+
+def test_segments():
+    parser = HistoryParser(history)
+    segments = parser.get_segments()
+    assert [(s.reference, s.unit, s.mode) for s in segments] == [
+        (dt, "CPS", "every second"),
+        (dt, "CPM", "every minute"),
+    ]
+    assert segments[0].step == datetime.timedelta(seconds=1)
+    assert segments[0].start == dt + datetime.timedelta(seconds=1)
+    assert segments[0].end == dt + datetime.timedelta(seconds=10)
+    assert segments[0].total() == 1 + 2 + 3 + 4 + 1000 + 85 + 7 + 85 + 170 + 9
+    assert segment_rows(segments) == parser.get_data()
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_segments_between(seed):
+    raw = random_history(seed)
+    try:
+        parser = HistoryParser(raw)
+    except ValueError:
+        return
+    data = parser.get_data()
+    rng = random.Random(seed)  # noqa: S311
+    for _ in range(10):
+        start, end = sorted(rng.choice(data)[0] for _ in range(2))
+        segments = parser.get_segments(start, end)
+        assert segment_rows(segments) == [r for r in data if start <= r[0] < end]
+    assert segment_rows(parser.get_segments(start=start)) == [
+        r for r in data if start <= r[0]
+    ]
+    assert segment_rows(parser.get_segments(end=end)) == [r for r in data if r[0] < end]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_segments_numpy(seed):
+    pytest.importorskip("numpy")
+    raw = random_history(seed)
+    try:
+        expected = HistoryParser(raw).get_segments()
+    except ValueError:
+        return
+    segments = HistoryParser(raw, backend="numpy").get_segments()
+    assert [(s.reference, s.save_mode, s.counts, s.notes) for s in segments] == [
+        (s.reference, s.save_mode, s.counts, s.notes) for s in expected
+    ]
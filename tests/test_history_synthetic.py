@@ -0,0 +1,97 @@
+"""
+Test SyntheticHistory: its ground truth is what HistoryParser decodes.
+"""
+import statistics
+
+import pytest
+
+from pygmc.history import HistoryParser, SyntheticHistory
+
+
+def assert_parsed(parsed, history):
+    """Ground truth, then padding counts of 255 only."""
+    truth = history.get_data()
+    assert parsed[: len(truth)] == truth
+    assert all(row[1] == 255 for row in parsed[len(truth) :])
+
+
+@pytest.mark.parametrize("backend", ["python", "numpy"])
+@pytest.mark.parametrize(
+    "params",
+    [
+        {},
+        {"cpm": 20_000},
+        {"cpm": 0},
+        {"segment_counts": 20, "note_rate": 0.1, "accidental_rate": 0.2},
+        {"note_rate": 1, "accidental_rate": 1},
+    ],
+)
+@pytest.mark.parametrize("seed", range(3))
+def test_parse(backend, params, seed):
+    if backend == "numpy":
+        pytest.importorskip("numpy")
+    history = SyntheticHistory(size=2**15, seed=seed, **params)
+    assert_parsed(HistoryParser(history.data, backend=backend).get_data(), history)
+
+
+def test_feed():
+    history = SyntheticHistory(size=2**16, seed=1, accidental_rate=0.05)
+    parser = HistoryParser()
+    rows = []
+    for i in range(0, len(history.data), 2048):
+        rows.extend(parser.feed(history.data[i : i + 2048]))
+    rows.extend(parser.close())
+    assert_parsed(rows, history)
+
+
+def test_segments():
+    history = SyntheticHistory(size=2**16, seed=2, segment_counts=100)
+    parsed = HistoryParser(history.data).get_segments()
+    truth = history.get_segments()
+    assert len(parsed) == len(truth)
+    for p, t in zip(parsed, truth):
+        assert (p.reference, p.save_mode, p.position) == (
+            t.reference,
+            t.save_mode,
+            t.position,
+        )
+    assert {segment.save_mode for segment in truth} == {0, 1, 2, 3, 4, 5}
+    assert all(len(segment) == 0 for segment in truth if segment.save_mode == 0)
+
+
+def test_content():
+    history = SyntheticHistory(size=2**16, seed=3, cpm=600, accidental_rate=0.01)
+    assert len(history.data) == 2**16
+    assert history.data.endswith(b"\xff" * 2048)
+    assert bytes([85, 170, 1]) in history.data
+    assert bytes([85, 170, 2]) in history.data
+    counts = [row[1] for row in history.get_data()]
+    triples = zip(counts, counts[1:], counts[2:])
+    assert any(a == 85 and b == 170 and c > 2 for a, b, c in triples)
+
+
+def test_seed():
+    assert (
+        SyntheticHistory(2**15, seed=4).data == SyntheticHistory(2**15, seed=4).data
+    )
+    assert (
+        SyntheticHistory(2**15, seed=4).data != SyntheticHistory(2**15, seed=5).data
+    )
+
+
+@pytest.mark.parametrize("cpm", [6, 60, 6000])
+def test_poisson(cpm):
+    history = SyntheticHistory(
+        size=2**16, seed=6, cpm=cpm, save_modes=(1,), accidental_rate=0
+    )
+    counts = [row[1] for row in history.get_data()]
+    # mean & variance of CPS counts are cpm / 60
+    assert statistics.mean(counts) == pytest.approx(cpm / 60, rel=0.1)
+    assert statistics.variance(counts) == pytest.approx(cpm / 60, rel=0.15)
+
+
+def test_padding():
+    with pytest.raises(ValueError):
+        SyntheticHistory(size=100, padding=2048)
+    history = SyntheticHistory(size=2**15, seed=7, padding=2**14)
+    assert history.data[2**14 :] == b"\xff" * 2**14
@@ -0,0 +1,105 @@
+"""
+Test pygmc.connect(cache=...) reconnects from the connection profile cache.
+mock_serial only works on Linux, so skip test if not on Linux.
+"""
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import pygmc
+from pygmc.connection import ProfileCache
+
+# mock_serial only works on Linux
+if not sys.platform.startswith("linux"):
+    pytest.skip("skipping tests - not running linux", allow_module_level=True)
+
+hwid = "USB VID:PID=1A86:7523 SER= LOCATION=1-1"
+
+
+@pytest.fixture
+def port(monkeypatch):
+    """A GMC-500+ on a pseudo-terminal, listed as a USB port"""
+    mock_serial = pytest.importorskip("mock_serial", reason="Doesn't work on Win")
+    mock_dev = mock_serial.MockSerial()
+    mock_dev.open()
+    mock_dev.stub(receive_bytes=b"<GETSERIAL>>", send_bytes=b"\x05\x00M253\xab")
+    mock_dev.stub(receive_bytes=b"<GETVER>>", send_bytes=b"GMC-500+Re 2.42")
+    mock_dev.stub(receive_bytes=b"<HEARTBEAT0>>", send_bytes=b"")
+    monkeypatch.setattr(
+        pygmc.connection.Connection,
+        "_get_available_usb_devices",
+        staticmethod(
+            lambda regexp=None: [SimpleNamespace(device=mock_dev.port, hwid=hwid)]
+        ),
+    )
+    yield mock_dev.port
+    mock_dev.close()
+
+
+def test_profile_cache_round_trip(tmp_path):
+    cache = ProfileCache(str(tmp_path / "sub" / "profiles.json"))
+    assert cache.load() == {}
+    cache.put({"hwid": "a", "baudrate": 115200})
+    cache.put({"hwid": "b", "baudrate": 57600})
+    assert cache.get("a") == {"hwid": "a", "baudrate": 115200}
+    cache.remove("a")
+    assert cache.get("a") is None
+    assert list(ProfileCache(cache.path).load()) == ["b"]
+
+
+def test_connect_cached(port, tmp_path, monkeypatch):
+    path = str(tmp_path / "profiles.json")
+    device = pygmc.connect(cache=path)
+    device.connection.close_connection()
+    profile = ProfileCache(path).get(hwid)
+    assert profile == {
+        "port": port,
+        "hwid": hwid,
+        "baudrate": 115200,
+        "serial": "05004d323533ab",
+        "device": "GMC500Plus",
+        "version": "GMC-500+Re 2.42",
+    }
+
+    def get_version(self):
+        raise AssertionError("cached reconnect must not ask the version")
+
+    monkeypatch.setattr(pygmc.devices.BaseDevice, "get_version", get_version)
+    start = time.monotonic()
+    device = pygmc.connect(cache=path)
+    # no baudrate search, no 0.2s settle, no 0.3s version wait
+    assert time.monotonic() - start < 0.3
+    assert isinstance(device, pygmc.GMC500Plus)
+    assert device.get_serial() == "05004d323533ab"
+    device.connection.close_connection()
+
+
+def test_connect_cached_mismatch(port, tmp_path):
+    path = str(tmp_path / "profiles.json")
+    cache = ProfileCache(path)
+    stale = {
+        "port": port,
+        "hwid": hwid,
+        "baudrate": 115200,
+        "serial": "ffffffffffffff",
+        "device": "GMC320Plus",
+        "version": "GMC-320Re 4.09",
+    }
+    cache.put(stale)
+    device = pygmc.connect(cache=path)
+    device.connection.close_connection()
+    # other device at the same USB location: full connect, profile replaced
+    assert isinstance(device, pygmc.GMC500Plus)
+    assert cache.get(hwid)["serial"] == "05004d323533ab"
+
+
+def test_connect_profile_mismatch_removed(port, tmp_path):
+    cache = ProfileCache(str(tmp_path / "profiles.json"))
+    cache.put({"hwid": hwid, "baudrate": 115200, "serial": "ff", "device": "GMC500"})
+    cache.put({"hwid": "other", "baudrate": 57600})
+    args = (None, None, None, None, None, None)
+    assert pygmc._connect_profile(cache, *args) is None
+    assert cache.get(hwid) is None
+    assert list(cache.load()) == ["other"]
@@ -0,0 +1,17 @@
+"""
+Sanity check pyproject.toml metadata, a misplaced table breaks the package build.
+"""
+import pathlib
+
+import pytest
+
+pyproject = pathlib.Path(__file__).parent.parent / "pyproject.toml"
+
+
+def test_project_metadata():
+    tomllib = pytest.importorskip("tomllib", reason="Python 3.11+")
+    project = tomllib.loads(pyproject.read_text(encoding="utf8"))["project"]
+    assert project["readme"] == "README.md"
+    assert isinstance(project["classifiers"], list)
+    extras = project["optional-dependencies"]
+    assert extras == {"numpy": ["numpy"]}
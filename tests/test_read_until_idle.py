@@ -0,0 +1,150 @@
+"""
+Test Connection.read_until_idle() on a pseudo-terminal, the test writes as the device.
+Pseudo-terminals only work on Linux, so skip test if not on Linux.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import pytest
+from serial import Serial
+
+import pygmc
+
+if not sys.platform.startswith("linux"):
+    pytest.skip("skipping tests - not running linux", allow_module_level=True)
+
+
+@pytest.fixture
+def pty():
+    """(connection, device fd)"""
+    device_fd, port_fd = os.openpty()
+    connection = pygmc.connection.Connection(timeout=1)
+    connection.connect_user_provided(
+        Serial(os.ttyname(port_fd), baudrate=115200, timeout=1)
+    )
+    yield connection, device_fd
+    connection.close_connection()
+    os.close(port_fd)
+    os.close(device_fd)
+
+
+def write_later(fd, chunks):
+    """Write chunks [(delay, bytes)] from another thread"""
+
+    def run():
+        for delay, data in chunks:
+            time.sleep(delay)
+            os.write(fd, data)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_idle_gap_from_baudrate():
+    connection = pygmc.connection.Connection()
+    connection._baudrate = 1200
+    assert connection.idle_gap == pytest.approx(32 * 10 / 1200)
+    connection._baudrate = 115200
+    assert connection.idle_gap == connection._idle_gap_min
+    connection.idle_gap = 0.5
+    assert connection.idle_gap == 0.5
+    connection.idle_gap = None
+    assert connection.idle_gap == connection._idle_gap_min
+
+
+def test_read_until_idle(pty):
+    connection, device_fd = pty
+    # slow first byte, then the response in pieces closer than the gap
+    thread = write_later(
+        device_fd, [(0.4, b"GMC-5"), (0.005, b"00+Re"), (0.005, b" 2.42")]
+    )
+    start = time.monotonic()
+    result = connection.read_until_idle(min_size=7, gap=0.1)
+    elapsed = time.monotonic() - start
+    thread.join()
+    assert result == b"GMC-500+Re 2.42"
+    # returns one gap after the last byte, no fixed sleep
+    assert 0.4 < elapsed < 0.7
+    # connection timeout is untouched
+    assert connection._con.timeout == 1
+
+
+def test_read_until_idle_no_port_reconfigure(pty, monkeypatch):
+    connection, device_fd = pty
+    calls = []
+    reconfigure = Serial._reconfigure_port
+
+    def counted(self, *args, **kwargs):
+        calls.append(args)
+        return reconfigure(self, *args, **kwargs)
+
+    monkeypatch.setattr(Serial, "_reconfigure_port", counted)
+    thread = write_later(device_fd, [(0, b"GMC-500"), (0.005, b"+Re 2.42")])
+    assert connection.read_until_idle(min_size=7) == b"GMC-500+Re 2.42"
+    thread.join()
+    assert calls == []
+
+
+def test_read_until_idle_timeout(pty):
+    connection, device_fd = pty
+    thread = write_later(device_fd, [(0, b"GMC")])
+    result = connection.read_until_idle(min_size=7)
+    thread.join()
+    assert result == b"GMC"
+
+
+def test_read_until_idle_learns_gap(pty):
+    connection, device_fd = pty
+    gap = connection.idle_gap
+    for _ in range(5):
+        # device pauses longer than the initial gap mid-response
+        thread = write_later(device_fd, [(0, b"GMC-500"), (0.015, b"+Re 2.42")])
+        assert connection.read_until_idle(min_size=7) == b"GMC-500+Re 2.42"
+        thread.join()
+    assert connection.idle_gap > gap
+
+
+def test_get_pipelined_min_size(pty):
+    connection, device_fd = pty
+    connection.idle_gap = 0.05
+    # GETVER stalls after 3 bytes for longer than the gap, min_size keeps reading
+    thread = write_later(
+        device_fd,
+        [
+            (0.05, b"\x00\x00\x00\x04GMC"),
+            (0.15, b"-500+Re 2.42"),
+            (0.2, b"\x00\x00\x00\x05"),
+        ],
+    )
+    commands = [(b"<GETCPM>>", 4), (b"<GETVER>>", None, 7), (b"<GETCPS>>", 4)]
+    result = connection.get_pipelined(commands)
+    thread.join()
+    assert result == [b"\x00\x00\x00\x04", b"GMC-500+Re 2.42", b"\x00\x00\x00\x05"]
+
+
+def test_async_read_until_idle():
+    device_fd, port_fd = os.openpty()
+    connection = pygmc.connection.AsyncConnection(timeout=1)
+    connection.connect_user_provided(Serial(os.ttyname(port_fd), baudrate=115200))
+    # stalls after 3 bytes for longer than the gap, min_size keeps reading
+    thread = write_later(device_fd, [(0.2, b"GMC"), (0.1, b"-500+Re"), (0.005, b" 2.42")])
+
+    async def main():
+        start = time.monotonic()
+        result = await connection.get_until_idle(b"<GETVER>>", min_size=7, gap=0.05)
+        return result, time.monotonic() - start
+
+    try:
+        result, elapsed = asyncio.run(main())
+        thread.join()
+    finally:
+        connection.close_connection()
+        os.close(port_fd)
+        os.close(device_fd)
+    assert result == b"GMC-500+Re 2.42"
+    # returns one gap after the last byte, no fixed sleep
+    assert 0.3 < elapsed < 0.6
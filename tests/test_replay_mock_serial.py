@@ -0,0 +1,115 @@
+"""
+Test recording a session with a mock device and replaying it without the device.
+mock_serial only works on Linux, so skip test if not on Linux.
+"""
+import sys
+import time
+
+import pytest
+from serial import Serial
+
+import pygmc
+from pygmc.connection import ReplaySerial, read_capture, record
+
+from .test_gmc500_plus_device_rfc_1801 import cmd_response_map, device_result_map
+
+# mock_serial only works on Linux
+if not sys.platform.startswith("linux"):
+    pytest.skip("skipping tests - not running linux", allow_module_level=True)
+
+# SPIR bug: device returns chunk_size + 1 bytes
+spir = b"<SPIR\x00\x00\x00\x00\x10>>"
+flash = bytes(range(16)) + b"\xff"
+
+
+def session(device):
+    """Device calls recorded, then replayed"""
+    return [
+        device.get_cpm(),
+        device._read_history_position(0, 16),
+        device.get_version(),
+        device.get_config(),
+        device.get_voltage(),
+    ]
+
+
+expected = [
+    device_result_map["get_cpm"],
+    flash[:16],
+    device_result_map["get_version"],
+    device_result_map["get_config"],
+    device_result_map["get_voltage"],
+]
+
+
+@pytest.fixture
+def capture(tmp_path):
+    mock_serial = pytest.importorskip("mock_serial", reason="Doesn't work on Win")
+    mock_dev = mock_serial.MockSerial()
+    mock_dev.open()
+    for cmd, resp in cmd_response_map.items():
+        mock_dev.stub(receive_bytes=cmd, send_bytes=resp)
+    mock_dev.stub(receive_bytes=b"<HEARTBEAT0>>", send_bytes=b"")
+    mock_dev.stub(receive_bytes=spir, send_bytes=flash)
+
+    path = str(tmp_path / "session.cap")
+    connection = pygmc.connection.Connection()
+    connection.connect_user_provided(Serial(mock_dev.port, timeout=2))
+    record(connection, path)
+    device = pygmc.devices.DeviceRFC1801(connection)
+    start = time.monotonic()
+    assert session(device) == expected
+    elapsed = time.monotonic() - start
+    connection.close_connection()
+    mock_dev.close()
+    return path, elapsed
+
+
+def replay(path, speed):
+    connection = pygmc.connection.Connection()
+    replay_serial = ReplaySerial(path, speed=speed)
+    connection.connect_user_provided(replay_serial)
+    device = pygmc.devices.DeviceRFC1801(connection)
+    start = time.monotonic()
+    result = session(device)
+    elapsed = time.monotonic() - start
+    assert replay_serial.remaining == 0
+    return result, elapsed
+
+
+def test_capture_file(capture):
+    path, _ = capture
+    metadata, events = read_capture(path)
+    assert "port" in metadata
+    kinds = [kind for kind, _, _ in events]
+    assert set(kinds) <= {"W", "R", "N", "D"}
+    times = [t for _, t, _ in events]
+    assert times == sorted(times)
+    # the extra SPIR byte is discarded by reset_buffers, and recorded
+    i = [payload for _, _, payload in events].index(spir)
+    assert ("D", b"\xff") in [(kind, payload) for kind, _, payload in events[i:]]
+
+
+def test_replay_fast(capture):
+    path, recorded = capture
+    result, elapsed = replay(path, speed=None)
+    assert result == expected
+    assert elapsed < recorded / 2
+
+
+def test_replay_speed(capture):
+    path, recorded = capture
+    result, elapsed = replay(path, speed=1)
+    assert result == expected
+    assert elapsed == pytest.approx(recorded, abs=0.05)
+    result, elapsed = replay(path, speed=2)
+    assert elapsed == pytest.approx(recorded / 2, abs=0.05)
+
+
+def test_replay_diverged(capture):
+    path, _ = capture
+    connection = pygmc.connection.Connection()
+    connection.connect_user_provided(ReplaySerial(path, speed=None))
+    device = pygmc.devices.DeviceRFC1801(connection)
+    with pytest.raises(RuntimeError, match="diverged"):
+        device.get_cps()
@@ -0,0 +1,81 @@
+"""
+Test the real pyserial code path against the pseudo-terminal device simulator.
+Pseudo-terminals only work on Linux here, so skip test if not on Linux.
+"""
+import datetime
+import sys
+import time
+
+import pytest
+
+import pygmc
+
+if not sys.platform.startswith("linux"):
+    pytest.skip("skipping tests - not running linux", allow_module_level=True)
+
+from pygmc.simulator import Simulator  # noqa: E402
+
+# a few history pages, then empty flash
+flash = bytes(range(256)) * 40
+
+
+def test_connect_gmc500_plus():
+    with Simulator(model="GMC-500+", flash=flash, seed=1) as sim:
+        device = pygmc.connect(port=sim.port)
+        assert isinstance(device, pygmc.GMC500Plus)
+        assert device.get_serial() == "05004d323533ab"
+        assert device.get_voltage() == 4.2
+        assert device.get_gyro() == (-7, -242, 37)
+        assert device.get_config()["CalibrationCPM_1"] == 30000
+        assert isinstance(device.get_cpm(), int)
+        history = device.get_raw_history()
+        assert history[: len(flash)] == flash
+        assert set(history[len(flash) :]) <= {0xFF}
+        device.connection.close_connection()
+        assert sim.received["GETVER"] == 2
+        assert sim.received["SPIR"] == len(flash) // 2048 + 1
+
+
+def test_gmc320_set_datetime_spir_bug():
+    with Simulator(model="GMC-320", flash=flash, spir_bug=True) as sim:
+        device = pygmc.connect(port=sim.port)
+        assert isinstance(device, pygmc.GMC320)
+        assert device.get_temp() == 24.5
+        assert device.get_voltage() == 4.2
+        dt = datetime.datetime(2023, 11, 10, 18, 33, 4)
+        device.set_datetime(dt)
+        assert device.get_datetime() - dt < datetime.timedelta(seconds=2)
+        # extra SPIR byte is discarded
+        assert device.get_raw_history()[: len(flash)] == flash
+        assert device.get_serial() == "05004d323533ab"
+        device.connection.close_connection()
+
+
+def test_baudrate_probing(monkeypatch):
+    monkeypatch.setattr(pygmc.connection.Connection, "_probe_timeout", 0.1)
+    with Simulator(baudrate=57600) as sim:
+        connection = pygmc.connection.Connection()
+        connection.connect(port=sim.port)
+        assert connection._baudrate == 57600
+        connection.close_connection()
+
+
+def test_throughput():
+    """Responses are paced at the baudrate: 10 bits per byte"""
+    with Simulator(baudrate=9600, flash=flash, latency=0) as sim:
+        connection = pygmc.connection.Connection()
+        connection.connect_exact(sim.port, 9600)
+        device = pygmc.devices.DeviceRFC1801(connection)
+        start = time.monotonic()
+        device._read_history_position(0, 512)
+        assert time.monotonic() - start == pytest.approx(512 * 10 / 9600, rel=0.25)
+        connection.close_connection()
+
+
+def test_heartbeat():
+    with Simulator(model="GMC-320", cpm=600, seed=1) as sim:
+        device = pygmc.connect(port=sim.port)
+        cps = list(device.heartbeat_live(count=2))
+        assert len(cps) == 2
+        assert sum(cps) > 0
+        device.connection.close_connection()